@@ -59,6 +59,13 @@ case "${1:-}" in
     run_in_container "python -m alembic -c $ALEMBIC_CFG stamp \"$REV\""
     ;;
 
+  partitions)
+    # AssetLocationEvents partition maintenance (Postgres)
+    # Usage: ./scripts/migrate.sh partitions ensure|retention|status
+    CMD="${2:-status}"
+    run_in_container "python event_partitions.py \"$CMD\""
+    ;;
+
   status)
     # Quick health check: show DB URL and tables
     run_in_container '
@@ -89,6 +96,7 @@ Commands:
   history             Show migration history
   stamp [rev]         Set revision without running migrations
   status              Print models & DB table list
+  partitions [cmd]    AssetLocationEvents partitions: ensure | retention | status
 
 Examples:
   $0 make "init schema"
@@ -0,0 +1,44 @@
+"""Add AssetCurrentLocations (latest location event per asset)
+
+Revision ID: 004_add_asset_current_locations
+Revises: f8e1331480a5
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '004_add_asset_current_locations'
+down_revision = 'f8e1331480a5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('AssetCurrentLocations',
+    sa.Column('AssetId', sa.Integer(), nullable=False),
+    sa.Column('EventId', sa.Integer(), nullable=False),
+    sa.Column('RfidTagId', sa.String(length=100), nullable=False),
+    sa.Column('Location', sa.String(length=100), nullable=False),
+    sa.Column('ReaderId', sa.String(length=100), nullable=False),
+    sa.Column('Timestamp', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['AssetId'], ['TrainAssets.Id'], ),
+    sa.PrimaryKeyConstraint('AssetId')
+    )
+    # backfill from the existing history (window function: Postgres and SQLite alike)
+    op.execute('''
+        INSERT INTO "AssetCurrentLocations" ("AssetId", "EventId", "RfidTagId", "Location", "ReaderId", "Timestamp")
+        SELECT "AssetId", "EventId", "RfidTagId", "Location", "ReaderId", "Timestamp"
+        FROM (
+            SELECT "AssetId", "EventId", "RfidTagId", "Location", "ReaderId", "Timestamp",
+                   ROW_NUMBER() OVER (PARTITION BY "AssetId" ORDER BY "Timestamp" DESC, "EventId" DESC) AS rn
+            FROM "AssetLocationEvents"
+        ) latest
+        WHERE rn = 1
+    ''')
+
+
+def downgrade() -> None:
+    op.drop_table('AssetCurrentLocations')
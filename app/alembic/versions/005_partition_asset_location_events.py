@@ -0,0 +1,137 @@
+"""Partition AssetLocationEvents by Timestamp and add AssetLocationHourly
+
+Revision ID: 005_partition_asset_location_events
+Revises: 004_add_asset_current_locations
+Create Date: 2026-10-17 00:00:00.000000
+
+On Postgres the table is rebuilt as PARTITION BY RANGE ("Timestamp") with
+one partition per month from the oldest event through three months past now,
+plus a DEFAULT partition. Existing rows are copied across, so expect this to
+take a while on a large history. Other dialects only get the new index and
+the rollup table.
+
+The partition layout and names are written out here rather than taken from
+event_partitions.py, so replaying this revision always emits the same DDL;
+event_partitions.py maintains the table from here on.
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '005_partition_asset_location_events'
+down_revision = '004_add_asset_current_locations'
+branch_labels = None
+depends_on = None
+
+COLUMNS = '"EventId", "AssetId", "RfidTagId", "Location", "ReaderId", "Timestamp"'
+SINGLE_INDEXES = ['EventId', 'AssetId', 'RfidTagId', 'ReaderId', 'Timestamp']
+DEFAULT_PARTITION = 'AssetLocationEvents_default'
+MONTHS_AHEAD = 3
+
+
+def _create_indexes() -> None:
+    for column in SINGLE_INDEXES:
+        op.create_index(op.f(f'ix_AssetLocationEvents_{column}'), 'AssetLocationEvents', [column], unique=False)
+
+
+def _drop_indexes(table: str) -> None:
+    for column in SINGLE_INDEXES:
+        op.drop_index(op.f(f'ix_AssetLocationEvents_{column}'), table_name=table)
+
+
+def _next_month(start: datetime) -> datetime:
+    return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+
+
+def _create_monthly_partitions(since) -> None:
+    now = datetime.utcnow()
+    start = datetime((since or now).year, (since or now).month, 1)
+    last = datetime(now.year, now.month, 1)
+    for _ in range(MONTHS_AHEAD):
+        last = _next_month(last)
+    while start <= last:
+        end = _next_month(start)
+        op.execute(
+            f'CREATE TABLE "AssetLocationEvents_p{start:%Y_%m}" PARTITION OF "AssetLocationEvents" '
+            f"FOR VALUES FROM ('{start:%Y-%m-%d %H:%M:%S}') TO ('{end:%Y-%m-%d %H:%M:%S}')"
+        )
+        start = end
+
+
+def upgrade() -> None:
+    op.create_table('AssetLocationHourly',
+    sa.Column('AssetId', sa.Integer(), nullable=False),
+    sa.Column('Hour', sa.DateTime(), nullable=False),
+    sa.Column('Reads', sa.Integer(), nullable=False),
+    sa.Column('FirstSeen', sa.DateTime(), nullable=False),
+    sa.Column('LastSeen', sa.DateTime(), nullable=False),
+    sa.Column('LastLocation', sa.String(length=100), nullable=False),
+    sa.Column('LastReaderId', sa.String(length=100), nullable=False),
+    sa.PrimaryKeyConstraint('AssetId', 'Hour')
+    )
+
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.create_index('ix_AssetLocationEvents_AssetId_Timestamp', 'AssetLocationEvents', ['AssetId', 'Timestamp'], unique=False)
+        return
+
+    # move the old table out of the way, keeping its sequence alive
+    _drop_indexes('AssetLocationEvents')
+    op.rename_table('AssetLocationEvents', 'AssetLocationEvents_legacy')
+    op.execute('ALTER TABLE "AssetLocationEvents_legacy" RENAME CONSTRAINT "AssetLocationEvents_pkey" TO "AssetLocationEvents_legacy_pkey"')
+    op.execute('ALTER SEQUENCE "AssetLocationEvents_EventId_seq" OWNED BY NONE')
+
+    # the partition key has to be part of the primary key; the Timestamp default is naive
+    # UTC like the app's values, the partition bounds and retention
+    op.execute('''
+        CREATE TABLE "AssetLocationEvents" (
+            "EventId" integer NOT NULL DEFAULT nextval('"AssetLocationEvents_EventId_seq"'),
+            "AssetId" integer NOT NULL REFERENCES "TrainAssets" ("Id"),
+            "RfidTagId" varchar(100) NOT NULL,
+            "Location" varchar(100) NOT NULL,
+            "ReaderId" varchar(100) NOT NULL,
+            "Timestamp" timestamp NOT NULL DEFAULT timezone('utc', now()),
+            CONSTRAINT "AssetLocationEvents_pkey" PRIMARY KEY ("EventId", "Timestamp")
+        ) PARTITION BY RANGE ("Timestamp")
+    ''')
+    _create_indexes()
+    op.create_index('ix_AssetLocationEvents_AssetId_Timestamp', 'AssetLocationEvents', ['AssetId', 'Timestamp'], unique=False)
+    op.execute(f'CREATE TABLE "{DEFAULT_PARTITION}" PARTITION OF "AssetLocationEvents" DEFAULT')
+
+    oldest = bind.execute(sa.text('SELECT min("Timestamp") FROM "AssetLocationEvents_legacy"')).scalar()
+    _create_monthly_partitions(since=oldest)
+
+    op.execute(f'INSERT INTO "AssetLocationEvents" ({COLUMNS}) SELECT {COLUMNS} FROM "AssetLocationEvents_legacy"')
+    op.execute('ALTER SEQUENCE "AssetLocationEvents_EventId_seq" OWNED BY "AssetLocationEvents"."EventId"')
+    op.drop_table('AssetLocationEvents_legacy')
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    if bind.dialect.name != 'postgresql':
+        op.drop_index('ix_AssetLocationEvents_AssetId_Timestamp', table_name='AssetLocationEvents')
+        op.drop_table('AssetLocationHourly')
+        return
+
+    op.execute('ALTER SEQUENCE "AssetLocationEvents_EventId_seq" OWNED BY NONE')
+    op.execute('''
+        CREATE TABLE "AssetLocationEvents_legacy" (
+            "EventId" integer NOT NULL DEFAULT nextval('"AssetLocationEvents_EventId_seq"'),
+            "AssetId" integer NOT NULL REFERENCES "TrainAssets" ("Id"),
+            "RfidTagId" varchar(100) NOT NULL,
+            "Location" varchar(100) NOT NULL,
+            "ReaderId" varchar(100) NOT NULL,
+            "Timestamp" timestamp NOT NULL DEFAULT timezone('utc', now()),
+            CONSTRAINT "AssetLocationEvents_legacy_pkey" PRIMARY KEY ("EventId")
+        )
+    ''')
+    op.execute(f'INSERT INTO "AssetLocationEvents_legacy" ({COLUMNS}) SELECT {COLUMNS} FROM "AssetLocationEvents"')
+    op.drop_table('AssetLocationEvents')  # takes every partition with it
+    op.rename_table('AssetLocationEvents_legacy', 'AssetLocationEvents')
+    op.execute('ALTER TABLE "AssetLocationEvents" RENAME CONSTRAINT "AssetLocationEvents_legacy_pkey" TO "AssetLocationEvents_pkey"')
+    op.execute('ALTER SEQUENCE "AssetLocationEvents_EventId_seq" OWNED BY "AssetLocationEvents"."EventId"')
+    _create_indexes()
+    op.drop_table('AssetLocationHourly')
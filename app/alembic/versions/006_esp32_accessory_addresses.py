@@ -0,0 +1,46 @@
+"""Move the seeded accessories to ESP32 "<node>/<pin>" addresses
+
+Revision ID: 006_esp32_accessory_addresses
+Revises: 005_partition_asset_location_events
+Create Date: 2026-10-17 00:00:00.000000
+
+HW_MODE=esp32 resolves an accessory's Address as "<node>/<pin>" (see
+hardware/esp32.py). dev_seed.py used to store bare numbers ("101", ...),
+which no node answers to; rows it created are pointed at the pins
+accessory_map.yaml gives those devices. Other rows are left alone: give them
+a "<node>/<pin>" address through PUT /accessories/{id}.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '006_esp32_accessory_addresses'
+down_revision = '005_partition_asset_location_events'
+branch_labels = None
+depends_on = None
+
+# (Name, old Address, new Address), as seeded by dev_seed.py
+SEEDED = [
+    ('Main Signal', '101', 'esp32-03/6'),
+    ('Yard Light 1', '201', 'esp32-05/12'),
+    ('Yard Light 2', '202', 'esp32-05/13'),
+    ('Station House', '301', 'esp32-05/11'),
+    ('Switch 1 Motor', '401', 'esp32-01/2'),
+    ('Switch 2 Motor', '402', 'esp32-01/3'),
+    ('Switch 3 Motor', '403', 'esp32-02/4'),
+]
+
+
+def _readdress(frm: int, to: int) -> None:
+    statement = sa.text('UPDATE "Accessories" SET "Address" = :to WHERE "Name" = :name AND "Address" = :frm')
+    for row in SEEDED:
+        op.get_bind().execute(statement, {'name': row[0], 'frm': row[frm], 'to': row[to]})
+
+
+def upgrade() -> None:
+    _readdress(1, 2)
+
+
+def downgrade() -> None:
+    _readdress(2, 1)
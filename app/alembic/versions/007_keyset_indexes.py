@@ -0,0 +1,29 @@
+"""Indexes for the keyset orders of GET /switches and GET /assetLocationEvents
+
+Revision ID: 007_keyset_indexes
+Revises: 006_esp32_accessory_addresses
+Create Date: 2026-10-17 00:00:00.000000
+
+The switch list pages on (coalesce("Name", ''), "Id") because Name is
+nullable; the event list pages newest first on ("Timestamp", "EventId"),
+which a backward scan of an ascending index serves.
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '007_keyset_indexes'
+down_revision = '006_esp32_accessory_addresses'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index('ix_Switches_Name_Id', 'Switches', [sa.text('coalesce("Name", \'\')'), 'Id'], unique=False)
+    op.create_index('ix_AssetLocationEvents_Timestamp_EventId', 'AssetLocationEvents', ['Timestamp', 'EventId'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_AssetLocationEvents_Timestamp_EventId', table_name='AssetLocationEvents')
+    op.drop_index('ix_Switches_Name_Id', table_name='Switches')
@@ -1,6 +1,11 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session, declarative_base, raiseload, sessionmaker
+
+from db_pool import instrument_pool, pool_options
+from db_profiling import instrument_engine
 
 # --- Database URL resolution ---
 # Prefer a full DATABASE_URL (e.g. for prod), otherwise build from parts.
@@ -15,8 +20,26 @@ if not DATABASE_URL:
     # Use psycopg2 driver
     DATABASE_URL = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 
+# Same database through an asyncio driver, for the API
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_url(url: str) -> str:
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.get_backend_name())
+    if driver is None:
+        raise ValueError(f"No async driver configured for {parsed.drivername}")
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
 # --- SQLAlchemy setup ---
-engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+# Pool sizing and pre-ping come from DB_POOL_* (see db_pool)
+# Sync engine: dev_seed, Alembic, and the RFID write-behind/partition jobs
+engine = create_engine(DATABASE_URL, **pool_options("sync"))
+instrument_pool(engine, "sync")
+instrument_engine(engine)
 
 SessionLocal = sessionmaker(
     bind=engine,
@@ -24,4 +47,38 @@ SessionLocal = sessionmaker(
     autocommit=False,
 )
 
+# Async engine: every router. Request concurrency is bounded by this pool,
+# not by the threadpool.
+async_engine = create_async_engine(ASYNC_DATABASE_URL, **pool_options("async", asynchronous=True))
+instrument_pool(async_engine.sync_engine, "async")
+instrument_engine(async_engine.sync_engine)
+
+
+class RouterSession(Session):
+    """Sync side of the routers' AsyncSession: relationships a query didn't load raise."""
+
+
+@event.listens_for(RouterSession, "do_orm_execute")
+def _raiseload_by_default(state):
+    # Explicit selectinload/joinedload/contains_eager options on the statement
+    # still win over the wildcard; loads those options emit are left alone.
+    if state.is_select and not state.is_column_load and not state.is_relationship_load:
+        state.statement = state.statement.options(raiseload("*"))
+
+
+# expire_on_commit=False: attributes read after commit must not trigger a
+# lazy refresh, which async sessions can't do implicitly
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    sync_session_class=RouterSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
+
+async def get_db():
+    """Shared request-scoped session dependency for the routers."""
+    async with AsyncSessionLocal() as db:
+        yield db
+
 Base = declarative_base()
\ No newline at end of file
@@ -0,0 +1,121 @@
+"""
+Connection pool sizing, liveness checks and metrics for both engines.
+
+Sizing comes from the environment (applies to the sync and the async engine
+alike; each has its own pool):
+
+- DB_POOL_SIZE (5), DB_MAX_OVERFLOW (10): persistent connections and how many
+  extra may be opened under burst
+- DB_POOL_TIMEOUT_S (30): how long a checkout waits for a free connection
+- DB_POOL_RECYCLE_S (1800): replace connections older than this, before
+  Postgres or a NAT idle timeout drops them
+- DB_POOL_PRE_PING: ``idle`` (default) pings a connection on checkout only
+  if it sat in the pool longer than DB_POOL_PING_IDLE_S (30); ``always`` is
+  SQLAlchemy's pool_pre_ping (a round trip on every checkout); ``off`` relies
+  on SQLAlchemy invalidating the pool when a query hits a dead connection.
+
+Every pool reports to ``/metrics``: checkout wait time, timeouts, checked
+out / overflow / idle connections, pings and invalidations, labelled by
+``pool`` ("sync" or "async"). A p99 that tracks db_pool_checkout_seconds is
+pool starvation; one that doesn't is the queries themselves.
+"""
+
+import os
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from metrics import Counter, Gauge, Histogram
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+POOL_TIMEOUT_S = float(os.getenv("DB_POOL_TIMEOUT_S", "30"))
+POOL_RECYCLE_S = int(os.getenv("DB_POOL_RECYCLE_S", "1800"))
+PRE_PING = os.getenv("DB_POOL_PRE_PING", "idle")  # idle | always | off
+PING_IDLE_S = float(os.getenv("DB_POOL_PING_IDLE_S", "30"))
+
+CHECKOUT_SECONDS = Histogram(
+    "db_pool_checkout_seconds", "Time spent waiting for a pooled connection", ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+CHECKOUT_TIMEOUTS = Counter("db_pool_checkout_timeouts_total", "Checkouts that gave up after DB_POOL_TIMEOUT_S", ["pool"])
+CHECKED_OUT = Gauge("db_pool_checked_out", "Connections currently in use", ["pool"])
+OVERFLOW = Gauge("db_pool_overflow", "Connections open beyond DB_POOL_SIZE (negative: pool not yet filled)", ["pool"])
+IDLE = Gauge("db_pool_idle", "Connections waiting in the pool", ["pool"])
+PINGS = Counter("db_pool_pings_total", "Liveness pings on checkout after idling", ["pool", "result"])
+INVALIDATIONS = Counter("db_pool_invalidations_total", "Connections discarded as broken", ["pool"])
+
+
+class _TimedCheckout:
+    """Times the wait inside the pool, which no pool event covers."""
+
+    def _do_get(self):
+        name = self.logging_name or "default"
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            CHECKOUT_TIMEOUTS.labels(pool=name).inc()
+            raise
+        finally:
+            CHECKOUT_SECONDS.labels(pool=name).observe(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def pool_options(name: str, asynchronous: bool = False) -> dict:
+    """create_engine / create_async_engine keyword arguments for a pool called name."""
+    return {
+        "poolclass": TimedAsyncQueuePool if asynchronous else TimedQueuePool,
+        "pool_size": POOL_SIZE,
+        "max_overflow": MAX_OVERFLOW,
+        "pool_timeout": POOL_TIMEOUT_S,
+        "pool_recycle": POOL_RECYCLE_S,
+        "pool_pre_ping": PRE_PING == "always",
+        "pool_logging_name": name,
+    }
+
+
+def instrument_pool(engine: Engine, name: str, pre_ping: str = PRE_PING, ping_idle_s: float = PING_IDLE_S):
+    """Attach metrics and the idle pre-ping to engine (the sync_engine of an AsyncEngine)."""
+    CHECKED_OUT.labels(pool=name).set_function(lambda: engine.pool.checkedout())
+    OVERFLOW.labels(pool=name).set_function(lambda: engine.pool.overflow())
+    IDLE.labels(pool=name).set_function(lambda: engine.pool.checkedin())
+
+    @event.listens_for(engine, "invalidate")
+    def _invalidated(dbapi_connection, connection_record, exception):
+        INVALIDATIONS.labels(pool=name).inc()
+
+    if pre_ping != "idle":
+        return
+
+    @event.listens_for(engine, "connect")
+    def _connected(dbapi_connection, connection_record):
+        connection_record.info["returned_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkin")
+    def _checked_in(dbapi_connection, connection_record):
+        if connection_record is not None:
+            connection_record.info["returned_at"] = time.monotonic()
+
+    @event.listens_for(engine, "checkout")
+    def _checked_out(dbapi_connection, connection_record, connection_proxy):
+        returned_at = connection_record.info.get("returned_at")
+        if returned_at is None or time.monotonic() - returned_at <= ping_idle_s:
+            return
+        try:
+            alive = engine.dialect.do_ping(dbapi_connection)
+        except Exception:
+            alive = False
+        PINGS.labels(pool=name, result="ok" if alive else "stale").inc()
+        if not alive:
+            # the pool drops this connection and checks out another
+            raise exc.DisconnectionError("Connection went stale while idle in the pool")
@@ -0,0 +1,56 @@
+"""
+Per-request SQL statement counts and database time.
+
+``DbProfilingMiddleware`` puts a fresh ``QueryStats`` in the ``query_stats``
+context variable for each request; the cursor-execute hooks installed by
+``instrument_engine`` add every statement run in that request's context to
+it. The context follows the request into the async session's greenlet and
+into threadpool calls, so both engines are covered. Statements run outside a
+request (startup, the RFID writer's own flushes) aren't counted anywhere.
+"""
+
+import time
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@dataclass
+class QueryStats:
+    count: int = 0
+    seconds: float = 0.0
+
+    @property
+    def ms(self) -> float:
+        return round(self.seconds * 1000, 2)
+
+
+query_stats: ContextVar[Optional[QueryStats]] = ContextVar("query_stats", default=None)
+
+
+def instrument_engine(engine: Engine):
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if query_stats.get() is not None:
+            conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        _finish(conn)
+
+    @event.listens_for(engine, "handle_error")
+    def _failed(context):
+        if context.connection is not None:
+            _finish(context.connection)
+
+
+def _finish(conn):
+    stats = query_stats.get()
+    started = conn.info.get("query_started")
+    if stats is None or not started:
+        return
+    stats.count += 1
+    stats.seconds += time.perf_counter() - started.pop()
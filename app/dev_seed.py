@@ -191,7 +191,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Main Signal",
                 "CategoryId": categories["Signals"].Id,
                 "ControlType": "onOff",
-                "Address": "101",
+                "Address": "esp32-03/6",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             },
@@ -199,7 +199,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Yard Light 1",
                 "CategoryId": categories["Lights"].Id,
                 "ControlType": "onOff", 
-                "Address": "201",
+                "Address": "esp32-05/12",
                 "IsActive": True,
                 "SectionId": sections["Bypass Section"].Id
             },
@@ -207,7 +207,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Yard Light 2",
                 "CategoryId": categories["Lights"].Id,
                 "ControlType": "toggle",
-                "Address": "202", 
+                "Address": "esp32-05/13", 
                 "IsActive": True,
                 "SectionId": sections["Siding Section"].Id
             },
@@ -215,7 +215,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Station House",
                 "CategoryId": categories["Buildings"].Id,
                 "ControlType": "timed",
-                "Address": "301",
+                "Address": "esp32-05/11",
                 "IsActive": True,
                 "TimedMs": 5000,
                 "SectionId": sections["Mainline West"].Id
@@ -224,7 +224,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Switch 1 Motor",
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle",
-                "Address": "401",
+                "Address": "esp32-01/2",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             },
@@ -232,7 +232,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Switch 2 Motor", 
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle",
-                "Address": "402",
+                "Address": "esp32-01/3",
                 "IsActive": True,
                 "SectionId": sections["Bypass Section"].Id
             },
@@ -240,7 +240,7 @@ def seed_dev_layout(test_mode=False):
                 "Name": "Switch 3 Motor",
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle", 
-                "Address": "403",
+                "Address": "esp32-02/4",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             }
@@ -539,7 +539,7 @@ if __name__ == "__main__":
                 "Name": "Main Signal",
                 "CategoryId": categories["Signals"].Id,
                 "ControlType": "onOff",
-                "Address": "101",
+                "Address": "esp32-03/6",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             },
@@ -547,7 +547,7 @@ if __name__ == "__main__":
                 "Name": "Yard Light 1",
                 "CategoryId": categories["Lights"].Id,
                 "ControlType": "onOff", 
-                "Address": "201",
+                "Address": "esp32-05/12",
                 "IsActive": True,
                 "SectionId": sections["Bypass Section"].Id
             },
@@ -555,7 +555,7 @@ if __name__ == "__main__":
                 "Name": "Yard Light 2",
                 "CategoryId": categories["Lights"].Id,
                 "ControlType": "toggle",
-                "Address": "202", 
+                "Address": "esp32-05/13", 
                 "IsActive": True,
                 "SectionId": sections["Siding Section"].Id
             },
@@ -563,7 +563,7 @@ if __name__ == "__main__":
                 "Name": "Station House",
                 "CategoryId": categories["Buildings"].Id,
                 "ControlType": "timed",
-                "Address": "301",
+                "Address": "esp32-05/11",
                 "IsActive": True,
                 "TimedMs": 5000,
                 "SectionId": sections["Mainline West"].Id
@@ -572,7 +572,7 @@ if __name__ == "__main__":
                 "Name": "Switch 1 Motor",
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle",
-                "Address": "401",
+                "Address": "esp32-01/2",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             },
@@ -580,7 +580,7 @@ if __name__ == "__main__":
                 "Name": "Switch 2 Motor", 
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle",
-                "Address": "402",
+                "Address": "esp32-01/3",
                 "IsActive": True,
                 "SectionId": sections["Bypass Section"].Id
             },
@@ -588,7 +588,7 @@ if __name__ == "__main__":
                 "Name": "Switch 3 Motor",
                 "CategoryId": categories["Switches"].Id,
                 "ControlType": "toggle", 
-                "Address": "403",
+                "Address": "esp32-02/4",
                 "IsActive": True,
                 "SectionId": sections["Mainline East"].Id
             }
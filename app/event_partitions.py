@@ -0,0 +1,245 @@
+"""
+Partition maintenance for AssetLocationEvents (Postgres only).
+
+Migration 005 turns AssetLocationEvents into a table range-partitioned on
+"Timestamp", one partition per month, plus a DEFAULT partition that catches
+anything outside the prepared ranges. From then on ``ensure`` adds one
+partition per day or month (ASSET_EVENTS_PARTITION_INTERVAL, default
+"month"); periods an existing partition already covers are skipped, so
+switching to "day" starts with the first month not yet prepared.
+Time-filtered queries then only touch the partitions they overlap.
+
+The primary key on Postgres is ("EventId", "Timestamp"), because the
+partition key has to be part of it. The ORM keeps mapping EventId alone: it
+comes from one sequence shared by every partition, so it is unique on its
+own and ``get(AssetLocationEvent, id)`` stays valid.
+
+This module keeps it that way. Run it from cron (or ``Scripts/migrate.sh
+partitions``):
+
+    python event_partitions.py ensure      # create the next ASSET_EVENTS_PARTITIONS_AHEAD partitions
+    python event_partitions.py retention   # roll up, then drop, partitions past retention
+    python event_partitions.py status      # list partitions and approximate row counts
+
+Retention (ASSET_EVENTS_RETENTION_DAYS, 0 = keep forever) never runs DELETE
+on a partition. Each expired partition is summarized into AssetLocationHourly
+(one row per asset per hour), then detached and dropped.
+"""
+
+import argparse
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+PARENT = "AssetLocationEvents"
+DEFAULT_PARTITION = f"{PARENT}_default"
+ROLLUP = "AssetLocationHourly"
+INTERVALS = ("day", "month")
+
+INTERVAL = os.getenv("ASSET_EVENTS_PARTITION_INTERVAL", "month")
+PARTITIONS_AHEAD = int(os.getenv("ASSET_EVENTS_PARTITIONS_AHEAD", "3"))
+RETENTION_DAYS = int(os.getenv("ASSET_EVENTS_RETENTION_DAYS", "0"))
+
+_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+
+
+@dataclass(frozen=True)
+class Partition:
+    name: str
+    start: Optional[datetime]  # None for the DEFAULT partition
+    end: Optional[datetime]
+
+    @property
+    def is_default(self) -> bool:
+        return self.start is None
+
+
+# ---- period arithmetic ---------------------------------------------------------
+def period_start(ts: datetime, interval: str = INTERVAL) -> datetime:
+    if interval == "day":
+        return datetime(ts.year, ts.month, ts.day)
+    if interval == "month":
+        return datetime(ts.year, ts.month, 1)
+    raise ValueError(f"Unknown partition interval: {interval!r} (use one of {INTERVALS})")
+
+
+def next_period(start: datetime, interval: str = INTERVAL) -> datetime:
+    if interval == "day":
+        return start + timedelta(days=1)
+    if interval == "month":
+        return datetime(start.year + start.month // 12, start.month % 12 + 1, 1)
+    raise ValueError(f"Unknown partition interval: {interval!r} (use one of {INTERVALS})")
+
+
+def partition_name(start: datetime, interval: str = INTERVAL) -> str:
+    suffix = start.strftime("%Y_%m_%d" if interval == "day" else "%Y_%m")
+    return f"{PARENT}_p{suffix}"
+
+
+def parse_bound(expr: str) -> tuple[Optional[datetime], Optional[datetime]]:
+    """(start, end) from pg_get_expr(relpartbound); (None, None) for DEFAULT."""
+    m = _BOUND.search(expr)
+    if not m:
+        return None, None
+    return datetime.fromisoformat(m.group(1)), datetime.fromisoformat(m.group(2))
+
+
+def expired(partitions: List[Partition], now: datetime, retention_days: int) -> List[Partition]:
+    """Ranged partitions that end on or before the retention cutoff."""
+    if retention_days <= 0:
+        return []
+    cutoff = now - timedelta(days=retention_days)
+    return [p for p in partitions if not p.is_default and p.end <= cutoff]
+
+
+# ---- DDL -----------------------------------------------------------------------
+def list_partitions(conn: Connection) -> List[Partition]:
+    rows = conn.execute(text("""
+        SELECT c.relname, pg_get_expr(c.relpartbound, c.oid)
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+    """), {"parent": PARENT}).all()
+    parts = [Partition(name, *parse_bound(expr)) for name, expr in rows]
+    return sorted(parts, key=lambda p: (p.start is None, p.start or datetime.min))
+
+
+def create_partition(conn: Connection, start: datetime, interval: str = INTERVAL) -> Optional[str]:
+    """
+    Create the partition for the period starting at start; None if an existing
+    partition already covers any of it.
+
+    Rows that already landed in the DEFAULT partition for that range are moved
+    into the new table before it is attached, otherwise ATTACH would refuse.
+    """
+    name = partition_name(start, interval)
+    end = next_period(start, interval)
+    for p in list_partitions(conn):
+        if p.name == name or (not p.is_default and p.start < end and start < p.end):
+            return None
+    bounds = {"start": start, "end": end}
+    conn.execute(text(f'CREATE TABLE "{name}" (LIKE "{PARENT}" INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM "{DEFAULT_PARTITION}"
+            WHERE "Timestamp" >= :start AND "Timestamp" < :end
+            RETURNING *
+        )
+        INSERT INTO "{name}" SELECT * FROM moved
+    """), bounds)
+    conn.execute(text(
+        f"""ALTER TABLE "{PARENT}" ATTACH PARTITION "{name}" """
+        f"""FOR VALUES FROM ('{start.isoformat(sep=" ")}') TO ('{end.isoformat(sep=" ")}')"""
+    ))
+    return name
+
+
+def ensure_partitions(conn: Connection, now: Optional[datetime] = None, ahead: int = PARTITIONS_AHEAD,
+                      interval: str = INTERVAL, since: Optional[datetime] = None) -> List[str]:
+    """Make sure partitions exist from since (default: now) through ahead periods past now."""
+    now = now or datetime.utcnow()
+    start = period_start(since or now, interval)
+    last = period_start(now, interval)
+    for _ in range(ahead):
+        last = next_period(last, interval)
+    created = []
+    while start <= last:
+        name = create_partition(conn, start, interval)
+        if name:
+            created.append(name)
+        start = next_period(start, interval)
+    return created
+
+
+def rollup(conn: Connection, table: str, start: Optional[datetime] = None, end: Optional[datetime] = None) -> int:
+    """Fold a table's events into AssetLocationHourly. Additive: run it once per range, right before the drop."""
+    where = ""
+    params = {}
+    if start is not None:
+        where = 'WHERE "Timestamp" >= :start AND "Timestamp" < :end'
+        params = {"start": start, "end": end}
+    result = conn.execute(text(f"""
+        INSERT INTO "{ROLLUP}" ("AssetId", "Hour", "Reads", "FirstSeen", "LastSeen", "LastLocation", "LastReaderId")
+        SELECT "AssetId",
+               date_trunc('hour', "Timestamp"),
+               count(*),
+               min("Timestamp"),
+               max("Timestamp"),
+               (array_agg("Location" ORDER BY "Timestamp" DESC, "EventId" DESC))[1],
+               (array_agg("ReaderId" ORDER BY "Timestamp" DESC, "EventId" DESC))[1]
+        FROM "{table}"
+        {where}
+        GROUP BY 1, 2
+        ON CONFLICT ("AssetId", "Hour") DO UPDATE SET
+            "Reads" = "{ROLLUP}"."Reads" + excluded."Reads",
+            "FirstSeen" = least("{ROLLUP}"."FirstSeen", excluded."FirstSeen"),
+            "LastSeen" = greatest("{ROLLUP}"."LastSeen", excluded."LastSeen"),
+            "LastLocation" = CASE WHEN excluded."LastSeen" >= "{ROLLUP}"."LastSeen"
+                                  THEN excluded."LastLocation" ELSE "{ROLLUP}"."LastLocation" END,
+            "LastReaderId" = CASE WHEN excluded."LastSeen" >= "{ROLLUP}"."LastSeen"
+                                  THEN excluded."LastReaderId" ELSE "{ROLLUP}"."LastReaderId" END
+    """), params)
+    return result.rowcount
+
+
+def apply_retention(conn: Connection, now: Optional[datetime] = None,
+                    retention_days: int = RETENTION_DAYS) -> List[str]:
+    """Roll up and drop every partition past retention. Returns the dropped names."""
+    now = now or datetime.utcnow()
+    dropped = []
+    for p in expired(list_partitions(conn), now, retention_days):
+        rollup(conn, p.name)
+        conn.execute(text(f'ALTER TABLE "{PARENT}" DETACH PARTITION "{p.name}"'))
+        conn.execute(text(f'DROP TABLE "{p.name}"'))
+        dropped.append(p.name)
+    if retention_days > 0:
+        # stragglers outside any prepared range; the only rows ever DELETEd
+        cutoff = {"start": datetime.min, "end": now - timedelta(days=retention_days)}
+        rollup(conn, DEFAULT_PARTITION, **cutoff)
+        conn.execute(text(f'DELETE FROM "{DEFAULT_PARTITION}" WHERE "Timestamp" < :end'), cutoff)
+    return dropped
+
+
+def partition_status(conn: Connection) -> List[dict]:
+    estimates = dict(conn.execute(text("""
+        SELECT c.relname, c.reltuples::bigint
+        FROM pg_class c JOIN pg_inherits i ON i.inhrelid = c.oid
+        JOIN pg_class p ON p.oid = i.inhparent
+        WHERE p.relname = :parent
+    """), {"parent": PARENT}).all())
+    return [
+        {"name": p.name, "start": p.start, "end": p.end, "rows": max(estimates.get(p.name, 0), 0)}
+        for p in list_partitions(conn)
+    ]
+
+
+if __name__ == "__main__":
+    from db import engine
+
+    parser = argparse.ArgumentParser(description="Maintain AssetLocationEvents partitions")
+    parser.add_argument("command", choices=["ensure", "retention", "status"])
+    parser.add_argument("--ahead", type=int, default=PARTITIONS_AHEAD, help="periods to create past the current one")
+    parser.add_argument("--retention-days", type=int, default=RETENTION_DAYS, help="0 keeps everything")
+    args = parser.parse_args()
+
+    if engine.dialect.name != "postgresql":
+        print(f"❌ Partitioning needs Postgres (DATABASE_URL is {engine.dialect.name})")
+        exit(1)
+
+    with engine.begin() as conn:
+        if args.command == "ensure":
+            created = ensure_partitions(conn, ahead=args.ahead)
+            print(f"✅ Created {len(created)} partition(s): {', '.join(created) or '-'}")
+        elif args.command == "retention":
+            dropped = apply_retention(conn, retention_days=args.retention_days)
+            print(f"✅ Rolled up and dropped {len(dropped)} partition(s): {', '.join(dropped) or '-'}")
+        else:
+            for row in partition_status(conn):
+                span = "DEFAULT" if row["start"] is None else f"{row['start']:%Y-%m-%d} .. {row['end']:%Y-%m-%d}"
+                print(f"{row['name']:<40} {span:<26} ~{row['rows']} rows")
@@ -0,0 +1,155 @@
+"""
+Compiled, immutable index over accessory_map.yaml.
+
+The YAML file is parsed once into read-only lookup tables keyed by accessory
+name, ESP32 node id and (node, pin). ``get_accessory_index()`` only re-parses
+when the file's mtime changes (or on an explicit ``reload_accessory_index()``),
+so a lookup is a stat plus a dict hit instead of a file read and YAML parse.
+Indexes are cached per resolved path, so loading another map file never
+replaces the one at ACCESSORY_MAP_PATH.
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+
+import yaml
+
+from logging_config import get_logger
+
+logger = get_logger("hardware.accessory_map")
+
+ACCESSORY_MAP_PATH = os.getenv(
+    "ACCESSORY_MAP_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "accessory_map.yaml"),
+)
+
+
+class AccessoryMapError(Exception):
+    """accessory_map.yaml is missing or invalid."""
+
+
+@dataclass(frozen=True)
+class AccessoryEntry:
+    name: str
+    esp32_node: Optional[str]
+    address: Optional[str]
+    pin: Optional[int]
+    control_type: Optional[str]
+    timed_duration_ms: Optional[int]
+    description: str
+
+
+@dataclass(frozen=True)
+class NodeEntry:
+    node_id: str
+    ip: Optional[str]
+    port: Optional[int]
+    description: str
+    location: str
+
+
+@dataclass(frozen=True)
+class AccessoryIndex:
+    by_name: Mapping[str, AccessoryEntry]
+    by_node: Mapping[str, Tuple[AccessoryEntry, ...]]
+    by_pin: Mapping[Tuple[str, int], AccessoryEntry]
+    nodes: Mapping[str, NodeEntry]
+    mtime: float
+
+    @classmethod
+    def from_config(cls, config: dict, mtime: float = 0.0) -> "AccessoryIndex":
+        by_name = {}
+        by_node: dict = {}
+        by_pin = {}
+        for name, d in (config.get("accessories") or {}).items():
+            d = d or {}
+            entry = AccessoryEntry(
+                name=name,
+                esp32_node=d.get("esp32_node"),
+                address=d.get("address"),
+                pin=d.get("pin"),
+                control_type=d.get("control_type"),
+                timed_duration_ms=d.get("timed_duration_ms"),
+                description=d.get("description", ""),
+            )
+            by_name[name] = entry
+            if entry.esp32_node:
+                by_node.setdefault(entry.esp32_node, []).append(entry)
+                if entry.pin is not None:
+                    by_pin[(entry.esp32_node, entry.pin)] = entry
+
+        nodes = {
+            node_id: NodeEntry(
+                node_id=node_id,
+                ip=(d or {}).get("ip"),
+                port=(d or {}).get("port"),
+                description=(d or {}).get("description", ""),
+                location=(d or {}).get("location", ""),
+            )
+            for node_id, d in (config.get("esp32_nodes") or {}).items()
+        }
+        return cls(
+            by_name=MappingProxyType(by_name),
+            by_node=MappingProxyType({k: tuple(v) for k, v in by_node.items()}),
+            by_pin=MappingProxyType(by_pin),
+            nodes=MappingProxyType(nodes),
+            mtime=mtime,
+        )
+
+
+_indexes: Dict[str, AccessoryIndex] = {}  # resolved path -> index
+_bad_mtimes: Dict[str, float] = {}  # resolved path -> last mtime that failed to parse
+_lock = threading.Lock()
+
+
+def _resolve(path: Optional[str]) -> str:
+    return os.path.realpath(path or ACCESSORY_MAP_PATH)
+
+
+def _load(path: str) -> AccessoryIndex:
+    try:
+        mtime = os.stat(path).st_mtime
+        with open(path, "r") as f:
+            config = yaml.safe_load(f) or {}
+    except FileNotFoundError as e:
+        raise AccessoryMapError(f"Accessory map file not found: {path}") from e
+    except yaml.YAMLError as e:
+        raise AccessoryMapError(f"Error parsing accessory map: {e}") from e
+    return AccessoryIndex.from_config(config, mtime)
+
+
+def reload_accessory_index(path: Optional[str] = None) -> AccessoryIndex:
+    """Re-parse the map unconditionally and swap it in."""
+    path = _resolve(path)
+    with _lock:
+        index = _indexes[path] = _load(path)
+        logger.info("Accessory map loaded", path=path, accessories=len(index.by_name), nodes=len(index.nodes))
+        return index
+
+
+def get_accessory_index(path: Optional[str] = None) -> AccessoryIndex:
+    """
+    Current index, re-parsed only if the file's mtime moved.
+
+    A broken edit keeps serving the last good index rather than taking the
+    API down; the error is logged.
+    """
+    path = _resolve(path)
+    index = _indexes.get(path)
+    try:
+        mtime = os.stat(path).st_mtime
+    except OSError:
+        mtime = None
+    if index is not None and (mtime is None or mtime in (index.mtime, _bad_mtimes.get(path))):
+        return index
+    try:
+        return reload_accessory_index(path)
+    except AccessoryMapError as e:
+        if index is None:
+            raise
+        _bad_mtimes[path] = mtime
+        logger.error("Keeping previous accessory map", error=str(e))
+        return index
@@ -0,0 +1,260 @@
+"""
+HTTP transport to ESP32 relay nodes (HW_MODE=esp32).
+
+All commands share one pooled async HTTP client, so repeated commands to a
+node reuse a keep-alive connection instead of paying TCP setup each time.
+Each node gets its own concurrency cap; the microcontrollers handle only a
+few sockets at once and should not be flooded by a burst.
+
+Commands for the same node that arrive within a short window
+(ESP32_BATCH_WINDOW_MS, default 3 ms) are coalesced into one
+``POST /control/batch``, so a scene or route change costs one round-trip per
+node rather than one per pin. A window of 0 sends every command on its own.
+
+Accessory addresses take the form "<node>/<pin>", where <node> is either an
+``esp32_nodes`` id from accessory_map.yaml (e.g. "esp32-01/2") or a literal
+"host:port" (e.g. "192.168.1.101:8080/2").
+"""
+
+import asyncio
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from hardware.accessory_map import AccessoryMapError, get_accessory_index
+from logging_config import get_logger
+
+logger = get_logger("hardware.esp32")
+
+# Node-side actions that are safe to resend after an ambiguous failure
+IDEMPOTENT_ACTIONS = {"on", "off"}
+
+
+class HardwareError(Exception):
+    """A hardware command could not be delivered."""
+
+
+def load_nodes() -> Dict[str, str]:
+    """
+    Node id -> base URL.
+
+    ESP32_NODES ("esp32-01=http://127.0.0.1:8081,esp32-02=...") overrides the
+    ``esp32_nodes`` section of accessory_map.yaml, e.g. to aim at the mock nodes.
+    """
+    override = os.getenv("ESP32_NODES")
+    if override:
+        nodes = {}
+        for item in override.split(","):
+            node_id, _, url = item.strip().partition("=")
+            if node_id and url:
+                nodes[node_id] = url.rstrip("/")
+        return nodes
+
+    try:
+        index = get_accessory_index()
+    except AccessoryMapError as e:
+        logger.error("Could not load ESP32 nodes from accessory map", error=str(e))
+        return {}
+    return {
+        node.node_id: f"http://{node.ip}:{node.port or 80}"
+        for node in index.nodes.values()
+        if node.ip
+    }
+
+
+class Esp32Transport:
+    def __init__(
+        self,
+        nodes: Optional[Dict[str, str]] = None,
+        max_per_node: Optional[int] = None,
+        timeout_ms: Optional[int] = None,
+        retries: Optional[int] = None,
+        batch_window_ms: Optional[float] = None,
+        max_batch: Optional[int] = None,
+    ):
+        self.nodes = nodes if nodes is not None else load_nodes()
+        self.max_per_node = max_per_node or int(os.getenv("ESP32_MAX_PER_NODE", "4"))
+        self.timeout_ms = timeout_ms or int(os.getenv("ESP32_TIMEOUT_MS", "1500"))
+        self.retries = retries if retries is not None else int(os.getenv("ESP32_RETRIES", "2"))
+        self.batch_window_ms = (
+            batch_window_ms if batch_window_ms is not None else float(os.getenv("ESP32_BATCH_WINDOW_MS", "3"))
+        )
+        self.max_batch = max_batch or int(os.getenv("ESP32_MAX_BATCH", "32"))
+        self._client: Optional[httpx.AsyncClient] = None
+        self._limits: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        # base_url -> commands waiting for the window to close
+        self._batches: Dict[str, List[Tuple[Dict[str, Any], asyncio.Future]]] = {}
+        self._flush_timers: Dict[str, asyncio.TimerHandle] = {}
+        self._shipping: set[asyncio.Task] = set()
+
+    def resolve(self, address: str) -> Tuple[str, int]:
+        """Split an accessory address into (node base URL, pin)."""
+        node, sep, pin = address.rpartition("/")
+        if not sep or not node or not pin.isdigit():
+            raise HardwareError(f"Invalid ESP32 address '{address}' (expected '<node>/<pin>')")
+        base_url = self.nodes.get(node) or (f"http://{node}" if ":" in node else None)
+        if base_url is None:
+            raise HardwareError(f"Unknown ESP32 node '{node}'")
+        return base_url, int(pin)
+
+    async def send(self, address: str, action: str, duration_ms: Optional[int] = None) -> Dict[str, Any]:
+        base_url, pin = self.resolve(address)
+        command: Dict[str, Any] = {"pin": pin, "action": action}
+        if duration_ms is not None:
+            command["duration_ms"] = duration_ms
+        if self.batch_window_ms <= 0:
+            return await self.post(base_url, "/control", command, idempotent=action in IDEMPOTENT_ACTIONS)
+        return await self._enqueue(base_url, command)
+
+    async def post(self, base_url: str, path: str, payload: Any, idempotent: bool = False) -> Dict[str, Any]:
+        """POST with the node's concurrency cap held; retries transient failures."""
+        client = self._get_client()
+        limit = self._limits.get(base_url)
+        if limit is None:
+            limit = self._limits[base_url] = asyncio.Semaphore(self.max_per_node)
+
+        attempt = 0
+        async with limit:
+            while True:
+                try:
+                    resp = await client.post(base_url + path, json=payload)
+                    if resp.status_code < 500:
+                        resp.raise_for_status()
+                        return self._decode(base_url, resp)
+                    error: Exception = HardwareError(f"{base_url} returned {resp.status_code}")
+                    retryable = idempotent
+                except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                    # the request never reached the node: always safe to resend
+                    error, retryable = e, True
+                except httpx.TransportError as e:
+                    error, retryable = e, idempotent
+                except httpx.HTTPStatusError as e:
+                    raise HardwareError(f"{base_url} rejected command: {e.response.text}") from e
+
+                if not retryable or attempt >= self.retries:
+                    logger.error("ESP32 command failed", node=base_url, path=path, attempts=attempt + 1, error=str(error))
+                    raise HardwareError(f"ESP32 node {base_url} unreachable: {error}") from error
+                attempt += 1
+                await asyncio.sleep(0.05 * 2 ** (attempt - 1))
+
+    @staticmethod
+    def _decode(base_url: str, resp: httpx.Response) -> Dict[str, Any]:
+        try:
+            body = resp.json()
+        except ValueError as e:
+            raise HardwareError(f"{base_url} sent a malformed reply: {e}") from e
+        if not isinstance(body, dict):
+            raise HardwareError(f"{base_url} sent a malformed reply: expected an object")
+        return body
+
+    async def aclose(self):
+        for base_url in list(self._batches):
+            self._flush(base_url)
+        if self._shipping:
+            await asyncio.gather(*self._shipping, return_exceptions=True)
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    # ---- coalescing ------------------------------------------------------------
+    async def _enqueue(self, base_url: str, command: Dict[str, Any]) -> Dict[str, Any]:
+        loop = self._bind_loop()
+        fut = loop.create_future()
+        pending = self._batches.setdefault(base_url, [])
+        pending.append((command, fut))
+        if len(pending) == 1:
+            self._flush_timers[base_url] = loop.call_later(self.batch_window_ms / 1000.0, self._flush, base_url)
+        elif len(pending) >= self.max_batch:
+            self._flush(base_url)
+        return await fut
+
+    def _flush(self, base_url: str):
+        timer = self._flush_timers.pop(base_url, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._batches.pop(base_url, None)
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._ship(base_url, batch))
+            self._shipping.add(task)
+            task.add_done_callback(self._shipping.discard)
+
+    async def _ship(self, base_url: str, batch: List[Tuple[Dict[str, Any], asyncio.Future]]):
+        idempotent = all(cmd["action"] in IDEMPOTENT_ACTIONS for cmd, _ in batch)
+        try:
+            if len(batch) == 1:
+                results = [await self.post(base_url, "/control", batch[0][0], idempotent=idempotent)]
+            else:
+                body = await self.post(base_url, "/control/batch", {"commands": [cmd for cmd, _ in batch]}, idempotent=idempotent)
+                results = body.get("results") or []
+        except Exception as e:
+            for _, fut in batch:
+                if not fut.done():
+                    fut.set_exception(e)
+            return
+
+        for i, (cmd, fut) in enumerate(batch):
+            if fut.done():
+                continue  # caller gave up waiting
+            result = results[i] if i < len(results) else None
+            if result is None:
+                fut.set_exception(HardwareError(f"{base_url} returned no result for pin {cmd['pin']}"))
+            elif result.get("status", "success") != "success":
+                fut.set_exception(HardwareError(f"{base_url} rejected pin {cmd['pin']}: {result.get('error')}"))
+            else:
+                fut.set_result(result)
+
+    # ---- connection management -----------------------------------------------
+    def _bind_loop(self) -> asyncio.AbstractEventLoop:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # pooled connections, semaphores and timers belong to the loop that made them
+            self._release_loop(loop)
+            self._client = None
+            self._limits = {}
+            self._batches = {}
+            self._flush_timers = {}
+            self._loop = loop
+        return loop
+
+    def _release_loop(self, loop: asyncio.AbstractEventLoop):
+        """Cancel what is still pending on the previous loop and close its client."""
+        old_loop, client = self._loop, self._client
+        for timer in self._flush_timers.values():
+            timer.cancel()
+        waiting = [fut for batch in self._batches.values() for _, fut in batch if not fut.done()]
+        if waiting:
+            logger.warning("ESP32 commands dropped with their event loop", commands=len(waiting))
+            if old_loop is not None and not old_loop.is_closed():
+                for fut in waiting:
+                    old_loop.call_soon_threadsafe(fut.cancel)
+        if client is None:
+            return
+        if old_loop is not None and old_loop.is_running():
+            asyncio.run_coroutine_threadsafe(client.aclose(), old_loop)
+        else:
+            task = loop.create_task(self._close_stale_client(client))
+            self._shipping.add(task)
+            task.add_done_callback(self._shipping.discard)
+
+    @staticmethod
+    async def _close_stale_client(client: httpx.AsyncClient):
+        try:
+            await client.aclose()
+        except RuntimeError as e:
+            # its loop is closed; the sockets are only freed when the client is collected
+            logger.warning("Could not close ESP32 client left by a finished event loop", error=str(e))
+
+    def _get_client(self) -> httpx.AsyncClient:
+        self._bind_loop()
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.timeout_ms / 1000.0),
+                limits=httpx.Limits(
+                    max_connections=self.max_per_node * max(len(self.nodes), 1),
+                    max_keepalive_connections=self.max_per_node * max(len(self.nodes), 1),
+                    keepalive_expiry=30.0,
+                ),
+            )
+        return self._client
@@ -1,16 +1,76 @@
-import os, time
+import asyncio
+import os
+import time
+
+from hardware.esp32 import Esp32Transport
+from logging_config import get_logger
+from metrics import Counter, Histogram
+
+logger = get_logger("hardware.provider")
+
+COMMANDS = Counter("hardware_commands_total", "Relay edges sent, by outcome", ["mode", "command", "result"])
+COMMAND_SECONDS = Histogram(
+    "hardware_command_seconds", "Time to send one relay edge", ["mode", "command"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5),
+)
+
 
 class HardwareProvider:
+    """
+    Async hardware command engine.
+
+    Every edge is an awaitable coroutine, so a request never ties up a worker
+    thread while a relay is held. The OFF edge of a pulse runs as its own task
+    on the event loop, which lets hundreds of pulses be in flight at once and
+    guarantees the relay is released even if the awaiting request goes away.
+    """
+
     def __init__(self):
-        self.mode = os.getenv("HW_MODE", "mock")  # "mock" | "gpio" | "mcp23017" | "modbus" etc.
+        self.mode = os.getenv("HW_MODE", "mock")  # "mock" | "esp32"
+        self._pending: set[asyncio.Task] = set()
+        self._esp32 = Esp32Transport() if self.mode == "esp32" else None
+
+    async def set_on(self, address: str):
+        await self._command(address, "on")
+
+    async def set_off(self, address: str):
+        await self._command(address, "off")
+
+    async def pulse(self, address: str, ms: int):
+        logger.debug("Pulse", mode=self.mode, address=address, ms=ms)
+        await self.set_on(address)
+        off_edge = asyncio.create_task(self._off_after(address, ms))
+        self._pending.add(off_edge)
+        off_edge.add_done_callback(self._pending.discard)
+        # shield: a cancelled caller must not leave the relay energised
+        await asyncio.shield(off_edge)
+
+    async def _off_after(self, address: str, ms: int):
+        await asyncio.sleep(ms / 1000)
+        await self.set_off(address)
 
-    def set_on(self, address: str):
-        # TODO: implement per mode
-        print(f"[{self.mode}] ON {address}")
+    async def aclose(self):
+        if self._pending:
+            await asyncio.gather(*self._pending, return_exceptions=True)
+        if self._esp32 is not None:
+            await self._esp32.aclose()
 
-    def set_off(self, address: str):
-        print(f"[{self.mode}] OFF {address}")
+    async def _command(self, address: str, state: str):
+        start = time.perf_counter()
+        result = "error"
+        try:
+            await self._write(address, state)
+            result = "ok"
+        except asyncio.CancelledError:
+            result = "cancelled"
+            raise
+        finally:
+            COMMAND_SECONDS.labels(mode=self.mode, command=state).observe(time.perf_counter() - start)
+            COMMANDS.labels(mode=self.mode, command=state, result=result).inc()
 
-    def pulse(self, address: str, ms: int):
-        print(f"[{self.mode}] PULSE {address} {ms}ms")
-        time.sleep(ms / 1000)
\ No newline at end of file
+    async def _write(self, address: str, state: str):
+        if self._esp32 is not None:
+            await self._esp32.send(address, state)
+            return
+        # mock: no hardware attached, the edge is only logged
+        logger.debug("Relay edge", mode=self.mode, address=address, state=state)
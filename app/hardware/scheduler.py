@@ -0,0 +1,141 @@
+"""
+Deadline scheduler for delayed OFF edges.
+
+One asyncio task owns every pending OFF deadline in a binary heap, so a burst
+of timed accessories costs O(log n) per schedule and no extra threads.
+Re-triggering an accessory replaces its deadline; superseded heap entries are
+skipped lazily when they surface.
+"""
+
+import asyncio
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Hashable, Optional
+
+from logging_config import get_logger
+
+logger = get_logger("hardware.scheduler")
+
+
+@dataclass
+class ScheduledOff:
+    key: Hashable
+    address: str
+    deadline: float  # loop.time() based
+    seq: int
+
+
+class OffScheduler:
+    def __init__(self, provider, on_release: Optional[Callable[[Hashable], None]] = None):
+        self._provider = provider
+        self._on_release = on_release  # called with the key once its OFF has been driven
+        self._heap: list[tuple[float, int, Hashable]] = []
+        self._entries: dict[Hashable, ScheduledOff] = {}
+        self._seq = itertools.count()
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        self._firing: set[asyncio.Task] = set()
+
+    # ---- public API ----------------------------------------------------------
+    def schedule(self, key: Hashable, address: str, ms: int) -> ScheduledOff:
+        """Schedule (or reschedule) the OFF edge for key, ms from now."""
+        self._ensure_runner()
+        entry = ScheduledOff(
+            key=key,
+            address=address,
+            deadline=asyncio.get_running_loop().time() + ms / 1000.0,
+            seq=next(self._seq),
+        )
+        self._entries[key] = entry
+        heapq.heappush(self._heap, (entry.deadline, entry.seq, key))
+        self._compact()
+        self._wakeup.set()
+        return entry
+
+    def cancel(self, key: Hashable) -> bool:
+        """Drop the pending OFF for key; its heap slot is discarded lazily."""
+        return self._entries.pop(key, None) is not None
+
+    def pending(self) -> list[dict]:
+        """Snapshot of pending OFF edges, soonest first."""
+        now_loop = self._now()
+        now_wall = datetime.utcnow()
+        out = []
+        for e in sorted(self._entries.values(), key=lambda e: e.deadline):
+            remaining = max(0.0, e.deadline - now_loop)
+            out.append({
+                "id": e.key,
+                "address": e.address,
+                "offAt": now_wall + timedelta(seconds=remaining),
+                "remainingMs": int(remaining * 1000),
+            })
+        return out
+
+    async def aclose(self):
+        """Stop the runner and release everything still pending (fail safe: OFF)."""
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        entries = list(self._entries.values())
+        self._entries.clear()
+        self._heap.clear()
+        for e in entries:
+            await self._release(e)
+        if self._firing:
+            await asyncio.gather(*self._firing, return_exceptions=True)
+
+    # ---- internals -----------------------------------------------------------
+    def _now(self) -> float:
+        try:
+            return asyncio.get_running_loop().time()
+        except RuntimeError:
+            return time.monotonic()
+
+    def _ensure_runner(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        # first use, or the previous loop went away: restart on this loop
+        self._wakeup = asyncio.Event()
+        self._task = loop.create_task(self._run())
+
+    def _compact(self):
+        # bound the garbage left behind by reschedules/cancels
+        if len(self._heap) > 64 and len(self._heap) > 2 * len(self._entries):
+            self._heap = [(e.deadline, e.seq, e.key) for e in self._entries.values()]
+            heapq.heapify(self._heap)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._wakeup.clear()
+            now = loop.time()
+            while self._heap and self._heap[0][0] <= now:
+                _, seq, key = heapq.heappop(self._heap)
+                entry = self._entries.get(key)
+                if entry is None or entry.seq != seq:
+                    continue  # cancelled or superseded
+                del self._entries[key]
+                task = loop.create_task(self._release(entry))
+                self._firing.add(task)
+                task.add_done_callback(self._firing.discard)
+            timeout = self._heap[0][0] - now if self._heap else None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    async def _release(self, entry: ScheduledOff):
+        try:
+            await self._provider.set_off(entry.address)
+        except Exception as e:
+            logger.error("Scheduled OFF failed", key=entry.key, address=entry.address, error=str(e))
+            return
+        if self._on_release is not None:
+            self._on_release(entry.key)
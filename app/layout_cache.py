@@ -0,0 +1,84 @@
+"""
+In-process cache of the serialized track layout.
+
+``GET /track-layout`` is polled constantly by the command-center UI but only
+changes when someone edits sections, switches, accessories or connections.
+The routers that write those tables call ``bump_layout_version()``; the
+layout endpoint keeps one pre-encoded JSON snapshot per variant and rebuilds
+it only when the version has moved.
+
+The version counter lives in this process. With several uvicorn workers a
+write in one worker is not seen by the others, so snapshots also expire after
+LAYOUT_CACHE_MAX_AGE_S seconds (default 30) to bound that staleness.
+"""
+
+import hashlib
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Hashable, Optional
+
+MAX_AGE_S = float(os.getenv("LAYOUT_CACHE_MAX_AGE_S", "30"))
+
+_version = 0
+_lock = threading.Lock()
+
+
+@dataclass(frozen=True)
+class LayoutSnapshot:
+    version: int
+    body: bytes
+    etag: str
+    built_at: float
+
+
+_snapshots: Dict[Hashable, LayoutSnapshot] = {}
+
+
+def layout_version() -> int:
+    return _version
+
+
+def bump_layout_version() -> int:
+    """Invalidate every cached layout snapshot. Call after committing a layout write."""
+    global _version
+    with _lock:
+        _version += 1
+        return _version
+
+
+def get_snapshot(key: Hashable) -> Optional[LayoutSnapshot]:
+    snap = _snapshots.get(key)
+    if snap is None or snap.version != _version:
+        return None
+    if MAX_AGE_S > 0 and time.monotonic() - snap.built_at > MAX_AGE_S:
+        return None
+    return snap
+
+
+def store_snapshot(key: Hashable, version: int, body: bytes) -> LayoutSnapshot:
+    """
+    Cache body as the snapshot for key.
+
+    ``version`` must be read *before* querying; if a write lands mid-build the
+    snapshot is stored under the stale version and simply misses next time.
+    """
+    snap = LayoutSnapshot(
+        version=version,
+        body=body,
+        etag='"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"',
+        built_at=time.monotonic(),
+    )
+    _snapshots[key] = snap
+    return snap
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """RFC 9110 If-None-Match check (weak comparison, as required for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
@@ -2,12 +2,18 @@
 import os
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 
-from routers import categories, accessories, actions, track_lines, sections, switches, section_connections, train_assets, asset_location_events, logging, track_layout, test_accessory
+from routers import categories, accessories, actions, track_lines, sections, switches, section_connections, train_assets, asset_location_events, logging, track_layout, test_accessory, state, routes, trains
 from dev_seed import seed_dev_layout
+from db import SessionLocal, async_engine
+from track_graph import track_graph
+from rfid_ingest import rfid_writer
+from tag_cache import tag_cache
 from logging_config import setup_logging, get_logger
-from middleware import LoggingMiddleware
+from middleware import DbProfilingMiddleware, LoggingMiddleware
+from hardware.esp32 import HardwareError
+from metrics import CONTENT_TYPE, REGISTRY
 
 # Configure structured logging
 setup_logging()
@@ -28,6 +34,11 @@ async def unhandled_exception(request: Request, exc: Exception):
     )
     return JSONResponse(status_code=500, content={"detail": "Internal Server Error"})
 
+@app.exception_handler(HardwareError)
+async def hardware_error(request: Request, exc: HardwareError):
+    logger.warning("Hardware command failed", method=request.method, url=str(request.url), error=str(exc))
+    return JSONResponse(status_code=502, content={"detail": str(exc)})
+
 # ---- CORS ----
 ALLOWED_ORIGINS = [
     "http://localhost:3000",   # frontend container
@@ -46,10 +57,13 @@ app.add_middleware(
     allow_credentials=True,   # ok if you actually need cookies/auth; else set False
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 # Add structured logging middleware
 app.add_middleware(LoggingMiddleware)
+# Outside LoggingMiddleware so its log line carries the request's SQL counts
+app.add_middleware(DbProfilingMiddleware)
 
 @app.on_event("startup")
 async def startup_event():
@@ -57,6 +71,19 @@ async def startup_event():
     logger.info("Application starting up")
     seed_dev_layout()
     logger.info("Development seed data loaded")
+    track_graph.ensure_loaded(SessionLocal)
+    logger.info("Track graph loaded", sections=len(track_graph.sections), connections=len(track_graph.connections))
+    tag_cache.ensure_loaded(SessionLocal)
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Release any relays still waiting on a timed OFF
+    await actions.scheduler.aclose()
+    await actions.hw.aclose()
+    # Write out RFID reads still buffered
+    await rfid_writer.aclose()
+    await async_engine.dispose()
+    logger.info("Application shut down")
 
 # ---- health/version ----
 @app.get("/health")
@@ -70,6 +97,10 @@ def version():
         "built_at": os.getenv("BUILT_AT", ""),
     }
 
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    return Response(REGISTRY.render(), media_type=CONTENT_TYPE)
+
 # ---- routers ----
 app.include_router(categories.router)
 app.include_router(accessories.router)
@@ -82,4 +113,7 @@ app.include_router(train_assets.router)
 app.include_router(asset_location_events.router)
 app.include_router(logging.router)
 app.include_router(track_layout.router)
-app.include_router(test_accessory.router)
\ No newline at end of file
+app.include_router(test_accessory.router)
+app.include_router(state.router)
+app.include_router(routes.router)
+app.include_router(trains.router)
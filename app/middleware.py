@@ -1,8 +1,12 @@
 """
-Logging middleware for FastAPI application.
+Logging and profiling middleware for FastAPI application.
 
-This middleware logs every incoming HTTP request with structured logging,
+LoggingMiddleware logs every incoming HTTP request with structured logging,
 capturing method, path, query parameters, and client IP address.
+It also feeds /metrics: request counts by route template and status,
+latency histograms and requests in flight. DbProfilingMiddleware counts
+the SQL statements and database time each request spends, for that log line
+and for /metrics.
 """
 
 import time
@@ -12,7 +16,30 @@ from urllib.parse import parse_qs
 from fastapi import Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from db_profiling import QueryStats, query_stats
 from logging_config import get_logger, extract_client_ip
+from metrics import DEFAULT_BUCKETS, Counter, Gauge, Histogram
+
+REQUESTS = Counter("http_requests_total", "HTTP requests completed", ["method", "route", "status"])
+LATENCY = Histogram(
+    "http_request_duration_seconds", "HTTP request latency until the response starts", ["method", "route"],
+    buckets=DEFAULT_BUCKETS,
+)
+IN_FLIGHT = Gauge("http_requests_in_flight", "HTTP requests being handled", ["method"])
+
+DB_QUERIES = Histogram(
+    "http_request_db_queries", "SQL statements issued per request", ["method", "route"],
+    buckets=(0, 1, 2, 3, 5, 8, 13, 20, 50, 100, 200),
+)
+DB_SECONDS = Histogram(
+    "http_request_db_seconds", "Time per request spent executing SQL", ["method", "route"], buckets=DEFAULT_BUCKETS,
+)
+
+
+def route_template(request: Request) -> str:
+    """Path template of the matched route ("/sections/{id}"), so metrics get one series per route, not per id."""
+    route = request.scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
 
 
 class LoggingMiddleware(BaseHTTPMiddleware):
@@ -26,6 +53,9 @@ class LoggingMiddleware(BaseHTTPMiddleware):
     - Client IP address
     - Response status code
     - Processing time
+    - SQL statement count and database time (with DbProfilingMiddleware)
+
+    and records the request in the http_* metrics.
     """
     
     def __init__(self, app):
@@ -43,7 +73,7 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         Returns:
             The HTTP response from the application
         """
-        start_time = time.time()
+        start_time = time.perf_counter()
         
         # Extract request details
         method = request.method
@@ -65,14 +95,19 @@ class LoggingMiddleware(BaseHTTPMiddleware):
         }
         
         # Process the request
+        in_flight = IN_FLIGHT.labels(method=method)
+        in_flight.inc()
+        status_code = 500
         try:
             response = await call_next(request)
+            status_code = response.status_code
             
             # Add response details
             log_context.update({
-                "status_code": response.status_code,
-                "processing_time_ms": round((time.time() - start_time) * 1000, 2)
+                "status_code": status_code,
+                "processing_time_ms": round((time.perf_counter() - start_time) * 1000, 2)
             })
+            self._add_db_stats(log_context)
             
             # Log successful request
             self.logger.info("HTTP request processed", **log_context)
@@ -82,10 +117,43 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             log_context.update({
                 "status_code": 500,
                 "error": str(exc),
-                "processing_time_ms": round((time.time() - start_time) * 1000, 2)
+                "processing_time_ms": round((time.perf_counter() - start_time) * 1000, 2)
             })
+            self._add_db_stats(log_context)
             
             self.logger.error("HTTP request failed", **log_context)
             raise
+        finally:
+            in_flight.dec()
+            route = route_template(request)
+            REQUESTS.labels(method=method, route=route, status=str(status_code)).inc()
+            LATENCY.labels(method=method, route=route).observe(time.perf_counter() - start_time)
         
-        return response
\ No newline at end of file
+        return response
+
+    @staticmethod
+    def _add_db_stats(log_context: dict):
+        stats = query_stats.get()
+        if stats is not None:
+            log_context.update({"db_query_count": stats.count, "db_time_ms": stats.ms})
+
+
+class DbProfilingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware to count SQL statements and database time per request.
+
+    Must wrap LoggingMiddleware (be added after it) so the request log line
+    can include the counts. Statements are counted until the endpoint
+    returns; a streamed body's queries are not included.
+    """
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        stats = QueryStats()
+        token = query_stats.set(stats)
+        try:
+            return await call_next(request)
+        finally:
+            query_stats.reset(token)
+            labels = {"method": request.method, "route": route_template(request)}
+            DB_QUERIES.labels(**labels).observe(stats.count)
+            DB_SECONDS.labels(**labels).observe(stats.seconds)
\ No newline at end of file
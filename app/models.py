@@ -1,5 +1,5 @@
 # app/models.py
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Float, DateTime, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from db import Base
@@ -11,7 +11,7 @@ class Category(Base):
     Description = Column(String(255), nullable=True)
     SortOrder = Column(Integer, nullable=False, default=0)
 
-    Accessories = relationship("Accessory", back_populates="Category", lazy="selectin")
+    Accessories = relationship("Accessory", back_populates="Category")
 
 class Accessory(Base):
     __tablename__ = "Accessories"
@@ -24,8 +24,8 @@ class Accessory(Base):
     TimedMs = Column(Integer, nullable=True)
     SectionId = Column(Integer, ForeignKey("Sections.Id"), nullable=True, index=True)
 
-    Category = relationship("Category", back_populates="Accessories", lazy="joined")
-    Section = relationship("Section", back_populates="Accessories", lazy="joined")
+    Category = relationship("Category", back_populates="Accessories")
+    Section = relationship("Section", back_populates="Accessories")
 
 
 class TrackLine(Base):
@@ -35,7 +35,7 @@ class TrackLine(Base):
     Description = Column(String(255), nullable=True)
     IsActive = Column(Boolean, nullable=False, default=True)
 
-    Sections = relationship("Section", back_populates="TrackLine", lazy="selectin")
+    Sections = relationship("Section", back_populates="TrackLine")
 
 
 class Section(Base):
@@ -49,11 +49,11 @@ class Section(Base):
     PositionZ = Column(Float, nullable=True)
     IsActive = Column(Boolean, nullable=False, default=True)
 
-    TrackLine = relationship("TrackLine", back_populates="Sections", lazy="joined")
-    Accessories = relationship("Accessory", back_populates="Section", lazy="selectin")
-    Switches = relationship("Switch", back_populates="Section", lazy="selectin")
-    OutgoingConnections = relationship("SectionConnection", foreign_keys="SectionConnection.FromSectionId", back_populates="FromSection", lazy="selectin")
-    IncomingConnections = relationship("SectionConnection", foreign_keys="SectionConnection.ToSectionId", back_populates="ToSection", lazy="selectin")
+    TrackLine = relationship("TrackLine", back_populates="Sections")
+    Accessories = relationship("Accessory", back_populates="Section")
+    Switches = relationship("Switch", back_populates="Section")
+    OutgoingConnections = relationship("SectionConnection", foreign_keys="SectionConnection.FromSectionId", back_populates="FromSection")
+    IncomingConnections = relationship("SectionConnection", foreign_keys="SectionConnection.ToSectionId", back_populates="ToSection")
 
 
 class Switch(Base):
@@ -71,9 +71,13 @@ class Switch(Base):
     position = Column(String(50), nullable=False, default="unknown")  # Switch position: straight, divergent, unknown
     IsActive = Column(Boolean, default=True, nullable=False)
 
-    Accessory = relationship("Accessory", lazy="joined")
-    Section = relationship("Section", back_populates="Switches", lazy="joined")
-    Connections = relationship("SectionConnection", back_populates="Switch", lazy="selectin")
+    Accessory = relationship("Accessory")
+    Section = relationship("Section", back_populates="Switches")
+    Connections = relationship("SectionConnection", back_populates="Switch")
+
+
+# keyset order of GET /switches: Name is nullable, so the key is coalesce(Name, '')
+Index("ix_Switches_Name_Id", func.coalesce(Switch.Name, literal_column("''")), Switch.Id)
 
 
 class SectionConnection(Base):
@@ -87,9 +91,9 @@ class SectionConnection(Base):
     connection_type = Column(String(50), nullable=False, default="direct")  # Connection type: direct, switch, junction
     IsActive = Column(Boolean, nullable=False, default=True)  # Active status
 
-    FromSection = relationship("Section", foreign_keys=[FromSectionId], back_populates="OutgoingConnections", lazy="joined")
-    ToSection = relationship("Section", foreign_keys=[ToSectionId], back_populates="IncomingConnections", lazy="joined")
-    Switch = relationship("Switch", back_populates="Connections", lazy="joined")
+    FromSection = relationship("Section", foreign_keys=[FromSectionId], back_populates="OutgoingConnections")
+    ToSection = relationship("Section", foreign_keys=[ToSectionId], back_populates="IncomingConnections")
+    Switch = relationship("Switch", back_populates="Connections")
 
 
 class TrainAsset(Base):
@@ -105,11 +109,17 @@ class TrainAsset(Base):
     LastServicedDate = Column(DateTime, nullable=True)  # last maintenance service date
     MaintenanceStatus = Column(String(50), nullable=True, default='Good')  # Good, Needs Service, Out of Service
 
-    LocationEvents = relationship("AssetLocationEvent", back_populates="Asset", lazy="selectin")
+    LocationEvents = relationship("AssetLocationEvent", back_populates="Asset")
 
 
 class AssetLocationEvent(Base):
+    # On Postgres this is range-partitioned on Timestamp (migration 005, see event_partitions.py) and the
+    # primary key there is (EventId, Timestamp); EventId alone is mapped because its sequence keeps it unique
     __tablename__ = "AssetLocationEvents"
+    __table_args__ = (
+        Index("ix_AssetLocationEvents_AssetId_Timestamp", "AssetId", "Timestamp"),
+        Index("ix_AssetLocationEvents_Timestamp_EventId", "Timestamp", "EventId"),  # keyset order of the list
+    )
     EventId = Column(Integer, primary_key=True, index=True)
     AssetId = Column(Integer, ForeignKey("TrainAssets.Id"), nullable=False, index=True)  # FK to TrainAsset
     RfidTagId = Column(String(100), nullable=False, index=True)  # tag detected
@@ -117,4 +127,27 @@ class AssetLocationEvent(Base):
     ReaderId = Column(String(100), nullable=False, index=True)
     Timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
 
-    Asset = relationship("TrainAsset", back_populates="LocationEvents", lazy="joined")
+    Asset = relationship("TrainAsset", back_populates="LocationEvents")
+
+
+class AssetCurrentLocation(Base):
+    """Latest AssetLocationEvent per asset, maintained on ingest (see rfid_ingest.update_current_locations)."""
+    __tablename__ = "AssetCurrentLocations"
+    AssetId = Column(Integer, ForeignKey("TrainAssets.Id"), primary_key=True)
+    EventId = Column(Integer, nullable=False)  # the AssetLocationEvent this row mirrors
+    RfidTagId = Column(String(100), nullable=False)
+    Location = Column(String(100), nullable=False)
+    ReaderId = Column(String(100), nullable=False)
+    Timestamp = Column(DateTime, nullable=False)
+
+
+class AssetLocationHourly(Base):
+    """Per-asset hourly summary of AssetLocationEvents, written when partitions expire."""
+    __tablename__ = "AssetLocationHourly"
+    AssetId = Column(Integer, primary_key=True)  # no FK: history outlives deleted assets
+    Hour = Column(DateTime, primary_key=True)  # truncated to the hour
+    Reads = Column(Integer, nullable=False)
+    FirstSeen = Column(DateTime, nullable=False)
+    LastSeen = Column(DateTime, nullable=False)
+    LastLocation = Column(String(100), nullable=False)
+    LastReaderId = Column(String(100), nullable=False)
@@ -0,0 +1,75 @@
+"""
+Keyset (cursor) pagination for the list endpoints.
+
+``offset`` makes the database produce and throw away every skipped row, so
+page 1000 of AssetLocationEvents costs a thousand pages. A cursor instead
+remembers the sort key of the last row served and the next page starts with
+``WHERE (sort key) > (that key)``, which an index on the sort columns answers
+directly no matter how deep the page is.
+
+Lists keep returning a plain JSON array. When another page exists, its
+cursor is sent back in the ``X-Next-Cursor`` header; pass it as ``?cursor=``
+to continue. ``offset`` still works for clients that page by number.
+
+The sort key always ends in the primary key so that it is unique, and every
+column in it sorts in the same direction (row-value comparison is
+all-or-nothing).
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Callable, Optional, Sequence
+
+from fastapi import HTTPException, Response
+from sqlalchemy import Select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import ColumnElement
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(values: Sequence) -> str:
+    raw = [{"dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(raw, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(raw, list) or len(raw) != size:
+            raise ValueError
+        return [datetime.fromisoformat(v["dt"]) if isinstance(v, dict) else v for v in raw]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(400, "Invalid cursor")
+
+
+async def paginate(
+    db: AsyncSession,
+    stmt: Select,
+    order: Sequence[ColumnElement],
+    key: Callable[[object], tuple],
+    response: Response,
+    limit: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    descending: bool = False,
+) -> list:
+    """
+    Run stmt (a select of one entity) ordered by order, one page of limit rows after cursor.
+
+    key(row) must return the row's values for the order expressions. Sets
+    X-Next-Cursor on response when there is another page.
+    """
+    if cursor:
+        values = decode_cursor(cursor, len(order))
+        after = tuple_(*order) < tuple_(*values) if descending else tuple_(*order) > tuple_(*values)
+        stmt = stmt.where(after)
+    stmt = stmt.order_by(*(c.desc() if descending else c.asc() for c in order))
+    if offset:
+        stmt = stmt.offset(offset)
+    rows = (await db.scalars(stmt.limit(limit + 1))).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(key(rows[-1]))
+    return rows
@@ -0,0 +1,430 @@
+"""
+Write-behind ingestion for RFID reads.
+
+``POST /assetLocationEvents/reads`` validates a read, hands it to
+``rfid_writer.submit()`` and answers 202 straight away. One background task
+drains the buffer in group commits: a flush happens once FLUSH_ROWS reads are
+waiting or FLUSH_MS after the first read of a batch arrived, whichever comes
+first. Each flush is one tag lookup, one multi-row INSERT and one commit
+(``insert_reads``, shared with the synchronous bulk endpoint).
+
+The buffer is bounded by QUEUE_SIZE. When it is full ``submit`` raises
+``IngestQueueFull`` and the API answers 503 so readers back off and retry.
+On shutdown ``aclose()`` writes out whatever is still buffered.
+
+The reads were already acknowledged, so a batch that fails to commit goes
+back to the front of the buffer and is retried up to FLUSH_RETRIES times,
+backing off from RETRY_BACKOFF_MS (doubling, capped at RETRY_BACKOFF_MAX_MS).
+Only then are its reads counted as dropped.
+
+Reads are timestamped when they are accepted, not when they are written.
+
+Reads, written events, unknown tags, queue depth and flush timings are
+exported on ``/metrics`` (``rfid_*``).
+
+``read_debouncer`` sits in front of both the queue and the bulk endpoint. A tag
+parked over a reader repeats the same (tag, reader) read many times a second;
+within the reader's dedup window a repeat only bumps that pair's dwell
+counter and never becomes a row. The window slides, so a tag that stays put
+produces one event on arrival, not one per window. RFID_DEDUP_WINDOW_MS sets
+the default window (0 disables), RFID_DEDUP_WINDOWS overrides it per reader
+("reader-1=500,reader-2=5000"), and RFID_DEDUP_MAX_KEYS bounds the LRU.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, Optional
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from logging_config import get_logger
+from metrics import Counter, Gauge, Histogram
+from tag_cache import tag_cache
+from telemetry import train_telemetry
+
+logger = get_logger("rfid_ingest")
+
+QUEUE_SIZE = int(os.getenv("RFID_QUEUE_SIZE", "10000"))
+FLUSH_ROWS = int(os.getenv("RFID_FLUSH_ROWS", "500"))
+FLUSH_MS = float(os.getenv("RFID_FLUSH_MS", "50"))
+FLUSH_RETRIES = int(os.getenv("RFID_FLUSH_RETRIES", "5"))
+RETRY_BACKOFF_MS = float(os.getenv("RFID_RETRY_BACKOFF_MS", "100"))
+RETRY_BACKOFF_MAX_MS = float(os.getenv("RFID_RETRY_BACKOFF_MAX_MS", "5000"))
+DEDUP_WINDOW_MS = float(os.getenv("RFID_DEDUP_WINDOW_MS", "2000"))
+DEDUP_MAX_KEYS = int(os.getenv("RFID_DEDUP_MAX_KEYS", "50000"))
+
+
+READS = Counter("rfid_reads_total", "RFID reads received, by what became of them", ["outcome"])
+EVENTS_WRITTEN = Counter("rfid_events_written_total", "AssetLocationEvents inserted from RFID reads")
+UNKNOWN_TAG_READS = Counter("rfid_unknown_tag_reads_total", "RFID reads dropped because no asset carries the tag")
+QUEUE_DEPTH = Gauge("rfid_queue_depth", "Reads buffered or being written by the write-behind writer")
+FLUSH_SECONDS = Histogram("rfid_flush_seconds", "Time to write one write-behind batch")
+FLUSH_ROWS_WRITTEN = Histogram(
+    "rfid_flush_rows", "Reads per write-behind batch", buckets=(1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500),
+)
+FLUSH_FAILURES = Counter("rfid_flush_failures_total", "Write-behind batch writes that failed to commit")
+READS_DROPPED = Counter("rfid_reads_dropped_total", "Acknowledged reads given up on after FLUSH_RETRIES failed writes")
+
+
+class IngestQueueFull(Exception):
+    """The write-behind buffer is full; the caller should retry later."""
+
+
+def load_reader_windows() -> Dict[str, float]:
+    """Reader id -> dedup window (ms) from RFID_DEDUP_WINDOWS."""
+    windows = {}
+    for item in os.getenv("RFID_DEDUP_WINDOWS", "").split(","):
+        reader_id, _, ms = item.strip().partition("=")
+        if reader_id and ms:
+            windows[reader_id] = float(ms)
+    return windows
+
+
+@dataclass
+class Dwell:
+    first_seen: datetime
+    last_seen: datetime
+    reads: int
+
+
+class ReadDebouncer:
+    def __init__(
+        self,
+        window_ms: float = DEDUP_WINDOW_MS,
+        max_keys: int = DEDUP_MAX_KEYS,
+        reader_windows: Optional[Dict[str, float]] = None,
+    ):
+        self.window_ms = window_ms
+        self.max_keys = max_keys
+        self.reader_windows = load_reader_windows() if reader_windows is None else reader_windows
+        self.suppressed = 0
+        self._seen: "OrderedDict[tuple[str, str], Dwell]" = OrderedDict()  # LRU, oldest first
+        self._lock = threading.Lock()
+
+    def admit(self, rfid_tag_id: str, reader_id: str, timestamp: datetime) -> bool:
+        """True if this read should become an event; False if it only extends a dwell."""
+        window_ms = self.reader_windows.get(reader_id, self.window_ms)
+        if window_ms <= 0:
+            READS.labels(outcome="admitted").inc()
+            return True
+        key = (rfid_tag_id, reader_id)
+        with self._lock:
+            dwell = self._seen.get(key)
+            if dwell is not None and abs(timestamp - dwell.last_seen) <= timedelta(milliseconds=window_ms):
+                dwell.reads += 1
+                dwell.last_seen = max(dwell.last_seen, timestamp)
+                self._seen.move_to_end(key)
+                self.suppressed += 1
+                READS.labels(outcome="duplicate").inc()
+                return False
+            self._seen[key] = Dwell(first_seen=timestamp, last_seen=timestamp, reads=1)
+            self._seen.move_to_end(key)
+            while len(self._seen) > self.max_keys:
+                self._seen.popitem(last=False)
+        READS.labels(outcome="admitted").inc()
+        return True
+
+    def forget(self, rfid_tag_id: str, reader_id: str, timestamp: datetime):
+        """
+        Undo admit() for a read whose event was never written, so the
+        client's retry is not taken for a repeat. A dwell opened by a later
+        read is left alone.
+        """
+        key = (rfid_tag_id, reader_id)
+        with self._lock:
+            dwell = self._seen.get(key)
+            if dwell is not None and dwell.first_seen == timestamp:
+                del self._seen[key]
+
+    def dwells(self, rfid_tag_id: Optional[str] = None, reader_id: Optional[str] = None) -> list[tuple[str, str, Dwell]]:
+        """Tracked (tag, reader) pairs, most recently seen first."""
+        with self._lock:
+            items = list(self._seen.items())
+        return [
+            (tag, reader, d)
+            for (tag, reader), d in reversed(items)
+            if (rfid_tag_id is None or tag == rfid_tag_id) and (reader_id is None or reader == reader_id)
+        ]
+
+    def clear(self):
+        with self._lock:
+            self._seen.clear()
+            self.suppressed = 0
+
+
+def insert_reads(db: Session, reads: Iterable[dict]) -> tuple[list[int], set[str]]:
+    """
+    Insert reads ({rfidTagId, location, readerId, timestamp}) as AssetLocationEvents.
+
+    Tags are resolved through ``tag_cache`` (one IN lookup for any it hasn't
+    seen); reads for unknown tags are skipped. AssetCurrentLocations is
+    brought up to date in the same transaction, which commits once; the
+    committed events are then fed to the telemetry processor, whose errors
+    are logged rather than raised.
+    Returns (event ids ascending, unknown tags).
+    """
+    from models import AssetLocationEvent as E
+
+    reads = list(reads)
+    tags = {r["rfidTagId"] for r in reads}
+    if not tags:
+        return [], set()
+    asset_ids = tag_cache.resolve_many(db, tags)
+    rows = [
+        {
+            "AssetId": asset_ids[r["rfidTagId"]],
+            "RfidTagId": r["rfidTagId"],
+            "Location": r["location"],
+            "ReaderId": r["readerId"],
+            "Timestamp": r["timestamp"],
+        }
+        for r in reads
+        if r["rfidTagId"] in asset_ids
+    ]
+    event_ids = []
+    if rows:
+        result = db.execute(
+            insert(E).returning(E.EventId, E.AssetId, E.RfidTagId, E.Location, E.ReaderId, E.Timestamp),
+            rows,
+        )
+        events = [r._asdict() for r in result]
+        update_current_locations(db, events)
+        db.commit()
+        try:
+            train_telemetry.observe_many(events)
+        except Exception:
+            # the events are committed: a retry would duplicate them, a 500 would misreport them
+            logger.exception("Telemetry update failed for committed RFID events", events=len(events))
+        event_ids = sorted(e["EventId"] for e in events)
+        EVENTS_WRITTEN.inc(len(event_ids))
+    if len(rows) < len(reads):
+        UNKNOWN_TAG_READS.inc(len(reads) - len(rows))
+    return event_ids, tags - asset_ids.keys()
+
+
+def update_current_locations(db: Session, events: Iterable[dict]):
+    """
+    Upsert AssetCurrentLocations from freshly inserted events (column-named dicts).
+
+    One statement per call. A row only moves forward in time, so a late batch
+    carrying older reads can't overwrite a newer location. Does not commit.
+    """
+    from models import AssetCurrentLocation as C
+
+    latest: Dict[int, dict] = {}
+    for e in events:
+        cur = latest.get(e["AssetId"])
+        if cur is None or (e["Timestamp"], e["EventId"]) > (cur["Timestamp"], cur["EventId"]):
+            latest[e["AssetId"]] = e
+    if not latest:
+        return
+
+    if db.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as upsert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as upsert
+    stmt = upsert(C).values([
+        {k: e[k] for k in ("AssetId", "EventId", "RfidTagId", "Location", "ReaderId", "Timestamp")}
+        for e in latest.values()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[C.AssetId],
+        set_={k: stmt.excluded[k] for k in ("EventId", "RfidTagId", "Location", "ReaderId", "Timestamp")},
+        where=stmt.excluded.Timestamp >= C.Timestamp,
+    ))
+
+
+def refresh_current_location(db: Session, asset_id: int):
+    """Recompute one asset's current location from its history (after an event is deleted). Does not commit."""
+    from models import AssetCurrentLocation, AssetLocationEvent as E
+
+    db.query(AssetCurrentLocation).filter(AssetCurrentLocation.AssetId == asset_id).delete()
+    last = (
+        db.query(E.EventId, E.AssetId, E.RfidTagId, E.Location, E.ReaderId, E.Timestamp)
+        .filter(E.AssetId == asset_id)
+        .order_by(E.Timestamp.desc(), E.EventId.desc())
+        .first()
+    )
+    if last is not None:
+        update_current_locations(db, [last._asdict()])
+
+
+class EventWriter:
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = None,
+        queue_size: int = QUEUE_SIZE,
+        flush_rows: int = FLUSH_ROWS,
+        flush_ms: float = FLUSH_MS,
+        retries: int = FLUSH_RETRIES,
+        backoff_ms: float = RETRY_BACKOFF_MS,
+    ):
+        self.session_factory = session_factory  # None -> db.SessionLocal
+        self.queue_size = queue_size
+        self.flush_rows = flush_rows
+        self.flush_ms = flush_ms
+        self.retries = retries
+        self.backoff_ms = backoff_ms
+        self.written = 0
+        self.dropped = 0  # unknown tags, or batches that failed every retry
+        self._failures = 0  # consecutive failed writes of the batch at the front
+        self._retry_at: Optional[float] = None  # monotonic time the next retry may start
+        self._buffer: deque = deque()
+        self._first_at: Optional[float] = None  # monotonic time the oldest buffered read arrived
+        self._in_flight = 0
+        self._draining = False  # flush() in progress: write batches back to back
+        self._wakeup: Optional[asyncio.Event] = None
+        self._idle: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def depth(self) -> int:
+        return len(self._buffer) + self._in_flight
+
+    @property
+    def full(self) -> bool:
+        return len(self._buffer) >= self.queue_size
+
+    # ---- public API ----------------------------------------------------------
+    def submit(self, rfid_tag_id: str, location: str, reader_id: str, timestamp: Optional[datetime] = None):
+        """Buffer one read for the background writer. Raises IngestQueueFull."""
+        if self.full:
+            READS.labels(outcome="rejected").inc()
+            raise IngestQueueFull(f"RFID ingest queue full ({self.queue_size} reads)")
+        self._ensure_runner()
+        if not self._buffer:
+            self._first_at = time.monotonic()
+        self._buffer.append({
+            "rfidTagId": rfid_tag_id,
+            "location": location,
+            "readerId": reader_id,
+            "timestamp": timestamp or datetime.utcnow(),
+        })
+        self._idle.clear()
+        if len(self._buffer) == 1 or len(self._buffer) >= self.flush_rows:
+            self._wakeup.set()  # start the FLUSH_MS clock, or flush a full batch
+
+    async def flush(self):
+        """Write everything buffered so far and wait for it to be committed."""
+        if not self._buffer and not self._in_flight:
+            return
+        self._ensure_runner()
+        self._draining = True
+        self._wakeup.set()
+        try:
+            await self._idle.wait()
+        finally:
+            self._draining = False
+
+    async def aclose(self):
+        """Drain the buffer, then stop the writer."""
+        if self._task and not self._task.done() and self._task.get_loop() is asyncio.get_running_loop():
+            await self.flush()
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while self._buffer:
+            await self._wait_for_retry()
+            await self._write_batch(self._take())
+        self._task = None
+
+    # ---- internals -----------------------------------------------------------
+    def _ensure_runner(self):
+        loop = asyncio.get_running_loop()
+        if self._task is not None and not self._task.done() and self._task.get_loop() is loop:
+            return
+        # first use, or the previous loop went away: restart on this loop
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        if not self._buffer:
+            self._idle.set()
+        self._task = loop.create_task(self._run())
+
+    def _take(self) -> list[dict]:
+        n = min(self.flush_rows, len(self._buffer))
+        batch = [self._buffer.popleft() for _ in range(n)]
+        self._first_at = time.monotonic() if self._buffer else None
+        return batch
+
+    async def _run(self):
+        while True:
+            self._wakeup.clear()
+            if not self._buffer:
+                if not self._in_flight:
+                    self._idle.set()
+                await self._wakeup.wait()
+                continue
+            if self._retry_at is not None:
+                await self._wait_for_retry()
+                continue
+            due = self._first_at + self.flush_ms / 1000.0
+            wait = due - time.monotonic()
+            if len(self._buffer) < self.flush_rows and wait > 0 and not self._draining:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), wait)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._write_batch(self._take())
+
+    async def _wait_for_retry(self):
+        if self._retry_at is not None:
+            await asyncio.sleep(max(0.0, self._retry_at - time.monotonic()))
+            self._retry_at = None
+
+    async def _write_batch(self, batch: list[dict]):
+        self._in_flight += len(batch)
+        start = time.perf_counter()
+        try:
+            written, unknown = await run_in_threadpool(self._insert, batch)
+        except Exception as e:
+            FLUSH_FAILURES.inc()
+            self._failures += 1
+            if self._failures > self.retries:
+                self._failures = 0
+                self.dropped += len(batch)
+                READS_DROPPED.inc(len(batch))
+                logger.error("RFID batch dropped after retries", rows=len(batch), attempts=self.retries + 1, error=str(e))
+            else:
+                # back to the front, ahead of anything submitted since
+                self._buffer.extendleft(reversed(batch))
+                self._first_at = time.monotonic()
+                backoff_ms = min(self.backoff_ms * 2 ** (self._failures - 1), RETRY_BACKOFF_MAX_MS)
+                self._retry_at = time.monotonic() + backoff_ms / 1000.0
+                logger.warning("RFID batch write failed, retrying", rows=len(batch), attempt=self._failures,
+                               retry_in_ms=backoff_ms, error=str(e))
+        else:
+            self._failures = 0
+            self.written += written
+            self.dropped += len(batch) - written
+            if unknown:
+                logger.warning("RFID reads for unknown tags dropped", tags=sorted(unknown))
+        finally:
+            self._in_flight -= len(batch)
+            FLUSH_SECONDS.observe(time.perf_counter() - start)
+            FLUSH_ROWS_WRITTEN.observe(len(batch))
+
+    def _insert(self, batch: list[dict]) -> tuple[int, set[str]]:
+        if self.session_factory is None:
+            from db import SessionLocal
+            self.session_factory = SessionLocal
+        db = self.session_factory()
+        try:
+            event_ids, unknown = insert_reads(db, batch)
+            return len(event_ids), unknown
+        finally:
+            db.close()
+
+
+rfid_writer = EventWriter()
+QUEUE_DEPTH.set_function(lambda: rfid_writer.depth)
+read_debouncer = ReadDebouncer()
@@ -1,9 +1,12 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func  # keep if you use it later
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from db import SessionLocal
+from db import get_db
+from pagination import paginate
+from layout_cache import bump_layout_version
 from models import Accessory, Category
 from schemas import (
     AccessoryCreate,
@@ -15,18 +18,11 @@ from schemas import (
 
 router = APIRouter(prefix="/accessories", tags=["accessories"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------- Create --------
 @router.post("", response_model=AccessoryRead)
-def create_accessory(payload: AccessoryCreate, db: Session = Depends(get_db)):
+async def create_accessory(payload: AccessoryCreate, db: AsyncSession = Depends(get_db)):
     # Validate category exists
-    cat = db.get(Category, payload.categoryId)
+    cat = await db.get(Category, payload.categoryId)
     if not cat:
         raise HTTPException(status_code=400, detail="categoryId does not exist")
 
@@ -39,8 +35,9 @@ def create_accessory(payload: AccessoryCreate, db: Session = Depends(get_db)):
         TimedMs=payload.timedMs,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(item)
     return AccessoryRead(
         id=item.Id,
         name=item.Name,
@@ -53,27 +50,31 @@ def create_accessory(payload: AccessoryCreate, db: Session = Depends(get_db)):
 
 # -------- List (with filters & optional embedded category) --------
 @router.get("", response_model=list[AccessoryRead] | list[AccessoryWithCategory])
-def list_accessories(
+async def list_accessories(
+    response: Response,
     includeCategory: bool = Query(default=False),
     categoryId: Optional[int] = Query(default=None),
     active: Optional[bool] = Query(default=None),
     q: Optional[str] = Query(default=None, description="search in name or address"),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(Accessory)
+    stmt = select(Accessory)
     if categoryId is not None:
-        qry = qry.filter(Accessory.CategoryId == categoryId)
+        stmt = stmt.where(Accessory.CategoryId == categoryId)
     if active is not None:
-        qry = qry.filter(Accessory.IsActive == active)
+        stmt = stmt.where(Accessory.IsActive == active)
     if q:
         like = f"%{q}%"
-        qry = qry.filter(
+        stmt = stmt.where(
             (Accessory.Name.ilike(like)) |
             (Accessory.Address.ilike(like))
         )
-    rows = qry.order_by(Accessory.Name.asc()).offset(offset).limit(limit).all()
+    if includeCategory:
+        stmt = stmt.options(joinedload(Accessory.Category))
+    rows = await paginate(db, stmt, (Accessory.Name, Accessory.Id), lambda r: (r.Name, r.Id), response, limit, cursor, offset)
 
     if not includeCategory:
         return [
@@ -107,8 +108,8 @@ def list_accessories(
 
 # -------- Read by id (with embedded category) --------
 @router.get("/{id}", response_model=AccessoryWithCategory)
-def get_accessory(id: int, db: Session = Depends(get_db)):
-    r = db.get(Accessory, id)  # SQLAlchemy 2.x style
+async def get_accessory(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Accessory, id, options=[joinedload(Accessory.Category)])
     if not r:
         raise HTTPException(404, "Accessory not found")
     return AccessoryWithCategory(
@@ -128,17 +129,17 @@ def get_accessory(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=AccessoryRead)
-def update_accessory(
+async def update_accessory(
     id: int,
     payload: AccessoryCreate,   # or AccessoryUpdate if you have one
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(Accessory, id)
+    r = await db.get(Accessory, id)
     if not r:
         raise HTTPException(404, "Accessory not found")
 
     # Validate category exists
-    cat = db.get(Category, payload.categoryId)
+    cat = await db.get(Category, payload.categoryId)
     if not cat:
         raise HTTPException(400, "categoryId does not exist")
 
@@ -148,8 +149,9 @@ def update_accessory(
     r.Address = payload.address
     r.IsActive = payload.isActive
     r.TimedMs = payload.timedMs
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(r)
     return AccessoryRead(
         id=r.Id,
         name=r.Name,
@@ -162,10 +164,11 @@ def update_accessory(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_accessory(id: int, db: Session = Depends(get_db)):
-    r = db.get(Accessory, id)
+async def delete_accessory(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Accessory, id)
     if not r:
         raise HTTPException(404, "Accessory not found")
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    await db.commit()
+    bump_layout_version()
     return {"status": "ok"}
\ No newline at end of file
@@ -1,41 +1,39 @@
+import asyncio
 from typing import Optional
-import threading
-import time
 
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from db import SessionLocal
+from db import get_db
 import models, schemas
 from hardware.provider import HardwareProvider
+from hardware.scheduler import OffScheduler
+from layout_cache import bump_layout_version
+from logging_config import get_logger
+from state_stream import state_bus
+from track_graph import track_graph
 
 router = APIRouter(prefix="/actions", tags=["actions"])
+logger = get_logger("routers.actions")
 hw = HardwareProvider()
-
-
-# ---- DB session dependency ---------------------------------------------------
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+# owns every pending timed OFF, keyed by accessory id
+scheduler = OffScheduler(hw, on_release=lambda id: state_bus.accessory_changed(id, "off"))
 
 
 # ---- Helpers -----------------------------------------------------------------
-def _delayed_off(address: str, ms: int):
-    """Background helper to turn an accessory OFF after ms milliseconds."""
-    try:
-        time.sleep(ms / 1000.0)
-        hw.set_off(address)
-    except Exception:
-        # Intentionally swallow exceptions to avoid crashing the thread.
-        # Consider logging if you add a logger.
-        pass
-
-
-def _get_accessory_or_404(db: Session, id: int) -> models.Accessory:
-    acc = db.get(models.Accessory, id)  # SQLAlchemy 2.x style
+async def _load_accessory(db: AsyncSession, id: int) -> models.Accessory:
+    """
+    Load the accessory and give the connection back to the pool.
+
+    The handlers then await the hardware, which can take a whole pulse; a
+    transaction left open across that would pin one pooled connection per
+    pulse in progress. The returned row is detached, its columns stay loaded.
+    """
+    acc = await db.get(models.Accessory, id)
+    await db.close()
     if not acc:
         raise HTTPException(status_code=404, detail="Accessory not found")
     return acc
@@ -43,34 +41,39 @@ def _get_accessory_or_404(db: Session, id: int) -> models.Accessory:
 
 # ---- Simple actions -----------------------------------------------------------
 @router.post("/accessories/{id}/on")
-def accessory_on(id: int, db: Session = Depends(get_db)):
-    acc = _get_accessory_or_404(db, id)
-    hw.set_on(acc.Address)
+async def accessory_on(id: int, db: AsyncSession = Depends(get_db)):
+    acc = await _load_accessory(db, id)
+    scheduler.cancel(id)  # an explicit ON outlives any pending timed OFF
+    await hw.set_on(acc.Address)
+    state_bus.accessory_changed(id, "on")
     return {"status": "ok", "action": "on", "id": id}
 
 
 @router.post("/accessories/{id}/off")
-def accessory_off(id: int, db: Session = Depends(get_db)):
-    acc = _get_accessory_or_404(db, id)
-    hw.set_off(acc.Address)
+async def accessory_off(id: int, db: AsyncSession = Depends(get_db)):
+    acc = await _load_accessory(db, id)
+    scheduler.cancel(id)
+    await hw.set_off(acc.Address)
+    state_bus.accessory_changed(id, "off")
     return {"status": "ok", "action": "off", "id": id}
 
 
 @router.post("/accessories/{id}/pulse/{ms}")
-def accessory_pulse(id: int, ms: int, db: Session = Depends(get_db)):
-    acc = _get_accessory_or_404(db, id)
+async def accessory_pulse(id: int, ms: int, db: AsyncSession = Depends(get_db)):
+    acc = await _load_accessory(db, id)
     if ms <= 0:
         raise HTTPException(status_code=400, detail="ms must be > 0")
-    hw.pulse(acc.Address, ms)
+    await hw.pulse(acc.Address, ms)
+    state_bus.accessory_changed(id, "pulsed", ms=ms)
     return {"status": "ok", "action": "pulse", "id": id, "ms": ms}
 
 
 # ---- Smart "apply" action -----------------------------------------------------
 @router.post("/accessories/{id}/apply")
-def accessory_apply(
+async def accessory_apply(
     id: int,
     body: Optional[schemas.ApplyRequest] = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
     """
     Applies the 'intended' behavior for an accessory based on its controlType.
@@ -78,7 +81,7 @@ def accessory_apply(
     - toggle: pulse for milliseconds (default 250ms)
     - timed:  ON then OFF after requested/accessory.TimedMs/fallback(5000ms)
     """
-    acc = _get_accessory_or_404(db, id)
+    acc = await _load_accessory(db, id)
     ctype = acc.ControlType  # stored as string matching schemas.ControlType values
 
     # ---- onOff ----
@@ -86,10 +89,12 @@ def accessory_apply(
         state = (body.state if body and body.state else "on")  # type: ignore[attr-defined]
         if state not in ("on", "off"):
             raise HTTPException(status_code=400, detail="Invalid state for onOff (use 'on' or 'off')")
+        scheduler.cancel(id)  # as with /on and /off, an explicit state outlives a pending timed OFF
         if state == "on":
-            hw.set_on(acc.Address)
+            await hw.set_on(acc.Address)
         else:
-            hw.set_off(acc.Address)
+            await hw.set_off(acc.Address)
+        state_bus.accessory_changed(id, state)
         return {"status": "ok", "action": "onOff", "state": state, "id": id}
 
     # ---- toggle ----
@@ -99,7 +104,9 @@ def accessory_apply(
             ms = int(body.milliseconds)  # type: ignore[attr-defined]
         if not ms or ms <= 0:
             ms = 250
-        hw.pulse(acc.Address, ms)
+        scheduler.cancel(id)
+        await hw.pulse(acc.Address, ms)
+        state_bus.accessory_changed(id, "pulsed", ms=ms)
         return {"status": "ok", "action": "toggle", "ms": ms, "id": id}
 
     # ---- timed ----
@@ -109,9 +116,155 @@ def accessory_apply(
         ms = int(requested) if (requested is not None and int(requested) > 0) else (acc.TimedMs or 5000)  # type: ignore[attr-defined]
         if ms <= 0:
             ms = 5000
-        hw.set_on(acc.Address)
-        # fire-and-forget OFF
-        threading.Thread(target=_delayed_off, args=(acc.Address, ms), daemon=True).start()
+        await hw.set_on(acc.Address)
+        # fire-and-forget OFF; re-triggering pushes the deadline out
+        scheduler.schedule(id, acc.Address, ms)
+        state_bus.accessory_changed(id, "on", offInMs=ms)
         return {"status": "ok", "action": "timed", "ms": ms, "id": id}
 
-    raise HTTPException(status_code=400, detail="Unknown controlType")
\ No newline at end of file
+    raise HTTPException(status_code=400, detail="Unknown controlType")
+
+
+# ---- Route setting ------------------------------------------------------------
+async def _load_route_switches(db: AsyncSession, targets: list[tuple[int, str]]):
+    ids = [id for id, _ in targets]
+    rows = (
+        await db.execute(
+            select(models.Switch, models.Accessory)
+            .join(models.Accessory, models.Switch.AccessoryId == models.Accessory.Id)
+            .where(models.Switch.Id.in_(ids))
+        )
+    ).all()
+    found = {sw.Id: (sw, acc) for sw, acc in rows}
+    missing = [id for id in ids if id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Switch not found: {missing}")
+    return [(*found[id], position) for id, position in targets]
+
+
+async def _save_switch_positions(db: AsyncSession, thrown: list[tuple[int, str]]):
+    for position in {p for _, p in thrown}:
+        ids = [id for id, p in thrown if p == position]
+        await db.execute(update(models.Switch).where(models.Switch.Id.in_(ids)).values(position=position))
+    await db.commit()
+    bump_layout_version()
+
+
+def _holds_position(acc: models.Accessory) -> bool:
+    """onOff motors are driven to a position; toggle/timed ones flip from wherever they are."""
+    return acc.ControlType == schemas.ControlType.onOff.value
+
+
+async def _throw_switch(acc: models.Accessory, position: str, ms: int):
+    ctype = acc.ControlType
+    if ctype == schemas.ControlType.onOff.value:
+        # a held motor: energised = divergent
+        if position == "divergent":
+            await hw.set_on(acc.Address)
+        else:
+            await hw.set_off(acc.Address)
+    elif ctype == schemas.ControlType.timed.value:
+        await hw.pulse(acc.Address, acc.TimedMs or ms)
+    else:
+        await hw.pulse(acc.Address, ms)
+
+
+@router.post("/routes/set", response_model=schemas.RouteSetRead,
+             responses={502: {"model": schemas.RouteSetFailed}})
+async def set_route(body: schemas.RouteSetRequest, db: AsyncSession = Depends(get_db)):
+    """
+    Align every switch on a route at once.
+
+    Takes a section pair (the route comes from the track graph) or an explicit
+    switch list. Switches already in position are left alone unless ``force``,
+    which is only accepted when every motor is onOff: a toggle or timed motor
+    flips from wherever it is, so it is pulsed only when its stored position
+    is known and differs from the target (an unknown one answers 409; record
+    it with PUT /switches/{id} first).
+    All pulses are fired concurrently, so ESP32 commands for the same node land
+    in one batch and the call takes about one pulse length overall. Positions
+    of the switches that moved are saved in a single transaction.
+
+    The read transaction is closed before the pulses go out, so no pooled
+    connection sits idle while the motors throw. If some switches fail, the
+    ones that moved are still saved and the 502 carries the usual body (with
+    ``detail``) so the caller can see which did.
+    """
+    sections = None
+    if body.switches is not None:
+        targets = [(s.id, s.position) for s in body.switches]
+    else:
+        if not track_graph.loaded:
+            await db.run_sync(track_graph.load)
+        route = track_graph.shortest_path(body.fromSectionId, body.toSectionId)
+        if route is None:
+            raise HTTPException(status_code=404, detail="No route between these sections")
+        sections = list(route.sections)
+        targets = list(route.switches)
+
+    wanted: dict[int, str] = {}
+    for id, position in targets:
+        if wanted.setdefault(id, position) != position:
+            raise HTTPException(status_code=400, detail=f"Switch {id} is needed in both positions")
+    if body.milliseconds <= 0:
+        raise HTTPException(status_code=400, detail="milliseconds must be > 0")
+
+    rows = await _load_route_switches(db, list(wanted.items()))
+    await db.close()
+    flipping = [sw.Id for sw, acc, _ in rows if not _holds_position(acc)]
+    if body.force and flipping:
+        raise HTTPException(
+            status_code=400,
+            detail=f"force needs onOff switch motors; switches {flipping} are toggle/timed and would flip the wrong way",
+        )
+    unknown = [sw.Id for sw, acc, _ in rows if not _holds_position(acc) and sw.position not in ("straight", "divergent")]
+    if unknown:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Position of switches {unknown} is unknown, so a pulse can't aim them; set it with PUT /switches/{{id}}",
+        )
+    to_throw = [(sw, acc, pos) for sw, acc, pos in rows if body.force or sw.position != pos]
+
+    outcomes = await asyncio.gather(
+        *(_throw_switch(acc, pos, body.milliseconds) for _, acc, pos in to_throw),
+        return_exceptions=True,
+    )
+    thrown = [(sw.Id, pos) for (sw, _, pos), out in zip(to_throw, outcomes) if not isinstance(out, BaseException)]
+    failed = [sw.Id for (sw, _, _), out in zip(to_throw, outcomes) if isinstance(out, BaseException)]
+
+    moved = {id for id, _ in thrown}
+    result = schemas.RouteSetRead(
+        sections=sections,
+        switches=[
+            schemas.RouteSetSwitchRead(id=sw.Id, accessoryId=acc.Id, position=pos, thrown=sw.Id in moved)
+            for sw, acc, pos in rows
+        ],
+    )
+    if thrown:
+        await _save_switch_positions(db, thrown)
+        for s in result.switches:
+            if s.thrown:
+                track_graph.set_switch_position(s.id, s.position)
+                state_bus.switch_changed(s.id, s.position)
+    if failed:
+        first = next(out for out in outcomes if isinstance(out, BaseException))
+        detail = f"Route partly set; switches {failed} failed: {first}"
+        logger.warning("Route partly set", failed=failed, error=str(first))
+        failure = schemas.RouteSetFailed(detail=detail, **result.model_dump())
+        return JSONResponse(status_code=502, content=jsonable_encoder(failure))
+    return result
+
+
+# ---- Pending timed OFFs -------------------------------------------------------
+@router.get("/scheduled", response_model=list[schemas.ScheduledOffRead])
+async def list_scheduled():
+    """Pending OFF edges for timed accessories, soonest first."""
+    return scheduler.pending()
+
+
+@router.delete("/scheduled/{id}")
+async def cancel_scheduled(id: int):
+    """Cancel a pending OFF (the accessory stays in its current state)."""
+    if not scheduler.cancel(id):
+        raise HTTPException(status_code=404, detail="No pending OFF for accessory")
+    return {"status": "ok", "id": id}
@@ -1,32 +1,53 @@
+import csv
+import io
+import json
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timezone
 
-from db import SessionLocal
-from models import AssetLocationEvent, TrainAsset
+from db import AsyncSessionLocal, get_db
+from pagination import paginate
+from models import AssetCurrentLocation, AssetLocationEvent, AssetLocationHourly, TrainAsset
+from rfid_ingest import (
+    IngestQueueFull,
+    insert_reads,
+    read_debouncer,
+    refresh_current_location,
+    rfid_writer,
+    update_current_locations,
+)
+from tag_cache import MISSING, tag_cache
+from telemetry import train_telemetry
 from schemas import (
     AssetLocationEventCreate,
     AssetLocationEventRead,
     AssetLocationEventWithAsset,
+    AssetLocationEventBulkCreate,
+    AssetLocationEventBulkResult,
+    AssetLocationStatsRead,
+    RfidRead,
+    RfidDwellRead,
     TrainAssetRead,
 )
 
 router = APIRouter(prefix="/assetLocationEvents", tags=["assetLocationEvents"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+def get_session_factory():
+    """For streaming responses, which outlive a get_db session (closed before the body is sent)."""
+    return AsyncSessionLocal
+
+EXPORT_BATCH_ROWS = 5000
+EXPORT_FIELDS = ("eventId", "assetId", "rfidTagId", "location", "readerId", "timestamp")
 
 # -------- Create --------
 @router.post("", response_model=AssetLocationEventRead)
-def create_asset_location_event(payload: AssetLocationEventCreate, db: Session = Depends(get_db)):
+async def create_asset_location_event(payload: AssetLocationEventCreate, db: AsyncSession = Depends(get_db)):
     # Validate asset exists
-    asset = db.get(TrainAsset, payload.assetId)
-    if not asset:
+    if not await db.scalar(select(TrainAsset.Id).where(TrainAsset.Id == payload.assetId)):
         raise HTTPException(status_code=400, detail="assetId does not exist")
 
     item = AssetLocationEvent(
@@ -37,8 +58,11 @@ def create_asset_location_event(payload: AssetLocationEventCreate, db: Session =
         Timestamp=datetime.utcnow(),
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.flush()
+    columns = _event_columns(item)
+    await db.run_sync(update_current_locations, [columns])
+    await db.commit()
+    train_telemetry.observe_many([columns])
     return AssetLocationEventRead(
         eventId=item.EventId,
         assetId=item.AssetId,
@@ -48,9 +72,286 @@ def create_asset_location_event(payload: AssetLocationEventCreate, db: Session =
         timestamp=item.Timestamp,
     )
 
+def _event_columns(e: AssetLocationEvent) -> dict:
+    return {
+        "EventId": e.EventId,
+        "AssetId": e.AssetId,
+        "RfidTagId": e.RfidTagId,
+        "Location": e.Location,
+        "ReaderId": e.ReaderId,
+        "Timestamp": e.Timestamp,
+    }
+
+def _current_location_read(r: AssetCurrentLocation) -> AssetLocationEventRead:
+    return AssetLocationEventRead(
+        eventId=r.EventId,
+        assetId=r.AssetId,
+        rfidTagId=r.RfidTagId,
+        location=r.Location,
+        readerId=r.ReaderId,
+        timestamp=r.Timestamp,
+    )
+
+def _naive_utc(ts: datetime) -> datetime:
+    # Timestamp is a naive UTC column
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+# -------- Create from tag --------
+@router.post("/byTag", response_model=AssetLocationEventRead)
+async def create_asset_location_event_by_tag(payload: RfidRead, db: AsyncSession = Depends(get_db)):
+    """Like POST /assetLocationEvents, but the asset is resolved from rfidTagId via the tag cache."""
+    asset_id = await db.run_sync(tag_cache.resolve, payload.rfidTagId)
+    if asset_id is None:
+        raise HTTPException(status_code=400, detail="rfidTagId is not assigned to an asset")
+
+    item = AssetLocationEvent(
+        AssetId=asset_id,
+        RfidTagId=payload.rfidTagId,
+        Location=payload.location,
+        ReaderId=payload.readerId,
+        Timestamp=_naive_utc(payload.timestamp) if payload.timestamp else datetime.utcnow(),
+    )
+    db.add(item)
+    await db.flush()
+    columns = _event_columns(item)
+    await db.run_sync(update_current_locations, [columns])
+    await db.commit()
+    train_telemetry.observe_many([columns])
+    return AssetLocationEventRead(
+        eventId=item.EventId,
+        assetId=item.AssetId,
+        rfidTagId=item.RfidTagId,
+        location=item.Location,
+        readerId=item.ReaderId,
+        timestamp=item.Timestamp,
+    )
+
+# -------- Bulk create --------
+@router.post("/bulk", response_model=AssetLocationEventBulkResult)
+async def create_asset_location_events_bulk(payload: AssetLocationEventBulkCreate, db: AsyncSession = Depends(get_db)):
+    """
+    Ingest a burst of RFID reads in one round trip.
+
+    Tags are resolved to assets with a single IN lookup, the events go in as
+    one multi-row INSERT ... RETURNING, and the batch is committed once.
+    Reads for unknown tags are skipped and listed in ``unknownTags``; repeats
+    inside the reader's dedup window are counted in ``suppressed``. If the
+    insert fails the reads are taken back out of the dedup window, so
+    retrying the batch stores them.
+    """
+    now = datetime.utcnow()
+    reads = []
+    for e in payload.events:
+        ts = _naive_utc(e.timestamp) if e.timestamp else now
+        if read_debouncer.admit(e.rfidTagId, e.readerId, ts):
+            reads.append({"rfidTagId": e.rfidTagId, "location": e.location, "readerId": e.readerId, "timestamp": ts})
+    try:
+        event_ids, unknown = await db.run_sync(insert_reads, reads)
+    except Exception:
+        for r in reads:
+            read_debouncer.forget(r["rfidTagId"], r["readerId"], r["timestamp"])
+        raise
+    return AssetLocationEventBulkResult(
+        inserted=len(event_ids),
+        eventIds=event_ids,
+        unknownTags=sorted(unknown),
+        suppressed=len(payload.events) - len(reads),
+    )
+
+# -------- Buffered single read --------
+@router.post("/reads", status_code=202)
+async def enqueue_rfid_read(payload: RfidRead, db: AsyncSession = Depends(get_db)):
+    """
+    Accept one reader detection and write it behind the request.
+
+    The read is buffered and group-committed by the background writer in
+    ``rfid_ingest``; the response does not wait for the database. Answers 503
+    with Retry-After when the buffer is full, and 400 for a tag no asset carries.
+    A repeat of the same tag at the same reader inside the dedup window is
+    only counted as dwell (``"status": "duplicate"``).
+    """
+    asset_id = tag_cache.get(payload.rfidTagId)
+    if asset_id is MISSING:
+        asset_id = await db.run_sync(tag_cache.resolve, payload.rfidTagId)
+    if asset_id is None:
+        raise HTTPException(status_code=400, detail="rfidTagId is not assigned to an asset")
+    ts = _naive_utc(payload.timestamp) if payload.timestamp else datetime.utcnow()
+    # check capacity first so a rejected read doesn't open a dwell window
+    if not rfid_writer.full and not read_debouncer.admit(payload.rfidTagId, payload.readerId, ts):
+        return {"status": "duplicate"}
+    try:
+        rfid_writer.submit(payload.rfidTagId, payload.location, payload.readerId, ts)
+    except IngestQueueFull as e:
+        read_debouncer.forget(payload.rfidTagId, payload.readerId, ts)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    return {"status": "queued"}
+
+# -------- Current location of every asset --------
+@router.get("/latest", response_model=list[AssetLocationEventRead])
+async def list_latest_locations(db: AsyncSession = Depends(get_db)):
+    """Where every asset is now: one row per asset from AssetCurrentLocations."""
+    rows = (await db.scalars(select(AssetCurrentLocation).order_by(AssetCurrentLocation.AssetId))).all()
+    return [_current_location_read(r) for r in rows]
+
+# -------- Dwell (suppressed repeat reads) --------
+@router.get("/dwell", response_model=list[RfidDwellRead])
+async def list_rfid_dwell(
+    rfidTagId: Optional[str] = Query(default=None),
+    readerId: Optional[str] = Query(default=None),
+    limit: int = Query(default=100, ge=1, le=1000),
+):
+    """Tags currently tracked by the dedup window, most recently seen first."""
+    return [
+        RfidDwellRead(rfidTagId=tag, readerId=reader, firstSeen=d.first_seen, lastSeen=d.last_seen, reads=d.reads)
+        for tag, reader, d in read_debouncer.dwells(rfidTagId, readerId)[:limit]
+    ]
+
+# -------- Stats (time-bucketed) --------
+STATS_GROUPS = {"asset": "AssetId", "reader": "ReaderId", "location": "Location"}
+_SQLITE_BUCKETS = {"minute": "%Y-%m-%d %H:%M:00", "hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d 00:00:00"}
+
+def _bucket(db: AsyncSession, column, bucket: str):
+    if db.get_bind().dialect.name == "sqlite":
+        return func.strftime(_SQLITE_BUCKETS[bucket], column)
+    return func.date_trunc(bucket, column)
+
+def _as_datetime(value) -> datetime:
+    # strftime buckets come back as text on SQLite
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+@router.get("/stats", response_model=list[AssetLocationStatsRead])
+async def asset_location_stats(
+    groupBy: str = Query(default="asset", pattern="^(asset|reader|location)$"),
+    bucket: str = Query(default="hour", pattern="^(minute|hour|day)$"),
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound on timestamp"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound on timestamp"),
+    assetId: Optional[int] = Query(default=None),
+    readerId: Optional[str] = Query(default=None),
+    db: AsyncSession = Depends(get_db),
+):
+    """Read counts and dwell per asset, reader or location per time bucket, aggregated in SQL.
+
+    Filtering on a lap reader (readerId) and grouping by asset gives laps per
+    engine. Hourly and daily per-asset stats also include history that
+    retention has already folded into AssetLocationHourly.
+    """
+    E = AssetLocationEvent
+    group_col = getattr(E, STATS_GROUPS[groupBy])
+    b = _bucket(db, E.Timestamp, bucket).label("bucket")
+    stmt = select(
+        b,
+        group_col.label("key"),
+        func.count().label("reads"),
+        func.count(func.distinct(E.AssetId)).label("assets"),
+        func.min(E.Timestamp).label("first_seen"),
+        func.max(E.Timestamp).label("last_seen"),
+    )
+    if from_ts is not None:
+        stmt = stmt.where(E.Timestamp >= _naive_utc(from_ts))
+    if to_ts is not None:
+        stmt = stmt.where(E.Timestamp < _naive_utc(to_ts))
+    if assetId is not None:
+        stmt = stmt.where(E.AssetId == assetId)
+    if readerId is not None:
+        stmt = stmt.where(E.ReaderId == readerId)
+    rows = (await db.execute(stmt.group_by(b, group_col))).all()
+
+    stats = {}
+    for r in rows:
+        stats[(_as_datetime(r.bucket), r.key)] = [r.reads, r.assets, r.first_seen, r.last_seen]
+
+    # the rollup only keeps per-asset counts at hour resolution
+    if groupBy == "asset" and bucket != "minute" and readerId is None:
+        H = AssetLocationHourly
+        hb = _bucket(db, H.Hour, bucket).label("bucket")
+        rollup = select(hb, H.AssetId, func.sum(H.Reads), func.min(H.FirstSeen), func.max(H.LastSeen))
+        if from_ts is not None:
+            rollup = rollup.where(H.Hour >= _naive_utc(from_ts))
+        if to_ts is not None:
+            rollup = rollup.where(H.Hour < _naive_utc(to_ts))
+        if assetId is not None:
+            rollup = rollup.where(H.AssetId == assetId)
+        for bucket_start, key, reads, first_seen, last_seen in (await db.execute(rollup.group_by(hb, H.AssetId))).all():
+            k = (_as_datetime(bucket_start), key)
+            if k in stats:
+                s = stats[k]
+                stats[k] = [s[0] + reads, 1, min(s[2], first_seen), max(s[3], last_seen)]
+            else:
+                stats[k] = [int(reads), 1, first_seen, last_seen]
+
+    field = {"asset": "assetId", "reader": "readerId", "location": "location"}[groupBy]
+    ordered = sorted(stats.items(), key=lambda item: (item[0][0], str(item[0][1])))
+    return [
+        AssetLocationStatsRead(
+            bucket=bucket_start,
+            reads=reads,
+            assets=assets,
+            firstSeen=first_seen,
+            lastSeen=last_seen,
+            dwellSeconds=(last_seen - first_seen).total_seconds(),
+            **{field: key},
+        )
+        for (bucket_start, key), (reads, assets, first_seen, last_seen) in ordered
+    ]
+
+# -------- Export (streamed) --------
+async def _export_chunks(session_factory, stmt, format: str):
+    """Yield the export body a batch at a time from a server-side cursor."""
+    async with session_factory() as db:
+        result = await db.stream(stmt.execution_options(yield_per=EXPORT_BATCH_ROWS))
+        if format == "csv":
+            buf = io.StringIO()
+            writer = csv.writer(buf, lineterminator="\n")
+            writer.writerow(EXPORT_FIELDS)
+            async for batch in result.partitions():
+                writer.writerows(
+                    (event_id, asset_id, tag, location, reader, ts.isoformat())
+                    for event_id, asset_id, tag, location, reader, ts in batch
+                )
+                yield buf.getvalue()
+                buf.seek(0)
+                buf.truncate()
+        else:
+            async for batch in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_FIELDS, (event_id, asset_id, tag, location, reader, ts.isoformat()))))
+                    + "\n"
+                    for event_id, asset_id, tag, location, reader, ts in batch
+                )
+
+@router.get("/export")
+async def export_asset_location_events(
+    from_ts: Optional[datetime] = Query(default=None, alias="from", description="Inclusive lower bound on timestamp"),
+    to_ts: Optional[datetime] = Query(default=None, alias="to", description="Exclusive upper bound on timestamp"),
+    format: str = Query(default="ndjson", pattern="^(ndjson|csv)$"),
+    assetId: Optional[int] = Query(default=None),
+    readerId: Optional[str] = Query(default=None),
+    session_factory=Depends(get_session_factory),
+):
+    """Every matching event in timestamp order, streamed as NDJSON or CSV in constant memory."""
+    E = AssetLocationEvent
+    stmt = select(E.EventId, E.AssetId, E.RfidTagId, E.Location, E.ReaderId, E.Timestamp)
+    if from_ts is not None:
+        stmt = stmt.where(E.Timestamp >= _naive_utc(from_ts))
+    if to_ts is not None:
+        stmt = stmt.where(E.Timestamp < _naive_utc(to_ts))
+    if assetId is not None:
+        stmt = stmt.where(E.AssetId == assetId)
+    if readerId is not None:
+        stmt = stmt.where(E.ReaderId == readerId)
+    stmt = stmt.order_by(E.Timestamp.asc(), E.EventId.asc())
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        _export_chunks(session_factory, stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="assetLocationEvents.{format}"'},
+    )
+
 # -------- List --------
 @router.get("", response_model=list[AssetLocationEventRead] | list[AssetLocationEventWithAsset])
-def list_asset_location_events(
+async def list_asset_location_events(
+    response: Response,
     includeAsset: bool = Query(default=False),
     assetId: Optional[int] = Query(default=None),
     rfidTagId: Optional[str] = Query(default=None),
@@ -58,19 +359,23 @@ def list_asset_location_events(
     readerId: Optional[str] = Query(default=None),
     limit: int = Query(default=100, ge=1, le=1000),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(AssetLocationEvent)
+    stmt = select(AssetLocationEvent)
     if assetId is not None:
-        qry = qry.filter(AssetLocationEvent.AssetId == assetId)
+        stmt = stmt.where(AssetLocationEvent.AssetId == assetId)
     if rfidTagId is not None:
-        qry = qry.filter(AssetLocationEvent.RfidTagId == rfidTagId)
+        stmt = stmt.where(AssetLocationEvent.RfidTagId == rfidTagId)
     if location is not None:
-        qry = qry.filter(AssetLocationEvent.Location.ilike(f"%{location}%"))
+        stmt = stmt.where(AssetLocationEvent.Location.ilike(f"%{location}%"))
     if readerId is not None:
-        qry = qry.filter(AssetLocationEvent.ReaderId == readerId)
+        stmt = stmt.where(AssetLocationEvent.ReaderId == readerId)
     
-    rows = qry.order_by(AssetLocationEvent.Timestamp.desc()).offset(offset).limit(limit).all()
+    if includeAsset:
+        stmt = stmt.options(joinedload(AssetLocationEvent.Asset))
+    rows = await paginate(db, stmt, (AssetLocationEvent.Timestamp, AssetLocationEvent.EventId), lambda r: (r.Timestamp, r.EventId),
+                          response, limit, cursor, offset, descending=True)
 
     if not includeAsset:
         return [
@@ -107,8 +412,8 @@ def list_asset_location_events(
 
 # -------- Read by id --------
 @router.get("/{eventId}", response_model=AssetLocationEventWithAsset)
-def get_asset_location_event(eventId: int, db: Session = Depends(get_db)):
-    r = db.get(AssetLocationEvent, eventId)
+async def get_asset_location_event(eventId: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(AssetLocationEvent, eventId, options=[joinedload(AssetLocationEvent.Asset)])
     if not r:
         raise HTTPException(404, "Asset location event not found")
     
@@ -133,36 +438,28 @@ def get_asset_location_event(eventId: int, db: Session = Depends(get_db)):
 
 # -------- Delete --------
 @router.delete("/{eventId}")
-def delete_asset_location_event(eventId: int, db: Session = Depends(get_db)):
-    r = db.get(AssetLocationEvent, eventId)
+async def delete_asset_location_event(eventId: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(AssetLocationEvent, eventId)
     if not r:
         raise HTTPException(404, "Asset location event not found")
-    db.delete(r)
-    db.commit()
+    asset_id = r.AssetId
+    await db.delete(r)
+    await db.flush()
+    current = await db.get(AssetCurrentLocation, asset_id)
+    if current is not None and current.EventId == eventId:
+        await db.run_sync(refresh_current_location, asset_id)
+    await db.commit()
     return {"status": "ok"}
 
 # -------- Get latest location for asset --------
 @router.get("/assets/{assetId}/latest", response_model=Optional[AssetLocationEventRead])
-def get_latest_location_for_asset(assetId: int, db: Session = Depends(get_db)):
+async def get_latest_location_for_asset(assetId: int, db: AsyncSession = Depends(get_db)):
     """Get the most recent location event for a specific asset"""
     # Validate asset exists
-    asset = db.get(TrainAsset, assetId)
-    if not asset:
+    if not await db.scalar(select(TrainAsset.Id).where(TrainAsset.Id == assetId)):
         raise HTTPException(status_code=404, detail="Asset not found")
         
-    event = db.query(AssetLocationEvent)\
-        .filter(AssetLocationEvent.AssetId == assetId)\
-        .order_by(AssetLocationEvent.Timestamp.desc())\
-        .first()
-    
-    if not event:
+    current = await db.get(AssetCurrentLocation, assetId)
+    if not current:
         return None
-        
-    return AssetLocationEventRead(
-        eventId=event.EventId,
-        assetId=event.AssetId,
-        rfidTagId=event.RfidTagId,
-        location=event.Location,
-        readerId=event.ReaderId,
-        timestamp=event.Timestamp,
-    )
\ No newline at end of file
+    return _current_location_read(current)
\ No newline at end of file
@@ -0,0 +1,49 @@
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_db
+from track_graph import track_graph
+from schemas import RouteRead, RouteSwitchRead
+
+router = APIRouter(prefix="/routes", tags=["routes"])
+
+# -------- Shortest route --------
+@router.get("", response_model=RouteRead)
+async def get_route(
+    from_section: int = Query(..., alias="from", description="Start section id"),
+    to_section: int = Query(..., alias="to", description="Destination section id"),
+    db: AsyncSession = Depends(get_db),
+):
+    """Shortest route over active sections, weighted by section length.
+
+    Answered from the in-memory track graph; the database is only read the
+    first time, to load it.
+    """
+    if not track_graph.loaded:
+        await db.run_sync(track_graph.load)
+
+    for section_id in (from_section, to_section):
+        if section_id not in track_graph.csr.index:
+            raise HTTPException(404, f"Section {section_id} not found or inactive")
+
+    route = track_graph.shortest_path(from_section, to_section)
+    if route is None:
+        raise HTTPException(404, "No route between these sections")
+
+    switches = []
+    for switch_id, position in route.switches:
+        sw = track_graph.switches[switch_id]
+        switches.append(RouteSwitchRead(
+            id=sw.id,
+            accessoryId=sw.accessory_id,
+            position=position,
+            currentPosition=sw.position,
+        ))
+    return RouteRead(
+        fromSectionId=from_section,
+        toSectionId=to_section,
+        sections=list(route.sections),
+        connections=list(route.connections),
+        switches=switches,
+        length=route.length,
+    )
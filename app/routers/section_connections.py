@@ -1,8 +1,13 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-
-from db import SessionLocal
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+
+from db import get_db
+from pagination import paginate
+from layout_cache import bump_layout_version
+from track_graph import track_graph
 from models import SectionConnection, Section, Switch
 from schemas import (
     SectionConnectionCreate,
@@ -14,29 +19,28 @@ from schemas import (
 
 router = APIRouter(prefix="/sectionConnections", tags=["sectionConnections"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+_CONNECTION_RELATIONS = [
+    joinedload(SectionConnection.FromSection),
+    joinedload(SectionConnection.ToSection),
+    joinedload(SectionConnection.Switch),
+]
 
 # -------- Create --------
 @router.post("", response_model=SectionConnectionRead)
-def create_section_connection(payload: SectionConnectionCreate, db: Session = Depends(get_db)):
+async def create_section_connection(payload: SectionConnectionCreate, db: AsyncSession = Depends(get_db)):
     # Validate from section exists
-    from_section = db.get(Section, payload.fromSectionId)
+    from_section = await db.get(Section, payload.fromSectionId)
     if not from_section:
         raise HTTPException(status_code=400, detail="fromSectionId does not exist")
 
     # Validate to section exists
-    to_section = db.get(Section, payload.toSectionId)
+    to_section = await db.get(Section, payload.toSectionId)
     if not to_section:
         raise HTTPException(status_code=400, detail="toSectionId does not exist")
 
     # Validate switch if provided
     if payload.switchId:
-        switch = db.get(Switch, payload.switchId)
+        switch = await db.get(Switch, payload.switchId)
         if not switch:
             raise HTTPException(status_code=400, detail="switchId does not exist")
 
@@ -52,8 +56,10 @@ def create_section_connection(payload: SectionConnectionCreate, db: Session = De
         IsActive=payload.isActive,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(item)
+    track_graph.upsert_connection(item)
     return SectionConnectionRead(
         id=item.Id,
         fromSectionId=item.FromSectionId,
@@ -65,7 +71,8 @@ def create_section_connection(payload: SectionConnectionCreate, db: Session = De
 
 # -------- List (with filters & optional embedded relations) --------
 @router.get("", response_model=list[SectionConnectionRead] | list[SectionConnectionWithRelations])
-def list_section_connections(
+async def list_section_connections(
+    response: Response,
     includeRelations: bool = Query(default=False),
     fromSectionId: Optional[int] = Query(default=None),
     toSectionId: Optional[int] = Query(default=None),
@@ -74,21 +81,24 @@ def list_section_connections(
     active: Optional[bool] = Query(default=None),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(SectionConnection)
+    stmt = select(SectionConnection)
     if fromSectionId is not None:
-        qry = qry.filter(SectionConnection.FromSectionId == fromSectionId)
+        stmt = stmt.where(SectionConnection.FromSectionId == fromSectionId)
     if toSectionId is not None:
-        qry = qry.filter(SectionConnection.ToSectionId == toSectionId)
+        stmt = stmt.where(SectionConnection.ToSectionId == toSectionId)
     if connectionType is not None:
-        qry = qry.filter(SectionConnection.connection_type == connectionType)
+        stmt = stmt.where(SectionConnection.connection_type == connectionType)
     if switchId is not None:
-        qry = qry.filter(SectionConnection.SwitchId == switchId)
+        stmt = stmt.where(SectionConnection.SwitchId == switchId)
     if active is not None:
-        qry = qry.filter(SectionConnection.IsActive == active)
+        stmt = stmt.where(SectionConnection.IsActive == active)
     
-    rows = qry.order_by(SectionConnection.Id.asc()).offset(offset).limit(limit).all()
+    if includeRelations:
+        stmt = stmt.options(*_CONNECTION_RELATIONS)
+    rows = await paginate(db, stmt, (SectionConnection.Id,), lambda r: (r.Id,), response, limit, cursor, offset)
 
     if not includeRelations:
         return [
@@ -135,8 +145,8 @@ def list_section_connections(
 
 # -------- Read by id (with relations) --------
 @router.get("/{id}", response_model=SectionConnectionWithRelations)
-def get_section_connection(id: int, db: Session = Depends(get_db)):
-    r = db.get(SectionConnection, id)
+async def get_section_connection(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(SectionConnection, id, options=_CONNECTION_RELATIONS)
     if not r:
         raise HTTPException(404, "Section connection not found")
     
@@ -171,28 +181,28 @@ def get_section_connection(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=SectionConnectionRead)
-def update_section_connection(
+async def update_section_connection(
     id: int,
     payload: SectionConnectionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(SectionConnection, id)
+    r = await db.get(SectionConnection, id)
     if not r:
         raise HTTPException(404, "Section connection not found")
 
     # Validate from section exists
-    from_section = db.get(Section, payload.fromSectionId)
+    from_section = await db.get(Section, payload.fromSectionId)
     if not from_section:
         raise HTTPException(400, "fromSectionId does not exist")
 
     # Validate to section exists
-    to_section = db.get(Section, payload.toSectionId)
+    to_section = await db.get(Section, payload.toSectionId)
     if not to_section:
         raise HTTPException(400, "toSectionId does not exist")
 
     # Validate switch if provided
     if payload.switchId:
-        switch = db.get(Switch, payload.switchId)
+        switch = await db.get(Switch, payload.switchId)
         if not switch:
             raise HTTPException(400, "switchId does not exist")
 
@@ -205,8 +215,10 @@ def update_section_connection(
     r.connection_type = payload.connectionType
     r.SwitchId = payload.switchId
     r.IsActive = payload.isActive
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(r)
+    track_graph.upsert_connection(r)
     return SectionConnectionRead(
         id=r.Id,
         fromSectionId=r.FromSectionId,
@@ -218,11 +230,13 @@ def update_section_connection(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_section_connection(id: int, db: Session = Depends(get_db)):
-    r = db.get(SectionConnection, id)
+async def delete_section_connection(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(SectionConnection, id)
     if not r:
         raise HTTPException(404, "Section connection not found")
     
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    await db.commit()
+    bump_layout_version()
+    track_graph.remove_connection(id)
     return {"status": "ok"}
\ No newline at end of file
@@ -1,8 +1,13 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, selectinload
 
-from db import SessionLocal
+from db import get_db
+from pagination import paginate
+from layout_cache import bump_layout_version
+from track_graph import track_graph
 from models import Section, TrackLine
 from schemas import (
     SectionCreate,
@@ -14,18 +19,11 @@ from schemas import (
 
 router = APIRouter(prefix="/sections", tags=["sections"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------- Create --------
 @router.post("", response_model=SectionRead)
-def create_section(payload: SectionCreate, db: Session = Depends(get_db)):
+async def create_section(payload: SectionCreate, db: AsyncSession = Depends(get_db)):
     # Validate track line exists
-    track_line = db.get(TrackLine, payload.trackLineId)
+    track_line = await db.get(TrackLine, payload.trackLineId)
     if not track_line:
         raise HTTPException(status_code=400, detail="trackLineId does not exist")
 
@@ -39,8 +37,10 @@ def create_section(payload: SectionCreate, db: Session = Depends(get_db)):
         IsActive=payload.isActive,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(item)
+    track_graph.upsert_section(item)
     return SectionRead(
         id=item.Id,
         name=item.Name,
@@ -54,7 +54,8 @@ def create_section(payload: SectionCreate, db: Session = Depends(get_db)):
 
 # -------- List (with filters & optional embedded track line) --------
 @router.get("", response_model=list[SectionRead] | list[SectionWithTrackLine])
-def list_sections(
+async def list_sections(
+    response: Response,
     includeTrackLine: bool = Query(default=False),
     trackLineId: Optional[int] = Query(default=None),
     occupied: Optional[bool] = Query(default=None),
@@ -62,20 +63,23 @@ def list_sections(
     q: Optional[str] = Query(default=None, description="search in name"),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(Section)
+    stmt = select(Section)
     if trackLineId is not None:
-        qry = qry.filter(Section.TrackLineId == trackLineId)
+        stmt = stmt.where(Section.TrackLineId == trackLineId)
     if occupied is not None:
-        qry = qry.filter(Section.is_occupied == occupied)
+        stmt = stmt.where(Section.is_occupied == occupied)
     if active is not None:
-        qry = qry.filter(Section.IsActive == active)
+        stmt = stmt.where(Section.IsActive == active)
     if q:
         like = f"%{q}%"
-        qry = qry.filter(Section.Name.ilike(like))
+        stmt = stmt.where(Section.Name.ilike(like))
     
-    rows = qry.order_by(Section.Name.asc()).offset(offset).limit(limit).all()
+    if includeTrackLine:
+        stmt = stmt.options(joinedload(Section.TrackLine))
+    rows = await paginate(db, stmt, (Section.Name, Section.Id), lambda r: (r.Name, r.Id), response, limit, cursor, offset)
 
     if not includeTrackLine:
         return [
@@ -112,8 +116,8 @@ def list_sections(
 
 # -------- Read by id (with track line and switches) --------
 @router.get("/{id}", response_model=SectionWithRelations)
-def get_section(id: int, db: Session = Depends(get_db)):
-    r = db.get(Section, id)
+async def get_section(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Section, id, options=[joinedload(Section.TrackLine), selectinload(Section.Switches)])
     if not r:
         raise HTTPException(404, "Section not found")
     
@@ -147,17 +151,17 @@ def get_section(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=SectionRead)
-def update_section(
+async def update_section(
     id: int,
     payload: SectionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(Section, id)
+    r = await db.get(Section, id)
     if not r:
         raise HTTPException(404, "Section not found")
 
     # Validate track line exists
-    track_line = db.get(TrackLine, payload.trackLineId)
+    track_line = await db.get(TrackLine, payload.trackLineId)
     if not track_line:
         raise HTTPException(400, "trackLineId does not exist")
 
@@ -168,8 +172,10 @@ def update_section(
     r.PositionY = payload.positionY
     r.PositionZ = payload.positionZ
     r.IsActive = payload.isActive
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(r)
+    track_graph.upsert_section(r)
     return SectionRead(
         id=r.Id,
         name=r.Name,
@@ -183,22 +189,24 @@ def update_section(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_section(id: int, db: Session = Depends(get_db)):
-    r = db.get(Section, id)
+async def delete_section(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Section, id)
     if not r:
         raise HTTPException(404, "Section not found")
     
     # Check if there are switches or connections using this section
     from models import Switch, SectionConnection
-    if db.query(Switch).filter(Switch.SectionId == id).first():
+    if await db.scalar(select(Switch.Id).where(Switch.SectionId == id).limit(1)):
         raise HTTPException(400, "Section has switches; reassign or delete them first")
     
-    if (db.query(SectionConnection)
-        .filter((SectionConnection.FromSectionId == id) | 
-                (SectionConnection.ToSectionId == id))
-        .first()):
+    if await db.scalar(select(SectionConnection.Id)
+        .where((SectionConnection.FromSectionId == id) | 
+               (SectionConnection.ToSectionId == id))
+        .limit(1)):
         raise HTTPException(400, "Section has connections; delete them first")
     
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    await db.commit()
+    bump_layout_version()
+    track_graph.remove_section(id)
     return {"status": "ok"}
\ No newline at end of file
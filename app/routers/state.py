@@ -0,0 +1,80 @@
+"""
+Live state stream: pushes accessory and switch deltas to dashboards.
+
+- ``/ws/state``      WebSocket (preferred)
+- ``/state/stream``  Server-Sent Events fallback
+
+Both start with a ``hello`` message carrying the current ``seq``; after that
+every message is a delta from ``state_stream.state_bus``. Idle connections get
+a keepalive every KEEPALIVE_S seconds so proxies don't time them out.
+"""
+import asyncio
+import json
+
+from fastapi import APIRouter, Request, WebSocket
+from fastapi.responses import StreamingResponse
+
+from state_stream import state_bus
+
+router = APIRouter(tags=["state"])
+
+KEEPALIVE_S = 15.0
+
+
+def _hello() -> str:
+    return json.dumps({"type": "hello", "seq": state_bus.last_seq}, separators=(",", ":"))
+
+
+@router.websocket("/ws/state")
+async def state_socket(ws: WebSocket):
+    await ws.accept()
+    sub = state_bus.subscribe()
+
+    async def pump():
+        await ws.send_text(_hello())
+        while True:
+            try:
+                message = await asyncio.wait_for(sub.get(), KEEPALIVE_S)
+            except asyncio.TimeoutError:
+                message = '{"type":"ping"}'
+            await ws.send_text(message)
+
+    async def watch_disconnect():
+        # clients don't send anything; this only notices them leaving
+        while (await ws.receive())["type"] != "websocket.disconnect":
+            pass
+
+    tasks = [asyncio.create_task(pump()), asyncio.create_task(watch_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        state_bus.unsubscribe(sub)
+
+
+@router.get("/state/stream")
+async def state_events(request: Request):
+    sub = state_bus.subscribe()
+
+    async def events():
+        try:
+            yield f"event: hello\ndata: {_hello()}\n\n"
+            while True:
+                try:
+                    message = await asyncio.wait_for(sub.get(), KEEPALIVE_S)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {message}\n\n"
+        finally:
+            state_bus.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
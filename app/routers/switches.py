@@ -1,8 +1,14 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import func, literal_column, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
 
-from db import SessionLocal
+from db import get_db
+from pagination import paginate
+from layout_cache import bump_layout_version
+from state_stream import state_bus
+from track_graph import track_graph
 from models import Switch, Accessory, Section
 from schemas import (
     SwitchCreate,
@@ -14,23 +20,16 @@ from schemas import (
 
 router = APIRouter(prefix="/switches", tags=["switches"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------- Create --------
 @router.post("", response_model=SwitchRead)
-def create_switch(payload: SwitchCreate, db: Session = Depends(get_db)):
+async def create_switch(payload: SwitchCreate, db: AsyncSession = Depends(get_db)):
     # Validate accessory exists
-    accessory = db.get(Accessory, payload.accessoryId)
+    accessory = await db.get(Accessory, payload.accessoryId)
     if not accessory:
         raise HTTPException(status_code=400, detail="accessoryId does not exist")
 
     # Validate section exists
-    section = db.get(Section, payload.sectionId)
+    section = await db.get(Section, payload.sectionId)
     if not section:
         raise HTTPException(status_code=400, detail="sectionId does not exist")
 
@@ -42,8 +41,10 @@ def create_switch(payload: SwitchCreate, db: Session = Depends(get_db)):
         IsActive=payload.isActive,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    bump_layout_version()
+    await db.refresh(item)
+    track_graph.upsert_switch(item)
     return SwitchRead(
         id=item.Id,
         name=item.Name,
@@ -55,7 +56,8 @@ def create_switch(payload: SwitchCreate, db: Session = Depends(get_db)):
 
 # -------- List (with filters & optional embedded relations) --------
 @router.get("", response_model=list[SwitchRead] | list[SwitchWithRelations])
-def list_switches(
+async def list_switches(
+    response: Response,
     includeRelations: bool = Query(default=False),
     sectionId: Optional[int] = Query(default=None),
     accessoryId: Optional[int] = Query(default=None),
@@ -64,22 +66,29 @@ def list_switches(
     q: Optional[str] = Query(default=None, description="search in name"),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(Switch)
+    stmt = select(Switch)
     if sectionId is not None:
-        qry = qry.filter(Switch.SectionId == sectionId)
+        stmt = stmt.where(Switch.SectionId == sectionId)
     if accessoryId is not None:
-        qry = qry.filter(Switch.AccessoryId == accessoryId)
+        stmt = stmt.where(Switch.AccessoryId == accessoryId)
     if position is not None:
-        qry = qry.filter(Switch.position == position)
+        stmt = stmt.where(Switch.position == position)
     if active is not None:
-        qry = qry.filter(Switch.IsActive == active)
+        stmt = stmt.where(Switch.IsActive == active)
     if q:
         like = f"%{q}%"
-        qry = qry.filter(Switch.Name.ilike(like))
+        stmt = stmt.where(Switch.Name.ilike(like))
     
-    rows = qry.order_by(Switch.Name.asc()).offset(offset).limit(limit).all()
+    if includeRelations:
+        stmt = stmt.options(joinedload(Switch.Accessory), joinedload(Switch.Section))
+    # Name is nullable; coalesce so unnamed switches still have a comparable key. The '' is a
+    # literal, not a bound parameter, so the planner matches the ix_Switches_Name_Id expression index
+    name_key = func.coalesce(Switch.Name, literal_column("''"))
+    rows = await paginate(db, stmt, (name_key, Switch.Id), lambda r: (r.Name or "", r.Id),
+                          response, limit, cursor, offset)
 
     if not includeRelations:
         return [
@@ -121,8 +130,8 @@ def list_switches(
 
 # -------- Read by id (with relations) --------
 @router.get("/{id}", response_model=SwitchWithRelations)
-def get_switch(id: int, db: Session = Depends(get_db)):
-    r = db.get(Switch, id)
+async def get_switch(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Switch, id, options=[joinedload(Switch.Accessory), joinedload(Switch.Section)])
     if not r:
         raise HTTPException(404, "Switch not found")
     
@@ -152,32 +161,37 @@ def get_switch(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=SwitchRead)
-def update_switch(
+async def update_switch(
     id: int,
     payload: SwitchCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(Switch, id)
+    r = await db.get(Switch, id)
     if not r:
         raise HTTPException(404, "Switch not found")
 
     # Validate accessory exists
-    accessory = db.get(Accessory, payload.accessoryId)
+    accessory = await db.get(Accessory, payload.accessoryId)
     if not accessory:
         raise HTTPException(400, "accessoryId does not exist")
 
     # Validate section exists
-    section = db.get(Section, payload.sectionId)
+    section = await db.get(Section, payload.sectionId)
     if not section:
         raise HTTPException(400, "sectionId does not exist")
 
+    position_changed = r.position != payload.position
     r.Name = payload.name
     r.AccessoryId = payload.accessoryId
     r.SectionId = payload.sectionId
     r.position = payload.position
     r.IsActive = payload.isActive
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    bump_layout_version()
+    if position_changed:
+        state_bus.switch_changed(r.Id, payload.position)
+    await db.refresh(r)
+    track_graph.upsert_switch(r)
     return SwitchRead(
         id=r.Id,
         name=r.Name,
@@ -189,16 +203,18 @@ def update_switch(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_switch(id: int, db: Session = Depends(get_db)):
-    r = db.get(Switch, id)
+async def delete_switch(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(Switch, id)
     if not r:
         raise HTTPException(404, "Switch not found")
     
     # Check if there are section connections using this switch
     from models import SectionConnection
-    if db.query(SectionConnection).filter(SectionConnection.SwitchId == id).first():
+    if await db.scalar(select(SectionConnection.Id).where(SectionConnection.SwitchId == id).limit(1)):
         raise HTTPException(400, "Switch is used in section connections; remove them first")
     
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    await db.commit()
+    bump_layout_version()
+    track_graph.remove_switch(id)
     return {"status": "ok"}
\ No newline at end of file
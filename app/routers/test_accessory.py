@@ -2,12 +2,11 @@
 Test router for accessory communication testing.
 Provides endpoints to test end-to-end communication with ESP32 nodes.
 """
-import yaml
-import os
-from typing import Optional, Dict, Any
+from typing import Optional
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
 from logging_config import get_logger
+from hardware.accessory_map import AccessoryIndex, AccessoryMapError, get_accessory_index, reload_accessory_index
 
 logger = get_logger("test_accessory")
 
@@ -30,36 +29,27 @@ class TestAccessoryResponse(BaseModel):
     simulated_result: str
     message: str
 
-def load_accessory_map() -> Dict[str, Any]:
-    """Load accessory mapping from accessory_map.yaml"""
-    # Look for the file in the project root directory
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    project_root = os.path.dirname(os.path.dirname(current_dir))
-    map_file = os.path.join(project_root, "accessory_map.yaml")
-    
+def load_accessory_index() -> AccessoryIndex:
+    """Compiled accessory map; re-parsed only when accessory_map.yaml changes"""
     try:
-        with open(map_file, 'r') as f:
-            return yaml.safe_load(f)
-    except FileNotFoundError:
-        logger.error(f"Accessory map file not found: {map_file}")
-        raise HTTPException(status_code=500, detail="Accessory map configuration not found")
-    except yaml.YAMLError as e:
-        logger.error(f"Error parsing accessory map: {e}")
-        raise HTTPException(status_code=500, detail="Invalid accessory map configuration")
+        return get_accessory_index()
+    except AccessoryMapError as e:
+        logger.error(str(e))
+        raise HTTPException(status_code=500, detail="Accessory map configuration not found or invalid")
 
 @router.get("/accessories")
 def list_test_accessories():
     """List all available accessories for testing"""
     try:
-        config = load_accessory_map()
+        index = load_accessory_index()
         accessories = []
         
-        for name, details in config.get("accessories", {}).items():
+        for entry in index.by_name.values():
             accessories.append({
-                "name": name,
-                "esp32_node": details.get("esp32_node"),
-                "control_type": details.get("control_type"),
-                "description": details.get("description", "")
+                "name": entry.name,
+                "esp32_node": entry.esp32_node,
+                "control_type": entry.control_type,
+                "description": entry.description
             })
         
         return {
@@ -77,28 +67,27 @@ def test_accessory_command(request: TestAccessoryRequest):
     Test endpoint to simulate sending commands to ESP32 nodes via accessories.
     
     This endpoint:
-    1. Looks up the accessory in accessory_map.yaml
+    1. Looks up the accessory in the compiled accessory_map.yaml index
     2. Extracts the ESP32 node and pin information
     3. Simulates sending the command (logs the action)
     4. Returns detailed information about the intended operation
     """
     try:
-        config = load_accessory_map()
-        accessories = config.get("accessories", {})
+        index = load_accessory_index()
         
         # Check if accessory exists
-        if request.accessory_name not in accessories:
-            available = list(accessories.keys())
+        accessory = index.by_name.get(request.accessory_name)
+        if accessory is None:
+            available = list(index.by_name.keys())
             raise HTTPException(
                 status_code=404, 
                 detail=f"Accessory '{request.accessory_name}' not found. Available: {available}"
             )
         
-        accessory = accessories[request.accessory_name]
-        esp32_node = accessory.get("esp32_node")
-        address = accessory.get("address")
-        pin = accessory.get("pin")
-        control_type = accessory.get("control_type")
+        esp32_node = accessory.esp32_node
+        address = accessory.address
+        pin = accessory.pin
+        control_type = accessory.control_type
         
         # Validate action against control type
         valid_actions = {
@@ -119,7 +108,7 @@ def test_accessory_command(request: TestAccessoryRequest):
         # Handle timed actions
         duration_ms = None
         if request.action == "timed" or (control_type == "timed" and request.action == "on"):
-            duration_ms = request.milliseconds or accessory.get("timed_duration_ms", 5000)
+            duration_ms = request.milliseconds or (accessory.timed_duration_ms or 5000)
         elif request.action == "toggle" and request.milliseconds:
             duration_ms = request.milliseconds
         
@@ -172,17 +161,16 @@ def test_accessory_command(request: TestAccessoryRequest):
 def list_esp32_nodes():
     """List all configured ESP32 nodes"""
     try:
-        config = load_accessory_map()
-        nodes = config.get("esp32_nodes", {})
+        index = load_accessory_index()
         
         node_list = []
-        for node_id, details in nodes.items():
+        for node in index.nodes.values():
             node_list.append({
-                "node_id": node_id,
-                "ip": details.get("ip"),
-                "port": details.get("port"),
-                "description": details.get("description", ""),
-                "location": details.get("location", "")
+                "node_id": node.node_id,
+                "ip": node.ip,
+                "port": node.port,
+                "description": node.description,
+                "location": node.location
             })
         
         return {
@@ -192,4 +180,18 @@ def list_esp32_nodes():
         }
     except Exception as e:
         logger.error(f"Error listing ESP32 nodes: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/reload")
+def reload_accessory_map():
+    """Force a re-parse of accessory_map.yaml (normally picked up on file change)"""
+    try:
+        index = reload_accessory_index()
+    except AccessoryMapError as e:
+        logger.error(f"Error reloading accessory map: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    return {
+        "status": "ok",
+        "accessories": len(index.by_name),
+        "nodes": len(index.nodes)
+    }
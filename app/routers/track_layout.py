@@ -1,8 +1,10 @@
 from typing import List, Optional
-from fastapi import APIRouter, Depends, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, contains_eager
 
-from db import SessionLocal
+from db import get_db
+from layout_cache import layout_version, get_snapshot, store_snapshot, etag_matches
 from models import Section, Switch, Accessory, SectionConnection, Category
 from schemas import (
     SectionRead,
@@ -14,13 +16,6 @@ from pydantic import BaseModel
 
 router = APIRouter(prefix="/track-layout", tags=["track-layout"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # Extended schemas for track layout with position data
 class TrackLayoutSwitch(BaseModel):
     id: int
@@ -56,15 +51,32 @@ class TrackLayoutResponse(BaseModel):
     connections: List[SectionConnectionRead]
 
 @router.get("", response_model=TrackLayoutResponse)
-def get_track_layout(
+async def get_track_layout(
     includeInactive: bool = Query(default=False, description="Include inactive items"),
-    db: Session = Depends(get_db)
+    if_none_match: Optional[str] = Header(default=None),
+    db: AsyncSession = Depends(get_db)
 ):
     """
     Get complete track layout data including sections, switches, accessories, and connections.
     This endpoint provides all data needed to render the virtual track layout.
+
+    The encoded response is cached until a layout write bumps the layout version;
+    clients that send the returned ETag back in If-None-Match get 304 Not Modified.
     """
-    
+    snap = get_snapshot(includeInactive)
+    if snap is None:
+        version = layout_version()
+        # rebuilt only after a layout write, so the sync helper is fine here
+        body = await db.run_sync(_build_layout, includeInactive)
+        snap = store_snapshot(includeInactive, version, body)
+
+    headers = {"ETag": snap.etag, "Cache-Control": "no-cache"}
+    if etag_matches(if_none_match, snap.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snap.body, media_type="application/json", headers=headers)
+
+
+def _build_layout(db: Session, includeInactive: bool) -> bytes:
     # Base query filter for active items
     active_filter = {} if includeInactive else {"IsActive": True}
     
@@ -81,7 +93,7 @@ def get_track_layout(
     switches = switches_query.order_by(Switch.Name).all()
     
     # Get accessories with category data
-    accessories_query = db.query(Accessory).join(Category)
+    accessories_query = db.query(Accessory).join(Category).options(contains_eager(Accessory.Category))
     if not includeInactive:
         accessories_query = accessories_query.filter(Accessory.IsActive == True)
     accessories = accessories_query.order_by(Accessory.Name).all()
@@ -150,4 +162,4 @@ def get_track_layout(
                 isActive=c.IsActive,
             ) for c in connections
         ]
-    )
\ No newline at end of file
+    ).model_dump_json().encode()
@@ -1,8 +1,11 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 
-from db import SessionLocal
+from db import get_db
+from pagination import paginate
 from models import TrackLine
 from schemas import (
     TrackLineCreate,
@@ -12,16 +15,9 @@ from schemas import (
 
 router = APIRouter(prefix="/trackLines", tags=["trackLines"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------- Create --------
 @router.post("", response_model=TrackLineRead)
-def create_track_line(payload: TrackLineCreate, db: Session = Depends(get_db)):
+async def create_track_line(payload: TrackLineCreate, db: AsyncSession = Depends(get_db)):
     item = TrackLine(
         Name=payload.name,
         Description=payload.description,
@@ -29,8 +25,8 @@ def create_track_line(payload: TrackLineCreate, db: Session = Depends(get_db)):
         IsActive=payload.isActive,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    await db.refresh(item)
     return TrackLineRead(
         id=item.Id,
         name=item.Name,
@@ -40,24 +36,28 @@ def create_track_line(payload: TrackLineCreate, db: Session = Depends(get_db)):
 
 # -------- List (with optional sections) --------
 @router.get("", response_model=list[TrackLineRead] | list[TrackLineWithSections])
-def list_track_lines(
+async def list_track_lines(
+    response: Response,
     includeSections: bool = Query(default=False),
     active: Optional[bool] = Query(default=None),
     q: Optional[str] = Query(default=None, description="search in name or description"),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(TrackLine)
+    stmt = select(TrackLine)
     if active is not None:
-        qry = qry.filter(TrackLine.IsActive == active)
+        stmt = stmt.where(TrackLine.IsActive == active)
     if q:
         like = f"%{q}%"
-        qry = qry.filter(
+        stmt = stmt.where(
             (TrackLine.Name.ilike(like)) |
             (TrackLine.Description.ilike(like))
         )
-    rows = qry.order_by(TrackLine.Name.asc()).offset(offset).limit(limit).all()
+    if includeSections:
+        stmt = stmt.options(selectinload(TrackLine.Sections))
+    rows = await paginate(db, stmt, (TrackLine.Name, TrackLine.Id), lambda r: (r.Name, r.Id), response, limit, cursor, offset)
 
     if not includeSections:
         return [
@@ -94,8 +94,8 @@ def list_track_lines(
 
 # -------- Read by id (with sections) --------
 @router.get("/{id}", response_model=TrackLineWithSections)
-def get_track_line(id: int, db: Session = Depends(get_db)):
-    r = db.get(TrackLine, id)
+async def get_track_line(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(TrackLine, id, options=[selectinload(TrackLine.Sections)])
     if not r:
         raise HTTPException(404, "Track line not found")
     
@@ -122,12 +122,12 @@ def get_track_line(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=TrackLineRead)
-def update_track_line(
+async def update_track_line(
     id: int,
     payload: TrackLineCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(TrackLine, id)
+    r = await db.get(TrackLine, id)
     if not r:
         raise HTTPException(404, "Track line not found")
 
@@ -135,8 +135,8 @@ def update_track_line(
     r.Description = payload.description
     # length field doesn't exist in new schema, removing
     r.IsActive = payload.isActive
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    await db.refresh(r)
     return TrackLineRead(
         id=r.Id,
         name=r.Name,
@@ -146,16 +146,16 @@ def update_track_line(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_track_line(id: int, db: Session = Depends(get_db)):
-    r = db.get(TrackLine, id)
+async def delete_track_line(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(TrackLine, id)
     if not r:
         raise HTTPException(404, "Track line not found")
     
     # Check if there are sections using this track line
     from models import Section
-    if db.query(Section).filter(Section.TrackLineId == id).first():
+    if await db.scalar(select(Section.Id).where(Section.TrackLineId == id).limit(1)):
         raise HTTPException(400, "Track line has sections; reassign or delete them first")
     
-    db.delete(r)
-    db.commit()
+    await db.delete(r)
+    await db.commit()
     return {"status": "ok"}
\ No newline at end of file
@@ -1,10 +1,14 @@
 from typing import Optional
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from datetime import datetime
 
-from db import SessionLocal
+from db import get_db
+from pagination import paginate
 from models import TrainAsset
+from tag_cache import tag_cache
 from schemas import (
     TrainAssetCreate,
     TrainAssetRead,
@@ -13,18 +17,11 @@ from schemas import (
 
 router = APIRouter(prefix="/trainAssets", tags=["trainAssets"])
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
 # -------- Create --------
 @router.post("", response_model=TrainAssetRead)
-def create_train_asset(payload: TrainAssetCreate, db: Session = Depends(get_db)):
+async def create_train_asset(payload: TrainAssetCreate, db: AsyncSession = Depends(get_db)):
     # Check if RFID tag ID already exists
-    exists = db.query(TrainAsset).filter(TrainAsset.RfidTagId == payload.rfidTagId).first()
+    exists = await db.scalar(select(TrainAsset.Id).where(TrainAsset.RfidTagId == payload.rfidTagId).limit(1))
     if exists:
         raise HTTPException(400, "RFID Tag ID already exists")
     
@@ -40,8 +37,9 @@ def create_train_asset(payload: TrainAssetCreate, db: Session = Depends(get_db))
         MaintenanceStatus=payload.maintenanceStatus,
     )
     db.add(item)
-    db.commit()
-    db.refresh(item)
+    await db.commit()
+    await db.refresh(item)
+    tag_cache.put(item.RfidTagId, item.Id)
     return TrainAssetRead(
         id=item.Id,
         assetId=item.AssetId,
@@ -57,28 +55,32 @@ def create_train_asset(payload: TrainAssetCreate, db: Session = Depends(get_db))
 
 # -------- List --------
 @router.get("", response_model=list[TrainAssetRead] | list[TrainAssetWithEvents])
-def list_train_assets(
+async def list_train_assets(
+    response: Response,
     includeEvents: bool = Query(default=False),
     active: Optional[bool] = Query(default=None),
     type: Optional[str] = Query(default=None),
     q: Optional[str] = Query(default=None, description="search in road number, asset ID, or description"),
     limit: int = Query(default=50, ge=1, le=500),
     offset: int = Query(default=0, ge=0),
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(default=None, description="X-Next-Cursor from the previous page"),
+    db: AsyncSession = Depends(get_db),
 ):
-    qry = db.query(TrainAsset)
+    stmt = select(TrainAsset)
     if active is not None:
-        qry = qry.filter(TrainAsset.Active == active)
+        stmt = stmt.where(TrainAsset.Active == active)
     if type is not None:
-        qry = qry.filter(TrainAsset.Type == type)
+        stmt = stmt.where(TrainAsset.Type == type)
     if q:
         like = f"%{q}%"
-        qry = qry.filter(
+        stmt = stmt.where(
             (TrainAsset.RoadNumber.ilike(like)) |
             (TrainAsset.AssetId.ilike(like)) |
             (TrainAsset.Description.ilike(like))
         )
-    rows = qry.order_by(TrainAsset.RoadNumber.asc()).offset(offset).limit(limit).all()
+    if includeEvents:
+        stmt = stmt.options(selectinload(TrainAsset.LocationEvents))
+    rows = await paginate(db, stmt, (TrainAsset.RoadNumber, TrainAsset.Id), lambda r: (r.RoadNumber, r.Id), response, limit, cursor, offset)
 
     if not includeEvents:
         return [
@@ -124,8 +126,8 @@ def list_train_assets(
 
 # -------- Read by id --------
 @router.get("/{id}", response_model=TrainAssetWithEvents)
-def get_train_asset(id: int, db: Session = Depends(get_db)):
-    r = db.get(TrainAsset, id)
+async def get_train_asset(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(TrainAsset, id, options=[selectinload(TrainAsset.LocationEvents)])
     if not r:
         raise HTTPException(404, "Train asset not found")
     
@@ -155,20 +157,23 @@ def get_train_asset(id: int, db: Session = Depends(get_db)):
 
 # -------- Update --------
 @router.put("/{id}", response_model=TrainAssetRead)
-def update_train_asset(
+async def update_train_asset(
     id: int,
     payload: TrainAssetCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
 ):
-    r = db.get(TrainAsset, id)
+    r = await db.get(TrainAsset, id)
     if not r:
         raise HTTPException(404, "Train asset not found")
 
     # Check if RFID tag ID already exists for a different asset
-    exists = db.query(TrainAsset).filter(TrainAsset.RfidTagId == payload.rfidTagId, TrainAsset.Id != id).first()
+    exists = await db.scalar(
+        select(TrainAsset.Id).where(TrainAsset.RfidTagId == payload.rfidTagId, TrainAsset.Id != id).limit(1)
+    )
     if exists:
         raise HTTPException(400, "RFID Tag ID already exists")
 
+    old_tag = r.RfidTagId
     r.AssetId = payload.assetId
     r.RfidTagId = payload.rfidTagId
     r.Type = payload.type.value
@@ -177,8 +182,11 @@ def update_train_asset(
     r.Active = payload.active
     r.LastServicedDate = payload.lastServicedDate
     r.MaintenanceStatus = payload.maintenanceStatus
-    db.commit()
-    db.refresh(r)
+    await db.commit()
+    await db.refresh(r)
+    if old_tag != r.RfidTagId:
+        tag_cache.remove(old_tag)
+    tag_cache.put(r.RfidTagId, r.Id)
     return TrainAssetRead(
         id=r.Id,
         assetId=r.AssetId,
@@ -194,16 +202,18 @@ def update_train_asset(
 
 # -------- Delete --------
 @router.delete("/{id}")
-def delete_train_asset(id: int, db: Session = Depends(get_db)):
-    r = db.get(TrainAsset, id)
+async def delete_train_asset(id: int, db: AsyncSession = Depends(get_db)):
+    r = await db.get(TrainAsset, id)
     if not r:
         raise HTTPException(404, "Train asset not found")
     
     # Check if there are location events for this asset
     from models import AssetLocationEvent
-    if db.query(AssetLocationEvent).filter(AssetLocationEvent.AssetId == id).first():
+    if await db.scalar(select(AssetLocationEvent.EventId).where(AssetLocationEvent.AssetId == id).limit(1)):
         raise HTTPException(400, "Train asset has location events; delete them first or set asset as inactive")
     
-    db.delete(r)
-    db.commit()
+    tag = r.RfidTagId
+    await db.delete(r)
+    await db.commit()
+    tag_cache.remove(tag)
     return {"status": "ok"}
\ No newline at end of file
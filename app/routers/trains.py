@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import get_db
+from models import TrainAsset
+from telemetry import train_telemetry
+from schemas import LapRead, TrainTelemetryRead, TransitRead
+
+router = APIRouter(prefix="/trains", tags=["trains"])
+
+# -------- Telemetry --------
+@router.get("/{assetId}/telemetry", response_model=TrainTelemetryRead)
+async def get_train_telemetry(assetId: int, db: AsyncSession = Depends(get_db)):
+    """Recent transits, laps and speed for an asset, from the in-memory telemetry processor.
+
+    Only an asset that hasn't been read since startup costs a query (to tell
+    it apart from an unknown id).
+    """
+    t = train_telemetry.get(assetId)
+    if t is None:
+        if not await db.scalar(select(TrainAsset.Id).where(TrainAsset.Id == assetId)):
+            raise HTTPException(404, "Train asset not found")
+        return TrainTelemetryRead(assetId=assetId)
+
+    speeds = [tr.speed for tr in t.transits if tr.speed is not None]
+    return TrainTelemetryRead(
+        assetId=t.assetId,
+        readerId=t.readerId,
+        location=t.location,
+        sectionId=t.sectionId,
+        lastSeen=t.lastSeen,
+        odometer=t.odometer,
+        transitCount=t.transitCount,
+        lapCount=t.lapCount,
+        averageSpeed=sum(speeds) / len(speeds) if speeds else None,
+        transits=[TransitRead(**vars(tr)) for tr in t.transits],
+        laps=[LapRead(**vars(lap)) for lap in t.laps],
+    )
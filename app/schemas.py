@@ -1,6 +1,6 @@
 import enum
 from typing import Optional, Literal
-from pydantic import BaseModel
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
 
 
@@ -129,6 +129,21 @@ class SectionConnectionWithRelations(SectionConnectionRead):
     toSection: Optional[SectionRead] = None
     switch: Optional[SwitchRead] = None
 
+# ---------- Routes ----------
+class RouteSwitchRead(BaseModel):
+    id: int
+    accessoryId: int
+    position: Literal["straight", "divergent"]  # position the route needs
+    currentPosition: Literal["straight", "divergent", "unknown"]
+
+class RouteRead(BaseModel):
+    fromSectionId: int
+    toSectionId: int
+    sections: list[int]  # ordered, from -> to
+    connections: list[int]
+    switches: list[RouteSwitchRead]
+    length: float
+
 # ---------- Actions / Requests ----------
 class TimedRequest(BaseModel):
     milliseconds: int = 5000  # default for timed actions
@@ -137,6 +152,44 @@ class ApplyRequest(TimedRequest):
     # Only meaningful for controlType == onOff
     state: Optional[Literal["on", "off"]] = None
 
+class RouteSwitchSet(BaseModel):
+    id: int  # switch id
+    position: Literal["straight", "divergent"]
+
+class RouteSetRequest(BaseModel):
+    # either a section pair (the route is computed) or an explicit switch list
+    fromSectionId: Optional[int] = None
+    toSectionId: Optional[int] = None
+    switches: Optional[list[RouteSwitchSet]] = None
+    milliseconds: int = 250  # pulse length for toggle switch motors
+    force: bool = False  # also pulse switches already in position
+
+    @model_validator(mode="after")
+    def _one_target(self):
+        pair = self.fromSectionId is not None and self.toSectionId is not None
+        if pair == (self.switches is not None):
+            raise ValueError("Provide either fromSectionId and toSectionId, or switches")
+        return self
+
+class RouteSetSwitchRead(BaseModel):
+    id: int
+    accessoryId: int
+    position: Literal["straight", "divergent"]
+    thrown: bool  # False when it was already in position
+
+class RouteSetRead(BaseModel):
+    sections: Optional[list[int]] = None  # only when the route was computed
+    switches: list[RouteSetSwitchRead]
+
+class RouteSetFailed(RouteSetRead):
+    detail: str  # which switches failed; thrown=True marks the ones that moved
+
+class ScheduledOffRead(BaseModel):
+    id: int  # accessory id
+    address: str
+    offAt: datetime
+    remainingMs: int
+
 # ---------- Train Assets ----------
 class TrainAssetCreate(BaseModel):
     assetId: Optional[str] = None  # optional, client-readable
@@ -168,3 +221,70 @@ class AssetLocationEventRead(AssetLocationEventCreate):
 
 class AssetLocationEventWithAsset(AssetLocationEventRead):
     asset: Optional[TrainAssetRead] = None
+
+class RfidRead(BaseModel):
+    # a raw reader detection; the asset is resolved from the tag
+    rfidTagId: str
+    location: str
+    readerId: str
+    timestamp: Optional[datetime] = None  # defaults to the time the batch arrives
+
+class AssetLocationEventBulkCreate(BaseModel):
+    events: list[RfidRead] = Field(max_length=20000)
+
+class AssetLocationEventBulkResult(BaseModel):
+    inserted: int
+    eventIds: list[int]  # ascending
+    unknownTags: list[str] = []  # reads for these tags were skipped
+    suppressed: int = 0  # repeat reads folded into a dwell instead of inserted
+
+class RfidDwellRead(BaseModel):
+    rfidTagId: str
+    readerId: str
+    firstSeen: datetime
+    lastSeen: datetime
+    reads: int
+
+class AssetLocationStatsRead(BaseModel):
+    bucket: datetime  # start of the minute/hour/day
+    assetId: Optional[int] = None  # whichever of these the stats are grouped by
+    readerId: Optional[str] = None
+    location: Optional[str] = None
+    reads: int
+    assets: int  # distinct assets seen
+    firstSeen: datetime
+    lastSeen: datetime
+    dwellSeconds: float  # lastSeen - firstSeen within the bucket
+
+# ---------- Trains (RFID telemetry) ----------
+class TransitRead(BaseModel):
+    fromReaderId: str
+    toReaderId: str
+    fromSectionId: Optional[int] = None
+    toSectionId: Optional[int] = None
+    departed: datetime
+    arrived: datetime
+    seconds: float
+    distance: Optional[float] = None  # section Length units
+    speed: Optional[float] = None  # distance per second
+
+class LapRead(BaseModel):
+    readerId: str
+    started: datetime
+    completed: datetime
+    seconds: float
+    transits: int
+    distance: Optional[float] = None
+
+class TrainTelemetryRead(BaseModel):
+    assetId: int
+    readerId: Optional[str] = None  # None until the asset has been read since startup
+    location: Optional[str] = None
+    sectionId: Optional[int] = None
+    lastSeen: Optional[datetime] = None
+    odometer: float = 0.0
+    transitCount: int = 0
+    lapCount: int = 0
+    averageSpeed: Optional[float] = None  # over the transits below that have a speed
+    transits: list[TransitRead] = []
+    laps: list[LapRead] = []
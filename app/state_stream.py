@@ -0,0 +1,100 @@
+"""
+In-process pub/sub for live accessory and switch state.
+
+Writers call ``state_bus.publish(...)`` with a compact delta; every connected
+dashboard (WebSocket or SSE, see routers/state.py) has a bounded queue that
+receives the pre-encoded message. Encoding happens once per event, not once
+per subscriber.
+
+A subscriber that falls behind loses its oldest messages rather than
+stalling the publisher. Each message carries a ``seq`` number, so a client
+that sees a gap knows to resync from ``/track-layout``.
+
+``publish`` is normally called on the event loop (the routers, the OFF
+scheduler, ``db.run_sync`` helpers). Calls from other threads, such as
+telemetry from the RFID writer's threadpool flushes, are handed to the loop.
+"""
+
+import asyncio
+import itertools
+import json
+import threading
+import time
+from typing import Any, Dict, Optional
+
+QUEUE_SIZE = 256
+
+
+class Subscription:
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.dropped = 0
+
+    async def get(self) -> str:
+        return await self.queue.get()
+
+    def offer(self, message: str):
+        if self.queue.full():
+            self.queue.get_nowait()  # drop oldest; the seq gap tells the client
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+
+class StateBus:
+    def __init__(self, queue_size: int = QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._subscribers: set[Subscription] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._seq = itertools.count(1)
+        self._last_seq = 0
+        self._seq_lock = threading.Lock()
+
+    @property
+    def last_seq(self) -> int:
+        return self._last_seq
+
+    @property
+    def subscriber_count(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> Subscription:
+        self._loop = asyncio.get_running_loop()
+        sub = Subscription(self.queue_size)
+        self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        self._subscribers.discard(sub)
+
+    def publish(self, event: Dict[str, Any]):
+        if not self._subscribers:
+            return
+        with self._seq_lock:
+            seq = self._last_seq = next(self._seq)
+        message = json.dumps({"seq": seq, "ts": time.time(), **event}, separators=(",", ":"), default=str)
+
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is loop:
+            self._fanout(message)
+        else:
+            loop.call_soon_threadsafe(self._fanout, message)
+
+    def _fanout(self, message: str):
+        for sub in list(self._subscribers):
+            sub.offer(message)
+
+    # ---- delta helpers ---------------------------------------------------------
+    def accessory_changed(self, id: int, state: str, **extra):
+        self.publish({"type": "accessory", "id": id, "state": state, **extra})
+
+    def switch_changed(self, id: int, position: str):
+        self.publish({"type": "switch", "id": id, "position": position})
+
+
+state_bus = StateBus()
@@ -0,0 +1,116 @@
+"""
+In-memory RfidTagId -> TrainAsset.Id map for RFID ingest.
+
+Loaded from TrainAssets at startup and kept current by the train_assets
+router (create/update/delete call ``tag_cache.put``/``tag_cache.remove``),
+so resolving a read is a dict lookup. A tag that is not in the map is looked
+up once; if the database doesn't know it either, it goes into a bounded
+negative cache for NEGATIVE_TTL_S seconds. A misconfigured reader spraying
+unknown tags then costs one query per tag per TTL instead of one per read.
+
+Like the layout cache, the map lives in this process. An asset created
+through another worker becomes visible here when its negative entry expires.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy.orm import Session
+
+NEGATIVE_TTL_S = float(os.getenv("RFID_NEGATIVE_TTL_S", "30"))
+NEGATIVE_MAX = int(os.getenv("RFID_NEGATIVE_MAX", "10000"))
+
+MISSING = object()  # get(): not cached either way
+
+
+class TagCache:
+    def __init__(self, negative_ttl_s: float = NEGATIVE_TTL_S, negative_max: int = NEGATIVE_MAX):
+        self.negative_ttl_s = negative_ttl_s
+        self.negative_max = negative_max
+        self.loaded = False
+        self._by_tag: Dict[str, int] = {}
+        self._negative: "OrderedDict[str, float]" = OrderedDict()  # tag -> expiry (monotonic)
+        self._lock = threading.Lock()
+
+    def load(self, db: Session):
+        from models import TrainAsset
+
+        rows = db.query(TrainAsset.RfidTagId, TrainAsset.Id).all()
+        with self._lock:
+            self._by_tag = dict(rows)
+            self._negative.clear()
+            self.loaded = True
+
+    def ensure_loaded(self, session_factory):
+        if self.loaded:
+            return
+        db = session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    # ---- lookups ---------------------------------------------------------------
+    def get(self, tag: str):
+        """Asset id, None for a known-unknown tag, or MISSING. Never touches the DB."""
+        asset_id = self._by_tag.get(tag)
+        if asset_id is not None:
+            return asset_id
+        expiry = self._negative.get(tag)
+        if expiry is not None and expiry > time.monotonic():
+            return None
+        return MISSING
+
+    def resolve(self, db: Session, tag: str) -> Optional[int]:
+        return self.resolve_many(db, (tag,)).get(tag)
+
+    def resolve_many(self, db: Session, tags: Iterable[str]) -> Dict[str, int]:
+        """Map each known tag to its asset id; misses are fetched with one IN query."""
+        found: Dict[str, int] = {}
+        misses = set()
+        for tag in set(tags):
+            hit = self.get(tag)
+            if hit is MISSING:
+                misses.add(tag)
+            elif hit is not None:
+                found[tag] = hit
+        if misses:
+            from models import TrainAsset
+
+            rows = dict(
+                db.query(TrainAsset.RfidTagId, TrainAsset.Id)
+                .filter(TrainAsset.RfidTagId.in_(misses))
+                .all()
+            )
+            found.update(rows)
+            with self._lock:
+                self._by_tag.update(rows)
+                expiry = time.monotonic() + self.negative_ttl_s
+                for tag in misses - rows.keys():
+                    self._negative[tag] = expiry
+                    self._negative.move_to_end(tag)
+                while len(self._negative) > self.negative_max:
+                    self._negative.popitem(last=False)
+        return found
+
+    # ---- invalidation (train_assets router) -------------------------------------
+    def put(self, tag: str, asset_id: int):
+        with self._lock:
+            self._by_tag[tag] = asset_id
+            self._negative.pop(tag, None)
+
+    def remove(self, tag: str):
+        with self._lock:
+            self._by_tag.pop(tag, None)
+
+    def clear(self):
+        with self._lock:
+            self._by_tag.clear()
+            self._negative.clear()
+            self.loaded = False
+
+
+tag_cache = TagCache()
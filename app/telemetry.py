@@ -0,0 +1,225 @@
+"""
+Per-asset transit, lap and speed telemetry derived from RFID events as they
+are ingested.
+
+Every committed AssetLocationEvent is fed to ``train_telemetry.observe_many``
+(by ``rfid_ingest.insert_reads`` and the single-event create endpoints).
+For each asset the processor remembers the last reader it passed:
+
+- a read at a different reader is a *transit*: the time from the last read at
+  the previous reader to this one, the track distance between the two
+  readers' sections and the resulting speed;
+- returning to any reader already passed since the last lap completes a
+  *lap* (so a loop is detected wherever the train entered it).
+
+Readers are placed on the layout through RFID_READER_SECTIONS
+("reader-1=12,reader-2=40"); otherwise an event whose Location matches an
+active section name is placed on that section. Distance is the shortest
+route between the two sections in the in-memory track graph (in section
+Length units); transits between unplaced readers still get a time, just no
+distance or speed.
+
+Only the last TELEMETRY_WINDOW transits and laps per asset are kept, in this
+process; totals (odometer, lap count) run from process start. Each transit
+and lap is also published on ``state_bus`` as a "telemetry" delta.
+
+Late events (older than the last one seen for that asset) are ignored.
+"""
+
+import os
+import threading
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import Deque, Dict, Iterable, Optional, Tuple
+
+from state_stream import state_bus
+from track_graph import track_graph
+
+TELEMETRY_WINDOW = int(os.getenv("TELEMETRY_WINDOW", "50"))
+
+
+def load_reader_sections() -> Dict[str, int]:
+    """Reader id -> section id from RFID_READER_SECTIONS."""
+    sections = {}
+    for item in os.getenv("RFID_READER_SECTIONS", "").split(","):
+        reader_id, _, section_id = item.strip().partition("=")
+        if reader_id and section_id:
+            sections[reader_id] = int(section_id)
+    return sections
+
+
+@dataclass(frozen=True)
+class Transit:
+    fromReaderId: str
+    toReaderId: str
+    fromSectionId: Optional[int]
+    toSectionId: Optional[int]
+    departed: datetime
+    arrived: datetime
+    seconds: float
+    distance: Optional[float]
+    speed: Optional[float]  # distance per second
+
+
+@dataclass(frozen=True)
+class Lap:
+    readerId: str  # where the loop was closed
+    started: datetime
+    completed: datetime
+    seconds: float
+    transits: int
+    distance: Optional[float]  # None if any transit in the lap had no distance
+
+
+@dataclass
+class _Visit:
+    at: datetime
+    transits: int  # asset's transit count when it passed
+    odometer: float
+    unplaced: int  # transits without a distance so far
+
+
+@dataclass
+class AssetTelemetry:
+    assetId: int
+    readerId: str
+    location: str
+    sectionId: Optional[int]
+    lastSeen: datetime
+    odometer: float = 0.0
+    transitCount: int = 0
+    lapCount: int = 0
+    transits: Deque[Transit] = field(default_factory=deque)
+    laps: Deque[Lap] = field(default_factory=deque)
+    _unplaced: int = 0
+    _visits: Dict[str, _Visit] = field(default_factory=dict)  # readers passed since the last lap
+
+
+class TelemetryProcessor:
+    def __init__(self, window: int = TELEMETRY_WINDOW, reader_sections: Optional[Dict[str, int]] = None):
+        self.window = window
+        self.reader_sections = load_reader_sections() if reader_sections is None else reader_sections
+        self._assets: Dict[int, AssetTelemetry] = {}
+        self._lock = threading.Lock()
+        # both caches are only valid for one CSR build of the track graph
+        self._csr = None
+        self._names: Dict[str, int] = {}
+        self._distances: Dict[Tuple[int, int], Optional[float]] = {}
+
+    # ---- ingest ----------------------------------------------------------------
+    def observe_many(self, events: Iterable[dict]):
+        """Feed committed events (column-named dicts, as from insert_reads) in time order."""
+        ordered = sorted(events, key=lambda e: (e["Timestamp"], e["EventId"]))
+        derived = []
+        with self._lock:
+            for e in ordered:
+                derived += self._observe(e["AssetId"], e["ReaderId"], e["Location"], e["Timestamp"])
+        for asset_id, kind, item in derived:
+            state_bus.publish({"type": "telemetry", "kind": kind, "assetId": asset_id, **asdict(item)})
+
+    def observe(self, asset_id: int, reader_id: str, location: str, ts: datetime):
+        self.observe_many([{"EventId": 0, "AssetId": asset_id, "ReaderId": reader_id,
+                            "Location": location, "Timestamp": ts}])
+
+    def _observe(self, asset_id, reader_id, location, ts) -> list:
+        t = self._assets.get(asset_id)
+        section_id = self._section_for(reader_id, location)
+        if t is None:
+            t = self._assets[asset_id] = AssetTelemetry(asset_id, reader_id, location, section_id, ts)
+            t._visits[reader_id] = _Visit(ts, 0, 0.0, 0)
+            return []
+        if ts < t.lastSeen:
+            return []
+        if reader_id == t.readerId:
+            t.lastSeen = ts  # still over the same reader
+            return []
+
+        seconds = (ts - t.lastSeen).total_seconds()
+        distance = self._distance(t.sectionId, section_id)
+        transit = Transit(
+            fromReaderId=t.readerId,
+            toReaderId=reader_id,
+            fromSectionId=t.sectionId,
+            toSectionId=section_id,
+            departed=t.lastSeen,
+            arrived=ts,
+            seconds=seconds,
+            distance=distance,
+            speed=distance / seconds if distance is not None and seconds > 0 else None,
+        )
+        t.transitCount += 1
+        if distance is None:
+            t._unplaced += 1
+        else:
+            t.odometer += distance
+        self._push(t.transits, transit)
+        derived = [(asset_id, "transit", transit)]
+
+        start = t._visits.get(reader_id)
+        if start is not None:
+            lap = Lap(
+                readerId=reader_id,
+                started=start.at,
+                completed=ts,
+                seconds=(ts - start.at).total_seconds(),
+                transits=t.transitCount - start.transits,
+                distance=t.odometer - start.odometer if t._unplaced == start.unplaced else None,
+            )
+            t.lapCount += 1
+            self._push(t.laps, lap)
+            t._visits.clear()
+            derived.append((asset_id, "lap", lap))
+        t._visits[reader_id] = _Visit(ts, t.transitCount, t.odometer, t._unplaced)
+
+        t.readerId, t.location, t.sectionId, t.lastSeen = reader_id, location, section_id, ts
+        return derived
+
+    def _push(self, window: deque, item):
+        window.append(item)
+        while len(window) > self.window:
+            window.popleft()
+
+    # ---- layout ----------------------------------------------------------------
+    def _refresh_layout(self):
+        csr = track_graph.csr
+        if csr is not self._csr:
+            self._csr = csr
+            self._names = {track_graph.sections[id].name.lower(): id for id in csr.node_ids}
+            self._distances = {}
+
+    def _section_for(self, reader_id: str, location: str) -> Optional[int]:
+        if reader_id in self.reader_sections:
+            return self.reader_sections[reader_id]
+        self._refresh_layout()
+        return self._names.get(location.lower())
+
+    def _distance(self, from_id: Optional[int], to_id: Optional[int]) -> Optional[float]:
+        if from_id is None or to_id is None:
+            return None
+        self._refresh_layout()
+        key = (from_id, to_id)
+        if key not in self._distances:
+            route = track_graph.shortest_path(from_id, to_id)
+            self._distances[key] = route.length if route else None
+        return self._distances[key]
+
+    # ---- queries ---------------------------------------------------------------
+    def get(self, asset_id: int) -> Optional[AssetTelemetry]:
+        """A copy of the asset's telemetry, safe to read outside the lock."""
+        with self._lock:
+            t = self._assets.get(asset_id)
+            if t is None:
+                return None
+            return AssetTelemetry(
+                t.assetId, t.readerId, t.location, t.sectionId, t.lastSeen, t.odometer,
+                t.transitCount, t.lapCount, deque(t.transits), deque(t.laps),
+            )
+
+    def clear(self):
+        with self._lock:
+            self._assets.clear()
+            self._csr = None
+
+
+train_telemetry = TelemetryProcessor()
@@ -0,0 +1,70 @@
+"""
+Shared fixtures
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+import db as db_module
+from db_profiling import instrument_engine
+from layout_cache import bump_layout_version
+from main import app
+from models import Base
+
+
+@pytest.fixture
+def sqlite_db(tmp_path):
+    """
+    A SQLite file with the schema, reachable both synchronously (seeding,
+    assertions, sync helpers) and through aiosqlite for the async routers.
+
+    The routers' get_db is overridden for the duration of the test. Attach
+    statement listeners to ``async_engine.sync_engine`` to see router queries.
+    TestClient runs each request on its own event loop, hence NullPool.
+    """
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{path}", poolclass=NullPool)
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    AsyncSession = async_sessionmaker(bind=async_engine, sync_session_class=db_module.RouterSession,
+                                      autoflush=False, expire_on_commit=False)
+
+    async def override_get_db():
+        async with AsyncSession() as db:
+            yield db
+
+    app.dependency_overrides[db_module.get_db] = override_get_db
+    try:
+        yield SimpleNamespace(
+            engine=engine,
+            Session=sessionmaker(autocommit=False, autoflush=False, bind=engine),
+            async_engine=async_engine,
+            AsyncSession=AsyncSession,
+        )
+    finally:
+        app.dependency_overrides.pop(db_module.get_db, None)
+        engine.dispose()
+
+
+@pytest.fixture
+def statements(sqlite_db):
+    """(statement, parameters) for every query the routers run, in order"""
+    recorded = []
+    event.listen(sqlite_db.async_engine.sync_engine, "before_cursor_execute",
+                 lambda conn, cursor, statement, parameters, *args: recorded.append((statement, parameters)))
+    return recorded
+
+
+@pytest.fixture
+def client(sqlite_db):
+    """TestClient over sqlite_db, with the cached track layout invalidated around the test"""
+    bump_layout_version()
+    yield TestClient(app)
+    bump_layout_version()
@@ -126,4 +126,47 @@ def test_invalid_action_for_control_type(client):
     
     # This should still work as we allow basic actions across types
     # but let's test a truly invalid case
-    assert response.status_code in [200, 400]  # Depends on validation logic
\ No newline at end of file
+    assert response.status_code in [200, 400]  # Depends on validation logic
+
+def test_reload_accessory_map(client):
+    """Test forcing a reload of the accessory map"""
+    response = client.post("/test/reload")
+    assert response.status_code == 200
+    data = response.json()
+    assert data["status"] == "ok"
+    assert data["accessories"] > 0
+    assert data["nodes"] > 0
+
+def test_accessory_index_lookups():
+    """Test the compiled index is keyed by name, node and (node, pin)"""
+    from hardware.accessory_map import get_accessory_index
+
+    index = get_accessory_index()
+    entry = index.by_name["Main Line Turnout 1"]
+    assert index.by_pin[("esp32-01", 2)] is entry
+    assert entry in index.by_node["esp32-01"]
+    assert index.nodes["esp32-01"].port == 8080
+    with pytest.raises(TypeError):
+        index.by_name["New"] = entry  # read-only
+
+def test_accessory_index_reparses_only_on_change(tmp_path):
+    """Test the index is cached until the file's mtime moves"""
+    import os
+    from hardware.accessory_map import get_accessory_index
+
+    map_file = tmp_path / "accessory_map.yaml"
+    map_file.write_text('accessories:\n  "Lamp":\n    esp32_node: "n1"\n    pin: 1\n')
+    first = get_accessory_index(str(map_file))
+    assert get_accessory_index(str(map_file)) is first
+
+    map_file.write_text('accessories:\n  "Lamp":\n    esp32_node: "n1"\n    pin: 2\n')
+    os.utime(map_file, (first.mtime + 5, first.mtime + 5))
+    second = get_accessory_index(str(map_file))
+    assert second is not first
+    assert second.by_name["Lamp"].pin == 2
+
+    # a broken edit keeps the last good index
+    map_file.write_text("accessories: [unclosed\n")
+    os.utime(map_file, (first.mtime + 10, first.mtime + 10))
+    assert get_accessory_index(str(map_file)) is second
+    assert get_accessory_index() is not second  # other files keep their own index
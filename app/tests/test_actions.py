@@ -0,0 +1,68 @@
+"""
+Tests for the accessory action endpoints
+"""
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+import db as db_module
+from main import app
+from models import Accessory, Category
+from routers import actions
+
+
+@pytest.fixture
+def small_pool(sqlite_db, tmp_path):
+    """One accessory; the routers get a pool of a single connection that times out fast"""
+    db = sqlite_db.Session()
+    cat = Category(Name="Switches")
+    db.add(cat)
+    db.flush()
+    db.add(Accessory(Name="Motor", CategoryId=cat.Id, ControlType="toggle", Address="101"))
+    db.commit()
+    db.close()
+
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", poolclass=AsyncAdaptedQueuePool,
+                                 pool_size=1, max_overflow=0, pool_timeout=0.2)
+    Session = async_sessionmaker(bind=engine, sync_session_class=db_module.RouterSession, expire_on_commit=False)
+
+    async def override_get_db():
+        async with Session() as db:
+            yield db
+
+    app.dependency_overrides[db_module.get_db] = override_get_db
+    yield engine
+
+
+@pytest.mark.asyncio
+async def test_pulses_do_not_hold_a_connection(small_pool):
+    """More concurrent pulses than pooled connections, each longer than the pool timeout"""
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        responses = await asyncio.gather(*(client.post("/actions/accessories/1/pulse/400") for _ in range(5)))
+    await small_pool.dispose()
+
+    assert [r.status_code for r in responses] == [200] * 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("control_type, body", [("onOff", {"state": "on"}), ("toggle", {"milliseconds": 10})])
+async def test_apply_cancels_a_pending_timed_off(sqlite_db, control_type, body):
+    db = sqlite_db.Session()
+    cat = Category(Name="Lights")
+    db.add(cat)
+    db.flush()
+    db.add(Accessory(Name="Lamp", CategoryId=cat.Id, ControlType=control_type, Address="201"))
+    db.commit()
+    db.close()
+
+    actions.scheduler.schedule(1, "201", 60_000)  # left over from an earlier timed trigger
+    try:
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            response = await client.post("/actions/accessories/1/apply", json=body)
+        assert response.status_code == 200
+        assert actions.scheduler.pending() == []
+    finally:
+        await actions.scheduler.aclose()
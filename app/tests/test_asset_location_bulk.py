@@ -0,0 +1,150 @@
+"""
+Tests for bulk RFID ingestion (POST /assetLocationEvents/bulk)
+"""
+import pytest
+
+from models import TrainAsset, AssetLocationEvent
+from rfid_ingest import read_debouncer
+from tag_cache import tag_cache
+
+
+@pytest.fixture
+def tagged_assets(sqlite_db):
+    """Two tagged assets in SQLite, with empty tag and debounce caches"""
+    db = sqlite_db.Session()
+    db.add_all([
+        TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="4501"),
+        TrainAsset(RfidTagId="TAG-2", Type="Car", RoadNumber="88"),
+    ])
+    db.commit()
+    db.close()
+
+    tag_cache.clear()
+    read_debouncer.clear()
+    try:
+        yield
+    finally:
+        tag_cache.clear()
+        read_debouncer.clear()
+
+
+def test_bulk_insert_uses_one_lookup_and_one_insert(client, statements, sqlite_db, tagged_assets, monkeypatch):
+    monkeypatch.setattr(read_debouncer, "window_ms", 0)
+    reads = [
+        {"rfidTagId": f"TAG-{i % 2 + 1}", "location": "Yard", "readerId": f"R{i % 3}"}
+        for i in range(500)
+    ]
+
+    response = client.post("/assetLocationEvents/bulk", json={"events": reads})
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["inserted"] == 500
+    assert body["unknownTags"] == []
+    assert body["eventIds"] == sorted(body["eventIds"])
+    inserts = [sql for sql, _ in statements if sql.lstrip().upper().startswith("INSERT")]
+    selects = [sql for sql, _ in statements if sql.lstrip().upper().startswith("SELECT")]
+    assert len(selects) == 1
+    assert 1 <= len(inserts) <= 2  # insertmanyvalues may split very large batches
+
+    db = sqlite_db.Session()
+    assert db.query(AssetLocationEvent).count() == 500
+    first = db.get(AssetLocationEvent, body["eventIds"][0])
+    assert (first.RfidTagId, first.ReaderId) == ("TAG-1", "R0")
+    db.close()
+
+
+def test_bulk_skips_unknown_tags_and_keeps_reader_timestamps(client, sqlite_db, tagged_assets):
+    reads = [
+        {"rfidTagId": "TAG-2", "location": "Mainline", "readerId": "R1", "timestamp": "2025-01-01T12:00:00+02:00"},
+        {"rfidTagId": "NOPE", "location": "Mainline", "readerId": "R1"},
+    ]
+
+    body = client.post("/assetLocationEvents/bulk", json={"events": reads}).json()
+
+    assert body["inserted"] == 1
+    assert body["unknownTags"] == ["NOPE"]
+    db = sqlite_db.Session()
+    stored = db.get(AssetLocationEvent, body["eventIds"][0])
+    assert stored.Timestamp.isoformat() == "2025-01-01T10:00:00"
+    db.close()
+
+
+def test_bulk_empty_batch(client, statements, tagged_assets):
+    response = client.post("/assetLocationEvents/bulk", json={"events": []})
+    assert response.json() == {"inserted": 0, "eventIds": [], "unknownTags": [], "suppressed": 0}
+    assert statements == []
+
+
+def test_bulk_folds_repeat_reads_into_dwell(client, tagged_assets):
+    reads = [
+        {"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1", "timestamp": f"2025-01-01T12:00:{i:02d}.500"}
+        for i in range(30)
+    ]
+    # the tag leaves and comes back after the 2s window
+    reads.append({"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1", "timestamp": "2025-01-01T12:00:45"})
+
+    body = client.post("/assetLocationEvents/bulk", json={"events": reads}).json()
+
+    assert (body["inserted"], body["suppressed"]) == (2, 29)
+    dwell = client.get("/assetLocationEvents/dwell", params={"rfidTagId": "TAG-1"}).json()
+    assert [(d["readerId"], d["reads"]) for d in dwell] == [("R1", 1)]
+
+
+def test_latest_locations_follow_ingest(client, statements, tagged_assets):
+    reads = [
+        {"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1", "timestamp": "2025-01-01T12:00:00"},
+        {"rfidTagId": "TAG-1", "location": "Mainline", "readerId": "R2", "timestamp": "2025-01-01T12:05:00"},
+        {"rfidTagId": "TAG-2", "location": "Siding", "readerId": "R3", "timestamp": "2025-01-01T12:01:00"},
+    ]
+    client.post("/assetLocationEvents/bulk", json={"events": reads})
+    # a late read with an older timestamp must not move the engine back
+    late = [{"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R9", "timestamp": "2025-01-01T11:00:00"}]
+    client.post("/assetLocationEvents/bulk", json={"events": late})
+
+    statements.clear()
+    latest = client.get("/assetLocationEvents/latest").json()
+    assert [(r["assetId"], r["location"]) for r in latest] == [(1, "Mainline"), (2, "Siding")]
+    assert len(statements) == 1
+
+    one = client.get("/assetLocationEvents/assets/1/latest").json()
+    assert one["readerId"] == "R2"
+
+    assert client.delete(f"/assetLocationEvents/{one['eventId']}").status_code == 200
+    assert client.get("/assetLocationEvents/assets/1/latest").json()["readerId"] == "R1"
+
+
+def test_single_create_updates_latest(client, tagged_assets):
+    created = client.post("/assetLocationEvents/byTag", json={"rfidTagId": "TAG-2", "location": "Depot", "readerId": "R4"})
+    assert created.status_code == 200
+
+    latest = client.get("/assetLocationEvents/latest").json()
+    assert latest == [created.json()]
+
+
+def test_failed_insert_does_not_swallow_the_retry(client, sqlite_db, tagged_assets, monkeypatch):
+    from routers import asset_location_events
+
+    real_insert = asset_location_events.insert_reads
+    calls = []
+
+    def flaky_insert(db, reads):
+        calls.append(1)
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        return real_insert(db, reads)
+
+    monkeypatch.setattr(asset_location_events, "insert_reads", flaky_insert)
+    batch = {"events": [{"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1",
+                         "timestamp": "2025-01-01T12:00:00"}]}
+
+    with pytest.raises(RuntimeError):
+        client.post("/assetLocationEvents/bulk", json=batch)
+    retry = client.post("/assetLocationEvents/bulk", json=batch)
+
+    assert retry.status_code == 200
+    assert retry.json()["inserted"] == 1
+    assert retry.json()["suppressed"] == 0
+    db = sqlite_db.Session()
+    assert db.query(AssetLocationEvent).count() == 1
+    db.close()
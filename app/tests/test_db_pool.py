@@ -0,0 +1,78 @@
+"""
+Tests for pool metrics, the idle pre-ping and the /metrics endpoint
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, exc, text
+
+from db_pool import CHECKED_OUT, CHECKOUT_SECONDS, CHECKOUT_TIMEOUTS, INVALIDATIONS, PINGS, TimedQueuePool, instrument_pool
+from main import app
+from metrics import Histogram, Registry, _Metric
+
+
+def _engine(tmp_path, name, **kwargs):
+    engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=TimedQueuePool, pool_size=1,
+                           max_overflow=0, pool_timeout=0.05, pool_logging_name=name)
+    instrument_pool(engine, name, **kwargs)
+    return engine
+
+
+def test_checkout_wait_and_timeouts_are_recorded(tmp_path):
+    engine = _engine(tmp_path, "test-starved", pre_ping="off")
+    held = engine.connect()
+    assert CHECKED_OUT.labels(pool="test-starved").value == 1
+    with pytest.raises(exc.TimeoutError):
+        engine.connect()
+    held.close()
+
+    assert CHECKOUT_TIMEOUTS.labels(pool="test-starved").value == 1
+    waits = CHECKOUT_SECONDS.labels(pool="test-starved")
+    assert waits.count == 2 and waits.sum >= 0.05
+    assert CHECKED_OUT.labels(pool="test-starved").value == 0
+    engine.dispose()
+
+
+def test_idle_connection_is_pinged_and_replaced_when_stale(tmp_path, monkeypatch):
+    engine = _engine(tmp_path, "test-idle", pre_ping="idle", ping_idle_s=0)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert PINGS.labels(pool="test-idle", result="stale").value == 0
+
+    answers = iter([False])
+    monkeypatch.setattr(engine.dialect, "do_ping", lambda dbapi_connection: next(answers, True))
+    with engine.connect() as conn:
+        assert conn.execute(text("SELECT 1")).scalar() == 1
+    assert PINGS.labels(pool="test-idle", result="stale").value == 1
+    assert INVALIDATIONS.labels(pool="test-idle").value == 1
+    engine.dispose()
+
+
+def test_metrics_endpoint_renders_prometheus_text():
+    registry = Registry()
+    latency = Histogram("test_latency_seconds", "Test latency", ["route"], buckets=(0.1, 1.0), registry=registry)
+    latency.labels(route='/a"b').observe(0.05)
+    latency.labels(route='/a"b').observe(0.5)
+    assert registry.render().splitlines()[2:] == [
+        'test_latency_seconds_bucket{route="/a\\"b",le="0.1"} 1',
+        'test_latency_seconds_bucket{route="/a\\"b",le="1.0"} 2',
+        'test_latency_seconds_bucket{route="/a\\"b",le="+Inf"} 2',
+        'test_latency_seconds_sum{route="/a\\"b"} 0.55',
+        'test_latency_seconds_count{route="/a\\"b"} 2',
+    ]
+
+    response = TestClient(app).get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert "# TYPE db_pool_checkout_seconds histogram" in response.text
+    assert 'db_pool_checked_out{pool="async"}' in response.text
+
+
+def test_incomplete_metric_type_fails_at_instantiation():
+    class Unrenderable(_Metric):
+        type = "counter"
+
+        def _new_child(self):
+            return None
+
+    with pytest.raises(TypeError):
+        Unrenderable("test_unrenderable", "No render()", registry=None)
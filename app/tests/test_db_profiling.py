@@ -0,0 +1,59 @@
+"""
+Tests for per-request SQL statement counts and database time
+"""
+import json
+import logging
+from datetime import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from middleware import DB_QUERIES, DB_SECONDS
+from models import AssetLocationEvent, TrainAsset
+
+
+@pytest.fixture
+def client(sqlite_db):
+    """Five assets with two events each"""
+    db = sqlite_db.Session()
+    for i in range(5):
+        asset = TrainAsset(RfidTagId=f"TAG-{i}", Type="Car", RoadNumber=str(i))
+        db.add(asset)
+        db.flush()
+        db.add_all([AssetLocationEvent(AssetId=asset.Id, RfidTagId=asset.RfidTagId, Location="Yard", ReaderId="r1",
+                                       Timestamp=datetime(2026, 1, 1, 0, n)) for n in range(2)])
+    db.commit()
+    db.close()
+    DB_QUERIES.clear()
+    DB_SECONDS.clear()
+    yield TestClient(app)
+
+
+def _request_logs(caplog):
+    return [json.loads(r.getMessage()) for r in caplog.records if r.name == "request"]
+
+
+def test_request_log_and_histograms_carry_query_counts(client, caplog):
+    with caplog.at_level(logging.INFO, logger="request"):
+        assert client.get("/trainAssets", params={"includeEvents": "true"}).status_code == 200
+        assert client.get("/trainAssets/3").status_code == 200
+        assert client.get("/trainAssets/4").status_code == 200
+        assert client.get("/health").status_code == 200
+
+    logs = _request_logs(caplog)
+    assert [(entry["path"], entry["db_query_count"]) for entry in logs] == [
+        ("/trainAssets", 2), ("/trainAssets/3", 2), ("/trainAssets/4", 2), ("/health", 0),
+    ]
+    assert all(entry["db_time_ms"] >= 0 for entry in logs)
+
+    # one series per route template, not per id
+    by_id = DB_QUERIES.labels(method="GET", route="/trainAssets/{id}")
+    assert (by_id.count, by_id.sum) == (2, 4)
+    assert DB_SECONDS.labels(method="GET", route="/trainAssets/{id}").count == 2
+    assert 'http_request_db_queries_count{method="GET",route="/trainAssets"} 1' in client.get("/metrics").text
+
+
+def test_unmatched_paths_share_one_series(client):
+    assert client.get("/no/such/thing").status_code == 404
+    assert DB_QUERIES.labels(method="GET", route="unmatched").count == 1
@@ -0,0 +1,171 @@
+"""
+Tests for the ESP32 HTTP transport against the mock nodes in labtest/mock_esp32.py
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+import pytest_asyncio
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("aiohttp_cors")
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "..", "labtest"))
+import mock_esp32  # noqa: E402
+
+from hardware.esp32 import Esp32Transport, HardwareError  # noqa: E402
+
+MOCK_NODES = {f"esp32-0{i}": f"http://127.0.0.1:808{i}" for i in range(1, 6)}
+
+
+@pytest_asyncio.fixture
+async def mock_nodes():
+    nodes, runners = await mock_esp32.start_nodes()
+    try:
+        yield {n.node_id: n for n in nodes}
+    finally:
+        for runner in runners:
+            await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_on_off_reaches_every_mock_node(mock_nodes):
+    transport = Esp32Transport(nodes=MOCK_NODES)
+    try:
+        for node_id in MOCK_NODES:
+            await transport.send(f"{node_id}/7", "on")
+        for node_id, node in mock_nodes.items():
+            assert node.pin_states[7]["state"] == "on"
+
+        await transport.send("esp32-03/7", "off")
+        assert mock_nodes["esp32-03"].pin_states[7]["state"] == "off"
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_literal_host_port_address(mock_nodes):
+    transport = Esp32Transport(nodes={})
+    try:
+        result = await transport.send("127.0.0.1:8082/4", "on")
+        assert result["node_id"] == "esp32-02"
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_burst_shares_pooled_client(mock_nodes):
+    transport = Esp32Transport(nodes=MOCK_NODES, max_per_node=2)
+    try:
+        await asyncio.gather(*(transport.send(f"esp32-05/{pin}", "on") for pin in range(20)))
+        client = transport._client
+        await transport.send("esp32-05/1", "off")
+        assert transport._client is client
+        assert len(mock_nodes["esp32-05"].pin_states) == 20
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_invalid_address_is_rejected():
+    transport = Esp32Transport(nodes=MOCK_NODES)
+    with pytest.raises(HardwareError):
+        transport.resolve("101")
+    with pytest.raises(HardwareError):
+        transport.resolve("esp32-99/2")
+
+
+@pytest.mark.asyncio
+async def test_unreachable_node_retries_then_fails():
+    transport = Esp32Transport(nodes={"dead": "http://127.0.0.1:1"}, retries=2, timeout_ms=200)
+    try:
+        with pytest.raises(HardwareError):
+            await transport.send("dead/2", "on")
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_burst_to_one_node_is_coalesced_into_a_batch(mock_nodes):
+    transport = Esp32Transport(nodes=MOCK_NODES, batch_window_ms=5)
+    paths = []
+    original_post = transport.post
+
+    async def counting_post(base_url, path, payload, idempotent=False):
+        paths.append((base_url, path))
+        return await original_post(base_url, path, payload, idempotent=idempotent)
+
+    transport.post = counting_post
+    try:
+        results = await asyncio.gather(
+            *(transport.send(f"esp32-01/{pin}", "on") for pin in range(10)),
+            transport.send("esp32-02/3", "on"),
+        )
+        assert [r["pin"] for r in results[:10]] == list(range(10))
+        assert sorted(paths) == [
+            (MOCK_NODES["esp32-01"], "/control/batch"),
+            (MOCK_NODES["esp32-02"], "/control"),
+        ]
+        assert len(mock_nodes["esp32-01"].pin_states) == 10
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_reports_per_command_failures(mock_nodes):
+    transport = Esp32Transport(nodes=MOCK_NODES, batch_window_ms=5)
+    try:
+        ok, bad = await asyncio.gather(
+            transport.send("esp32-04/9", "on"),
+            transport.send("esp32-04/10", "explode"),
+            return_exceptions=True,
+        )
+        assert ok["status"] == "success"
+        assert isinstance(bad, HardwareError)
+        assert mock_nodes["esp32-04"].pin_states[9]["state"] == "on"
+    finally:
+        await transport.aclose()
+
+
+@pytest.mark.asyncio
+async def test_malformed_reply_is_a_hardware_error():
+    transport = Esp32Transport(nodes=MOCK_NODES, batch_window_ms=0)
+    transport._bind_loop()
+    transport._client = httpx.AsyncClient(transport=httpx.MockTransport(lambda request: httpx.Response(200, text="<html>")))
+    try:
+        with pytest.raises(HardwareError, match="malformed"):
+            await transport.send("esp32-01/2", "on")
+    finally:
+        await transport.aclose()
+
+
+def test_loop_change_releases_the_old_loop_state():
+    transport = Esp32Transport(nodes=MOCK_NODES, batch_window_ms=60_000)
+    state = {}
+
+    async def first():
+        state["client"] = transport._get_client()
+        asyncio.create_task(transport.send("esp32-01/2", "on"))
+        await asyncio.sleep(0)
+        state["timer"] = transport._flush_timers["http://127.0.0.1:8081"]
+
+    async def second():
+        assert transport._get_client() is not state["client"]
+        await transport.aclose()
+
+    asyncio.run(first())
+    asyncio.run(second())
+    assert state["timer"].cancelled()
+    assert state["client"].is_closed
+
+
+@pytest.mark.asyncio
+async def test_mock_batch_rejects_a_bad_pin_on_its_own(mock_nodes):
+    async with httpx.AsyncClient() as client:
+        response = await client.post("http://127.0.0.1:8081/control/batch",
+                                     json={"commands": [{"pin": "x", "action": "on"}, {"pin": 3, "action": "on"}]})
+    assert response.status_code == 200
+    assert [r["status"] for r in response.json()["results"]] == ["error", "success"]
+    assert mock_nodes["esp32-01"].pin_states[3]["state"] == "on"
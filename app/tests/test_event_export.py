@@ -0,0 +1,76 @@
+"""
+Tests for GET /assetLocationEvents/export
+"""
+import asyncio
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select
+
+from main import app
+from models import TrainAsset, AssetLocationEvent
+from routers import asset_location_events
+
+
+@pytest.fixture
+def client(sqlite_db, monkeypatch):
+    """One asset with 25 events a minute apart, exported in batches of 10"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    asset = TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="4501")
+    db.add(asset)
+    db.flush()
+    start = datetime(2026, 1, 1)
+    db.add_all([
+        AssetLocationEvent(AssetId=asset.Id, RfidTagId="TAG-1", Location=f"Zone {i}", ReaderId=f"r{i % 2}",
+                           Timestamp=start + timedelta(minutes=i))
+        for i in range(25)
+    ])
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(asset_location_events, "EXPORT_BATCH_ROWS", 10)
+    app.dependency_overrides[asset_location_events.get_session_factory] = lambda: sqlite_db.AsyncSession
+    try:
+        yield TestClient(app)
+    finally:
+        app.dependency_overrides.pop(asset_location_events.get_session_factory, None)
+
+
+def test_ndjson_export_streams_in_batches(client):
+    response = client.get("/assetLocationEvents/export")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    rows = [json.loads(line) for line in response.text.splitlines()]
+    assert len(rows) == 25
+    assert rows[0] == {"eventId": 1, "assetId": 1, "rfidTagId": "TAG-1", "location": "Zone 0",
+                       "readerId": "r0", "timestamp": "2026-01-01T00:00:00"}
+    assert [r["eventId"] for r in rows] == list(range(1, 26))
+
+    # the body is produced one yield_per batch at a time, not the whole table at once
+    Session = app.dependency_overrides[asset_location_events.get_session_factory]()
+    stmt = select(AssetLocationEvent.EventId, AssetLocationEvent.AssetId, AssetLocationEvent.RfidTagId,
+                  AssetLocationEvent.Location, AssetLocationEvent.ReaderId, AssetLocationEvent.Timestamp)
+
+    async def collect():
+        return [c async for c in asset_location_events._export_chunks(Session, stmt, "ndjson")]
+
+    chunks = asyncio.run(collect())
+    assert [c.count("\n") for c in chunks] == [10, 10, 5]
+
+
+def test_csv_export_with_filters(client):
+    response = client.get("/assetLocationEvents/export", params={
+        "format": "csv", "from": "2026-01-01T00:10:00", "to": "2026-01-01T00:20:00", "readerId": "r1",
+    })
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/csv")
+    rows = list(csv.DictReader(io.StringIO(response.text)))
+    assert [r["location"] for r in rows] == [f"Zone {i}" for i in range(11, 20, 2)]
+
+    assert client.get("/assetLocationEvents/export", params={"format": "xml"}).status_code == 422
@@ -0,0 +1,39 @@
+"""
+Tests for the AssetLocationEvents partition helpers (the DDL itself needs Postgres)
+"""
+from datetime import datetime
+
+import pytest
+
+from event_partitions import Partition, expired, next_period, parse_bound, partition_name, period_start
+
+
+def test_period_math():
+    ts = datetime(2026, 12, 31, 23, 59)
+    assert period_start(ts, "month") == datetime(2026, 12, 1)
+    assert next_period(datetime(2026, 12, 1), "month") == datetime(2027, 1, 1)
+    assert period_start(ts, "day") == datetime(2026, 12, 31)
+    assert next_period(datetime(2026, 12, 31), "day") == datetime(2027, 1, 1)
+    with pytest.raises(ValueError):
+        period_start(ts, "week")
+
+
+def test_partition_names_and_bounds():
+    assert partition_name(datetime(2026, 3, 1), "month") == "AssetLocationEvents_p2026_03"
+    assert partition_name(datetime(2026, 3, 9), "day") == "AssetLocationEvents_p2026_03_09"
+
+    expr = "FOR VALUES FROM ('2026-03-01 00:00:00') TO ('2026-04-01 00:00:00')"
+    assert parse_bound(expr) == (datetime(2026, 3, 1), datetime(2026, 4, 1))
+    assert parse_bound("DEFAULT") == (None, None)
+
+
+def test_only_fully_expired_partitions_are_dropped():
+    parts = [
+        Partition("AssetLocationEvents_p2026_01", datetime(2026, 1, 1), datetime(2026, 2, 1)),
+        Partition("AssetLocationEvents_p2026_02", datetime(2026, 2, 1), datetime(2026, 3, 1)),
+        Partition("AssetLocationEvents_default", None, None),
+    ]
+    now = datetime(2026, 3, 15)
+    assert [p.name for p in expired(parts, now, 30)] == ["AssetLocationEvents_p2026_01"]
+    assert [p.name for p in expired(parts, now, 14)] == ["AssetLocationEvents_p2026_01", "AssetLocationEvents_p2026_02"]
+    assert expired(parts, now, 0) == []
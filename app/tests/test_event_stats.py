@@ -0,0 +1,68 @@
+"""
+Tests for GET /assetLocationEvents/stats
+"""
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models import TrainAsset, AssetLocationEvent, AssetLocationHourly
+
+
+@pytest.fixture
+def client(sqlite_db):
+    """Two engines lapping two readers over two hours, plus one rolled-up hour from the day before"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    a, b = TrainAsset(RfidTagId="TAG-A", Type="Engine", RoadNumber="1"), TrainAsset(RfidTagId="TAG-B", Type="Engine", RoadNumber="2")
+    db.add_all([a, b])
+    db.flush()
+    start = datetime(2026, 5, 1, 10, 0)
+    for i in range(12):  # every 10 minutes, alternating readers
+        ts = start + timedelta(minutes=10 * i)
+        reader = "lap" if i % 2 == 0 else "yard"
+        db.add(AssetLocationEvent(AssetId=a.Id, RfidTagId="TAG-A", Location=reader.title(), ReaderId=reader, Timestamp=ts))
+        if i < 3:
+            db.add(AssetLocationEvent(AssetId=b.Id, RfidTagId="TAG-B", Location="Lap", ReaderId="lap", Timestamp=ts))
+    db.add(AssetLocationHourly(AssetId=a.Id, Hour=datetime(2026, 4, 30, 9), Reads=40, FirstSeen=datetime(2026, 4, 30, 9, 1),
+                               LastSeen=datetime(2026, 4, 30, 9, 59), LastLocation="Lap", LastReaderId="lap"))
+    db.commit()
+    db.close()
+
+    yield TestClient(app)
+
+
+def test_hourly_stats_per_asset(client):
+    response = client.get("/assetLocationEvents/stats", params={"groupBy": "asset", "bucket": "hour"})
+    assert response.status_code == 200
+    rows = [(r["bucket"], r["assetId"], r["reads"], r["dwellSeconds"]) for r in response.json()]
+    assert rows == [
+        ("2026-04-30T09:00:00", 1, 40, 58 * 60.0),  # from the rollup
+        ("2026-05-01T10:00:00", 1, 6, 50 * 60.0),
+        ("2026-05-01T10:00:00", 2, 3, 20 * 60.0),
+        ("2026-05-01T11:00:00", 1, 6, 50 * 60.0),
+    ]
+
+    daily = client.get("/assetLocationEvents/stats", params={"bucket": "day", "from": "2026-05-01T00:00:00"}).json()
+    assert [(r["bucket"], r["assetId"], r["reads"]) for r in daily] == [
+        ("2026-05-01T00:00:00", 1, 12),
+        ("2026-05-01T00:00:00", 2, 3),
+    ]
+
+
+def test_laps_and_reader_groups(client):
+    laps = client.get("/assetLocationEvents/stats", params={"bucket": "day", "readerId": "lap"}).json()
+    assert {r["assetId"]: r["reads"] for r in laps} == {1: 6, 2: 3}
+
+    by_reader = client.get("/assetLocationEvents/stats", params={"groupBy": "reader", "bucket": "hour"}).json()
+    first_hour = {r["readerId"]: (r["reads"], r["assets"]) for r in by_reader if r["bucket"] == "2026-05-01T10:00:00"}
+    assert first_hour == {"lap": (6, 2), "yard": (3, 1)}
+
+    by_minute = client.get("/assetLocationEvents/stats", params={"groupBy": "location", "bucket": "minute"}).json()
+    assert by_minute[0] == {
+        "bucket": "2026-05-01T10:00:00", "assetId": None, "readerId": None, "location": "Lap",
+        "reads": 2, "assets": 2, "firstSeen": "2026-05-01T10:00:00", "lastSeen": "2026-05-01T10:00:00", "dwellSeconds": 0.0,
+    }
+    assert client.get("/assetLocationEvents/stats", params={"bucket": "week"}).status_code == 422
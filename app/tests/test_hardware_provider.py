@@ -0,0 +1,72 @@
+"""
+Tests for the async hardware command engine
+"""
+import asyncio
+import time
+
+import pytest
+
+from hardware.esp32 import HardwareError
+from hardware.provider import COMMAND_SECONDS, COMMANDS, HardwareProvider
+
+
+class RecordingProvider(HardwareProvider):
+    """Provider that records edges instead of printing them"""
+
+    def __init__(self):
+        super().__init__()
+        self.edges = []
+
+    async def _write(self, address, state):
+        self.edges.append((address, state))
+
+
+@pytest.mark.asyncio
+async def test_pulse_drives_on_then_off():
+    hw = RecordingProvider()
+    await hw.pulse("101", 10)
+    assert hw.edges == [("101", "on"), ("101", "off")]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_pulses_do_not_serialize():
+    """Hundreds of pulses should finish in roughly one pulse duration"""
+    hw = RecordingProvider()
+    start = time.perf_counter()
+    await asyncio.gather(*(hw.pulse(str(i), 50) for i in range(300)))
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1.0
+    assert len(hw.edges) == 600
+
+
+@pytest.mark.asyncio
+async def test_cancelled_pulse_still_releases_relay():
+    hw = RecordingProvider()
+    caller = asyncio.create_task(hw.pulse("201", 20))
+    await asyncio.sleep(0.005)
+    caller.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await caller
+
+    await asyncio.sleep(0.05)
+    assert hw.edges == [("201", "on"), ("201", "off")]
+
+
+class FailingProvider(HardwareProvider):
+    async def _write(self, address, state):
+        raise HardwareError("ESP32 did not answer")
+
+
+@pytest.mark.asyncio
+async def test_commands_are_counted_and_timed():
+    COMMANDS.clear()
+    COMMAND_SECONDS.clear()
+    await RecordingProvider().pulse("101", 1)
+    with pytest.raises(HardwareError):
+        await FailingProvider().set_on("102")
+
+    assert COMMANDS.labels(mode="mock", command="on", result="ok").value == 1
+    assert COMMANDS.labels(mode="mock", command="off", result="ok").value == 1
+    assert COMMANDS.labels(mode="mock", command="on", result="error").value == 1
+    assert COMMAND_SECONDS.labels(mode="mock", command="on").count == 2
@@ -0,0 +1,86 @@
+"""
+Tests for the timed-OFF deadline scheduler
+"""
+import asyncio
+import threading
+
+import pytest
+
+from hardware.scheduler import OffScheduler
+
+
+class RecordingProvider:
+    def __init__(self):
+        self.offs = []
+
+    async def set_off(self, address):
+        self.offs.append(address)
+
+
+@pytest.mark.asyncio
+async def test_scheduled_off_fires_after_deadline():
+    hw = RecordingProvider()
+    sched = OffScheduler(hw)
+    sched.schedule(1, "401", 20)
+    assert hw.offs == []
+
+    await asyncio.sleep(0.06)
+    assert hw.offs == ["401"]
+    assert sched.pending() == []
+    await sched.aclose()
+
+
+@pytest.mark.asyncio
+async def test_retrigger_reschedules_instead_of_duplicating():
+    hw = RecordingProvider()
+    sched = OffScheduler(hw)
+    sched.schedule(1, "401", 30)
+    await asyncio.sleep(0.02)
+    sched.schedule(1, "401", 60)  # pushed out
+
+    await asyncio.sleep(0.03)
+    assert hw.offs == []
+    assert len(sched.pending()) == 1
+
+    await asyncio.sleep(0.06)
+    assert hw.offs == ["401"]
+    await sched.aclose()
+
+
+@pytest.mark.asyncio
+async def test_cancel_drops_pending_off():
+    hw = RecordingProvider()
+    sched = OffScheduler(hw)
+    sched.schedule(1, "401", 20)
+    assert sched.cancel(1) is True
+    assert sched.cancel(1) is False
+
+    await asyncio.sleep(0.05)
+    assert hw.offs == []
+    await sched.aclose()
+
+
+@pytest.mark.asyncio
+async def test_burst_uses_no_extra_threads():
+    hw = RecordingProvider()
+    sched = OffScheduler(hw)
+    threads_before = threading.active_count()
+    for i in range(500):
+        sched.schedule(i, str(i), 20 + i % 10)
+    assert threading.active_count() == threads_before
+    assert sched.pending()[0]["id"] == 0
+
+    await asyncio.sleep(0.1)
+    assert sorted(hw.offs, key=int) == [str(i) for i in range(500)]
+    await sched.aclose()
+
+
+@pytest.mark.asyncio
+async def test_aclose_releases_everything_pending():
+    hw = RecordingProvider()
+    sched = OffScheduler(hw)
+    sched.schedule(1, "401", 10_000)
+    sched.schedule(2, "402", 10_000)
+
+    await sched.aclose()
+    assert sorted(hw.offs) == ["401", "402"]
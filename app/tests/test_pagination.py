@@ -0,0 +1,89 @@
+"""
+Tests for keyset (cursor) pagination on the list endpoints
+"""
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import TrainAsset, AssetLocationEvent, Category, Accessory, TrackLine, Section, Switch
+from pagination import decode_cursor, encode_cursor
+
+
+@pytest.fixture
+def listed_rows(sqlite_db):
+    """30 events sharing timestamps in pairs, 7 assets with duplicate road numbers, unnamed switches"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    assets = [TrainAsset(RfidTagId=f"TAG-{i}", Type="Car", RoadNumber=str(i % 3)) for i in range(7)]
+    db.add_all(assets)
+    db.flush()
+    start = datetime(2026, 1, 1)
+    db.add_all([
+        AssetLocationEvent(AssetId=assets[0].Id, RfidTagId="TAG-0", Location="Yard", ReaderId="r1",
+                           Timestamp=start + timedelta(minutes=i // 2))
+        for i in range(30)
+    ])
+    line = TrackLine(Name="Main")
+    cat = Category(Name="Switches")
+    db.add_all([line, cat])
+    db.flush()
+    section = Section(Name="S1", TrackLineId=line.Id)
+    acc = Accessory(Name="Motor", CategoryId=cat.Id, ControlType="toggle", Address="1")
+    db.add_all([section, acc])
+    db.flush()
+    db.add_all([Switch(Name=name, AccessoryId=acc.Id, SectionId=section.Id, Kind="turnout")
+                for name in (None, "B", None, "A")])
+    db.commit()
+    db.close()
+
+
+def _walk(client, url, limit, key):
+    seen, cursor = [], None
+    while True:
+        params = {"limit": limit, **({"cursor": cursor} if cursor else {})}
+        response = client.get(url, params=params)
+        assert response.status_code == 200
+        seen += [key(item) for item in response.json()]
+        cursor = response.headers.get("X-Next-Cursor")
+        if not cursor:
+            return seen
+
+
+def test_event_pages_follow_timestamp_then_event_id(client, statements, listed_rows):
+    everything = client.get("/assetLocationEvents", params={"limit": 1000})
+    assert "X-Next-Cursor" not in everything.headers
+    expected = [(e["timestamp"], e["eventId"]) for e in everything.json()]
+    assert expected == sorted(expected, reverse=True)
+
+    statements.clear()
+    walked = _walk(client, "/assetLocationEvents", 7, lambda e: (e["timestamp"], e["eventId"]))
+    assert walked == expected  # ties on Timestamp neither repeat nor vanish across page boundaries
+    # SQLite always renders "LIMIT ? OFFSET ?"; every page must skip nothing
+    assert all(params[-1] == 0 for sql, params in statements if "OFFSET" in sql)
+
+
+def test_other_lists_page_on_a_unique_key(client, listed_rows):
+    assets = _walk(client, "/trainAssets", 2, lambda a: (a["roadNumber"], a["id"]))
+    assert assets == sorted(assets) and len(assets) == 7
+
+    names = _walk(client, "/switches", 1, lambda s: s["name"])
+    assert names == [None, None, "A", "B"]
+
+
+def test_cursor_round_trip_and_garbage(client, listed_rows):
+    values = [datetime(2026, 1, 1, 12, 30), 42]
+    assert decode_cursor(encode_cursor(values), 2) == values
+    assert client.get("/assetLocationEvents", params={"cursor": "not-a-cursor"}).status_code == 400
+    assert client.get("/switches", params={"cursor": encode_cursor([1])}).status_code == 400
+
+
+def test_switch_pages_seek_on_the_name_index(client, statements, sqlite_db, listed_rows):
+    first = client.get("/switches", params={"limit": 1})
+
+    statements.clear()
+    client.get("/switches", params={"limit": 1, "cursor": first.headers["X-Next-Cursor"]})
+    sql, params = next((sql, params) for sql, params in statements if 'FROM "Switches"' in sql)
+    with sqlite_db.engine.connect() as conn:
+        plan = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql, params).all()
+    assert "ix_Switches_Name_Id" in str(plan)
@@ -0,0 +1,89 @@
+"""
+Query-count regression tests: each endpoint loads exactly the relationships it returns
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy.exc import InvalidRequestError
+
+from models import (Accessory, AssetLocationEvent, Category, Section, SectionConnection, Switch, TrackLine,
+                    TrainAsset)
+
+
+@pytest.fixture
+def queries(sqlite_db, client, statements):
+    """A small layout and one asset with a history of 20 events"""
+    db = sqlite_db.Session()
+    line, cat = TrackLine(Name="Main", IsActive=True), Category(Name="Switches")
+    db.add_all([line, cat])
+    db.flush()
+    a, b = Section(Name="A", TrackLineId=line.Id), Section(Name="B", TrackLineId=line.Id)
+    db.add_all([a, b])
+    db.flush()
+    acc = Accessory(Name="Motor", CategoryId=cat.Id, ControlType="toggle", Address="1", SectionId=a.Id)
+    db.add(acc)
+    db.flush()
+    sw = Switch(Name="SW1", AccessoryId=acc.Id, SectionId=a.Id, Kind="turnout")
+    db.add(sw)
+    db.flush()
+    db.add(SectionConnection(FromSectionId=a.Id, ToSectionId=b.Id, SwitchId=sw.Id, connection_type="switch"))
+    asset = TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="4501")
+    db.add(asset)
+    db.flush()
+    db.add_all([AssetLocationEvent(AssetId=asset.Id, RfidTagId="TAG-1", Location="Yard", ReaderId="r1",
+                                   Timestamp=datetime(2026, 1, 1) + timedelta(minutes=i)) for i in range(20)])
+    db.commit()
+    db.close()
+
+    def count(url):
+        statements.clear()
+        response = client.get(url)
+        assert response.status_code == 200, response.text
+        return len(statements)
+
+    return count
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("/accessories", 1),
+    ("/accessories?includeCategory=true", 1),
+    ("/accessories/1", 1),
+    ("/sections", 1),
+    ("/sections?includeTrackLine=true", 1),
+    ("/sections/1", 2),  # section + track line, then its switches
+    ("/trackLines?includeSections=true", 2),
+    ("/trackLines/1", 2),
+    ("/switches?includeRelations=true", 1),
+    ("/switches/1", 1),
+    ("/sectionConnections?includeRelations=true", 1),
+    ("/sectionConnections/1", 1),
+    ("/trainAssets", 1),
+    ("/trainAssets?includeEvents=true", 2),
+    ("/trainAssets/1", 2),
+    ("/assetLocationEvents?includeAsset=true", 1),
+    ("/assetLocationEvents/1", 1),
+    ("/track-layout", 4),
+])
+def test_endpoint_query_counts(queries, url, expected):
+    assert queries(url) == expected
+
+
+def test_unrequested_relationships_raise(sqlite_db):
+    db = sqlite_db.Session()
+    cat = Category(Name="Lights")
+    db.add(cat)
+    db.flush()
+    db.add(Accessory(Name="Lamp", CategoryId=cat.Id, ControlType="onOff", Address="2"))
+    db.commit()
+    db.close()
+
+    async def load():
+        async with sqlite_db.AsyncSession() as db:
+            acc = await db.get(Accessory, 1)
+            with pytest.raises(InvalidRequestError):
+                acc.Category
+            await db.delete(acc)  # the unit of work still loads what it needs
+            await db.commit()
+
+    asyncio.run(load())
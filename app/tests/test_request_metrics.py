@@ -0,0 +1,34 @@
+"""
+Tests for the per-route HTTP metrics on /metrics
+"""
+from fastapi.testclient import TestClient
+
+from main import app
+from middleware import IN_FLIGHT, LATENCY, REQUESTS
+from models import Category
+
+
+def test_requests_are_counted_by_route_template(sqlite_db):
+    db = sqlite_db.Session()
+    db.add(Category(Name="Lights"))
+    db.commit()
+    db.close()
+    for metric in (REQUESTS, LATENCY, IN_FLIGHT):
+        metric.clear()
+    client = TestClient(app)
+
+    assert client.get("/categories/1").status_code == 200
+    assert client.get("/categories/999").status_code == 404
+    assert client.get("/no-such-route").status_code == 404
+
+    route = {"method": "GET", "route": "/categories/{id}"}
+    assert REQUESTS.labels(**route, status="200").value == 1
+    assert REQUESTS.labels(**route, status="404").value == 1
+    assert REQUESTS.labels(method="GET", route="unmatched", status="404").value == 1
+    assert LATENCY.labels(**route).count == 2
+    assert IN_FLIGHT.labels(method="GET").value == 0
+
+    body = client.get("/metrics").text
+    assert 'http_requests_total{method="GET",route="/categories/{id}",status="404"} 1' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/categories/{id}"} 2' in body
+    assert "# TYPE rfid_queue_depth gauge" in body
@@ -0,0 +1,213 @@
+"""
+Tests for the write-behind RFID ingest queue
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from main import app
+from models import TrainAsset, AssetLocationEvent
+from rfid_ingest import EventWriter, IngestQueueFull, read_debouncer, rfid_writer
+from tag_cache import tag_cache
+
+
+@pytest.fixture
+def session_factory(sqlite_db):
+    """SQLite with one tagged asset; yields (sessionmaker, commit counter)"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    db.add(TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="4501"))
+    db.commit()
+    db.close()
+
+    commits = []
+    event.listen(sqlite_db.engine, "commit", lambda conn: commits.append(1))
+    tag_cache.clear()
+    read_debouncer.clear()
+    yield TestingSessionLocal, commits
+    tag_cache.clear()
+    read_debouncer.clear()
+
+
+def _count(Session):
+    db = Session()
+    try:
+        return db.query(AssetLocationEvent).count()
+    finally:
+        db.close()
+
+
+@pytest.mark.asyncio
+async def test_reads_are_group_committed_by_size(session_factory):
+    Session, commits = session_factory
+    writer = EventWriter(Session, flush_rows=100, flush_ms=10_000)
+
+    for i in range(250):
+        writer.submit("TAG-1", "Yard", f"R{i}")
+    await asyncio.sleep(0.2)
+
+    # two full batches went out without waiting for the timer
+    assert _count(Session) == 200
+    assert len(commits) == 2
+
+    await writer.aclose()
+    assert _count(Session) == 250
+    assert writer.written == 250
+
+
+@pytest.mark.asyncio
+async def test_partial_batch_is_flushed_by_time(session_factory):
+    Session, commits = session_factory
+    writer = EventWriter(Session, flush_rows=500, flush_ms=20)
+
+    writer.submit("TAG-1", "Yard", "R1")
+    writer.submit("UNKNOWN", "Yard", "R1")
+    assert _count(Session) == 0
+    await asyncio.sleep(0.2)
+
+    assert _count(Session) == 1
+    assert len(commits) == 1
+    assert (writer.written, writer.dropped, writer.depth) == (1, 1, 0)
+    await writer.aclose()
+
+
+@pytest.mark.asyncio
+async def test_full_queue_pushes_back(session_factory):
+    Session, _ = session_factory
+    writer = EventWriter(Session, queue_size=3, flush_rows=500, flush_ms=10_000)
+
+    for _ in range(3):
+        writer.submit("TAG-1", "Yard", "R1")
+    with pytest.raises(IngestQueueFull):
+        writer.submit("TAG-1", "Yard", "R1")
+
+    await writer.aclose()  # drains what was accepted
+    assert _count(Session) == 3
+
+
+def test_reads_endpoint_acknowledges_before_writing(session_factory, monkeypatch):
+    Session, _ = session_factory
+    monkeypatch.setattr(rfid_writer, "session_factory", Session)
+    monkeypatch.setattr(rfid_writer, "flush_ms", 10_000)
+    client = TestClient(app)
+
+    response = client.post("/assetLocationEvents/reads", json={"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1"})
+    assert response.status_code == 202
+    assert _count(Session) == 0
+
+    monkeypatch.setattr(rfid_writer, "queue_size", 1)
+    full = client.post("/assetLocationEvents/reads", json={"rfidTagId": "TAG-1", "location": "Yard", "readerId": "R1"})
+    assert full.status_code == 503
+    assert full.headers["Retry-After"] == "1"
+
+    unknown = client.post("/assetLocationEvents/reads", json={"rfidTagId": "NOPE", "location": "Yard", "readerId": "R1"})
+    assert unknown.status_code == 400
+
+    asyncio.run(rfid_writer.aclose())  # what shutdown does
+    assert _count(Session) == 1
+
+
+def test_debouncer_sliding_window_and_lru_bound():
+    from datetime import datetime, timedelta
+    from rfid_ingest import ReadDebouncer
+
+    t0 = datetime(2025, 1, 1, 12, 0, 0)
+    debouncer = ReadDebouncer(window_ms=1000, max_keys=2, reader_windows={"fast": 0})
+
+    assert debouncer.admit("T1", "R1", t0)
+    for i in range(1, 10):  # a read every 500ms keeps the window open
+        assert not debouncer.admit("T1", "R1", t0 + timedelta(milliseconds=500 * i))
+    assert debouncer.dwells("T1")[0][2].reads == 10
+
+    assert debouncer.admit("T1", "R2", t0)  # other reader, own window
+    assert debouncer.admit("T1", "fast", t0) and debouncer.admit("T1", "fast", t0)  # dedup off
+
+    assert debouncer.admit("T2", "R1", t0)  # evicts the least recent pair (T1, R1)
+    assert debouncer.admit("T1", "R1", t0 + timedelta(seconds=5))
+    assert debouncer.suppressed == 9
+
+
+@pytest.mark.asyncio
+async def test_ingest_metrics(session_factory):
+    from datetime import datetime
+    from rfid_ingest import EVENTS_WRITTEN, FLUSH_ROWS_WRITTEN, READS, UNKNOWN_TAG_READS, ReadDebouncer
+
+    for metric in (READS, EVENTS_WRITTEN, UNKNOWN_TAG_READS, FLUSH_ROWS_WRITTEN):
+        metric.clear()
+    Session, _ = session_factory
+    debouncer = ReadDebouncer(window_ms=1000)
+    t0 = datetime(2025, 1, 1, 12, 0, 0)
+    assert debouncer.admit("T1", "R1", t0) and not debouncer.admit("T1", "R1", t0)
+
+    writer = EventWriter(Session, queue_size=2, flush_rows=500, flush_ms=10_000)
+    writer.submit("TAG-1", "Yard", "R1")
+    writer.submit("UNKNOWN", "Yard", "R1")
+    with pytest.raises(IngestQueueFull):
+        writer.submit("TAG-1", "Yard", "R1")
+    await writer.aclose()
+
+    assert READS.labels(outcome="admitted").value == 1
+    assert READS.labels(outcome="duplicate").value == 1
+    assert READS.labels(outcome="rejected").value == 1
+    assert EVENTS_WRITTEN.labels().value == 1
+    assert UNKNOWN_TAG_READS.labels().value == 1
+    assert FLUSH_ROWS_WRITTEN.labels().count == 1
+
+
+@pytest.mark.asyncio
+async def test_failed_flush_is_retried(session_factory, monkeypatch):
+    Session, _ = session_factory
+    writer = EventWriter(Session, flush_rows=500, flush_ms=10, backoff_ms=10)
+    real_insert = writer._insert
+    calls = []
+
+    def flaky_insert(batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise RuntimeError("connection lost")
+        return real_insert(batch)
+
+    monkeypatch.setattr(writer, "_insert", flaky_insert)
+    writer.submit("TAG-1", "Yard", "R1")
+    writer.submit("TAG-1", "Yard", "R2")
+    await asyncio.sleep(0.2)
+
+    assert calls == [2, 2]
+    assert _count(Session) == 2
+    assert (writer.written, writer.dropped) == (2, 0)
+    await writer.aclose()
+
+
+@pytest.mark.asyncio
+async def test_batch_is_dropped_after_retries(session_factory, monkeypatch):
+    Session, _ = session_factory
+    writer = EventWriter(Session, flush_rows=500, flush_ms=10, retries=2, backoff_ms=1)
+
+    def broken_insert(batch):
+        raise RuntimeError("database gone")
+
+    monkeypatch.setattr(writer, "_insert", broken_insert)
+    writer.submit("TAG-1", "Yard", "R1")
+    await writer.aclose()
+
+    assert (writer.written, writer.dropped, writer.depth) == (0, 1, 0)
+
+
+@pytest.mark.asyncio
+async def test_telemetry_failure_does_not_rewrite_committed_batch(session_factory, monkeypatch):
+    from telemetry import train_telemetry
+
+    def broken(events):
+        raise RuntimeError("telemetry bug")
+
+    monkeypatch.setattr(train_telemetry, "observe_many", broken)
+    Session, _ = session_factory
+    writer = EventWriter(Session, flush_rows=500, flush_ms=10, backoff_ms=1)
+    writer.submit("TAG-1", "Yard", "R1")
+    await writer.aclose()
+
+    assert _count(Session) == 1
+    assert (writer.written, writer.dropped) == (1, 0)
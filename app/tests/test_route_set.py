@@ -0,0 +1,133 @@
+"""
+Tests for POST /actions/routes/set
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from hardware.esp32 import HardwareError
+from main import app
+from models import Category, Accessory, TrackLine, Section, Switch, SectionConnection
+from routers import actions
+from track_graph import track_graph
+
+
+@pytest.fixture
+def client(sqlite_db):
+    """Sections S0..S4 in a line, each hop through its own divergent switch"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    line = TrackLine(Name="Main", IsActive=True)
+    cat = Category(Name="Switches")
+    db.add_all([line, cat])
+    db.flush()
+    sections = [Section(Name=f"S{i}", TrackLineId=line.Id, IsActive=True) for i in range(5)]
+    db.add_all(sections)
+    db.flush()
+    for i in range(4):
+        acc = Accessory(Name=f"Motor {i}", CategoryId=cat.Id, ControlType="toggle", Address=f"30{i}")
+        db.add(acc)
+        db.flush()
+        sw = Switch(Name=f"SW{i}", AccessoryId=acc.Id, SectionId=sections[i].Id, Kind="turnout",
+                    position="divergent" if i == 0 else "straight")
+        db.add(sw)
+        db.flush()
+        db.add(SectionConnection(FromSectionId=sections[i].Id, ToSectionId=sections[i + 1].Id,
+                                 SwitchId=sw.Id, connection_type="switch", IsBidirectional=False))
+    db.commit()
+    db.close()
+
+    track_graph.loaded = False
+    try:
+        yield TestClient(app), TestingSessionLocal
+    finally:
+        track_graph.load_rows([], [], [])
+        track_graph.loaded = False
+
+
+def test_route_switches_are_thrown_concurrently(client):
+    test_client, Session = client
+
+    response = test_client.post("/actions/routes/set", json={"fromSectionId": 1, "toSectionId": 5, "milliseconds": 50})
+    assert response.status_code == 200
+    body = response.json()
+    assert body["sections"] == [1, 2, 3, 4, 5]
+    assert [(s["id"], s["thrown"]) for s in body["switches"]] == [(1, False), (2, True), (3, True), (4, True)]
+
+    db = Session()
+    assert {sw.position for sw in db.query(Switch)} == {"divergent"}
+    db.close()
+    assert track_graph.switches[4].position == "divergent"
+
+    again = test_client.post("/actions/routes/set", json={"fromSectionId": 1, "toSectionId": 5})
+    assert not any(s["thrown"] for s in again.json()["switches"])
+
+    started = time.monotonic()
+    back = test_client.post("/actions/routes/set", json={"switches": [{"id": i, "position": "straight"} for i in (1, 2, 3, 4)],
+                                                          "milliseconds": 200})
+    elapsed = time.monotonic() - started
+    assert all(s["thrown"] for s in back.json()["switches"])
+    assert elapsed < 0.5  # four 200ms pulses in parallel, not 800ms in a row
+
+
+def test_explicit_switch_list(client):
+    test_client, Session = client
+
+    response = test_client.post("/actions/routes/set", json={"switches": [{"id": 1, "position": "straight"}]})
+    assert response.status_code == 200
+    assert response.json()["sections"] is None
+    db = Session()
+    assert db.get(Switch, 1).position == "straight"
+    db.close()
+
+
+def test_invalid_requests(client):
+    test_client, _ = client
+
+    assert test_client.post("/actions/routes/set", json={"fromSectionId": 1}).status_code == 422
+    assert test_client.post("/actions/routes/set", json={"switches": [{"id": 99, "position": "straight"}]}).status_code == 404
+    assert test_client.post("/actions/routes/set", json={"fromSectionId": 5, "toSectionId": 1}).status_code == 404
+    conflicting = {"switches": [{"id": 2, "position": "straight"}, {"id": 2, "position": "divergent"}]}
+    assert test_client.post("/actions/routes/set", json=conflicting).status_code == 400
+
+
+def test_partial_failure_reports_what_moved(client, monkeypatch):
+    async def pulse(address, ms):
+        if address == "302":
+            raise HardwareError("ESP32 did not answer")
+        await asyncio.sleep(ms / 1000)
+
+    monkeypatch.setattr(actions.hw, "pulse", pulse)
+    test_client, Session = client
+
+    response = test_client.post("/actions/routes/set", json={"fromSectionId": 1, "toSectionId": 5, "milliseconds": 10})
+    assert response.status_code == 502
+    body = response.json()
+    assert "[3]" in body["detail"]
+    assert [(s["id"], s["thrown"]) for s in body["switches"]] == [(1, False), (2, True), (3, False), (4, True)]
+
+    db = Session()
+    assert [sw.position for sw in db.query(Switch).order_by(Switch.Id)] == ["divergent", "divergent", "straight", "divergent"]
+    db.close()
+
+
+def test_toggle_motors_are_only_pulsed_from_a_known_position(client):
+    test_client, Session = client
+
+    forced = test_client.post("/actions/routes/set", json={"fromSectionId": 1, "toSectionId": 5, "force": True})
+    assert forced.status_code == 400
+
+    db = Session()
+    db.get(Switch, 3).position = "unknown"
+    db.commit()
+    db.close()
+    response = test_client.post("/actions/routes/set", json={"fromSectionId": 1, "toSectionId": 5})
+    assert response.status_code == 409
+    assert "[3]" in response.json()["detail"]
+
+    db = Session()
+    assert [sw.position for sw in db.query(Switch).order_by(Switch.Id)] == ["divergent", "straight", "unknown", "straight"]
+    db.close()
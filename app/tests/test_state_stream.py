@@ -0,0 +1,73 @@
+"""
+Tests for the live state pub/sub and the /ws/state stream
+"""
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models import Category, Accessory
+from state_stream import StateBus, state_bus
+
+
+@pytest.fixture
+def client(sqlite_db):
+    """Test client with the actions router backed by SQLite"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    cat = Category(Name="Lights", SortOrder=1)
+    db.add(cat)
+    db.flush()
+    db.add(Accessory(Name="Yard Light", CategoryId=cat.Id, ControlType="onOff", Address="201", IsActive=True))
+    db.commit()
+    db.close()
+
+    yield TestClient(app)
+
+
+def test_websocket_receives_accessory_delta(client):
+    with client.websocket_connect("/ws/state") as ws:
+        hello = ws.receive_json()
+        assert hello["type"] == "hello"
+
+        response = client.post("/actions/accessories/1/on")
+        assert response.status_code == 200
+
+        delta = ws.receive_json()
+        assert delta["type"] == "accessory"
+        assert delta["id"] == 1
+        assert delta["state"] == "on"
+        assert delta["seq"] > hello["seq"]
+
+
+def test_websocket_receives_published_switch_delta(client):
+    with client.websocket_connect("/ws/state") as ws:
+        ws.receive_json()
+        state_bus.switch_changed(7, "divergent")  # from a non-loop thread, like a sync router
+        delta = ws.receive_json()
+        assert (delta["type"], delta["id"], delta["position"]) == ("switch", 7, "divergent")
+
+
+@pytest.mark.asyncio
+async def test_fanout_to_many_subscribers():
+    bus = StateBus()
+    subs = [bus.subscribe() for _ in range(300)]
+    bus.accessory_changed(3, "off")
+
+    messages = await asyncio.gather(*(s.get() for s in subs))
+    assert len(set(messages)) == 1  # encoded once, shared by everyone
+    assert '"state":"off"' in messages[0]
+
+
+@pytest.mark.asyncio
+async def test_slow_subscriber_drops_oldest():
+    bus = StateBus(queue_size=2)
+    sub = bus.subscribe()
+    for i in range(5):
+        bus.switch_changed(i, "straight")
+
+    assert sub.dropped == 3
+    remaining = [await sub.get(), await sub.get()]
+    assert '"id":3' in remaining[0] and '"id":4' in remaining[1]
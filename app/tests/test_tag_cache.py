@@ -0,0 +1,84 @@
+"""
+Tests for the RFID tag -> asset cache and its invalidation
+"""
+import pytest
+
+from models import TrainAsset
+from tag_cache import MISSING, TagCache, tag_cache
+
+
+@pytest.fixture
+def tagged_asset(sqlite_db):
+    """One tagged engine in SQLite, with the tag cache loaded from it"""
+    db = sqlite_db.Session()
+    db.add(TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="4501"))
+    db.commit()
+    db.close()
+
+    tag_cache.clear()
+    tag_cache.ensure_loaded(sqlite_db.Session)
+    try:
+        yield
+    finally:
+        tag_cache.clear()
+
+
+def _read(tag):
+    return {"rfidTagId": tag, "location": "Yard", "readerId": "R1"}
+
+
+def _asset_selects(statements):
+    return [sql for sql, _ in statements
+            if "FROM \"TrainAssets\"" in sql and sql.lstrip().upper().startswith("SELECT")]
+
+
+def test_known_tag_resolves_without_asset_lookup(client, statements, tagged_asset):
+    for _ in range(5):
+        response = client.post("/assetLocationEvents/byTag", json=_read("TAG-1"))
+        assert response.status_code == 200
+        assert response.json()["assetId"] == 1
+    assert _asset_selects(statements) == []
+
+
+def test_unknown_tag_flood_hits_the_database_once(client, statements, tagged_asset):
+    for _ in range(20):
+        assert client.post("/assetLocationEvents/byTag", json=_read("BAD")).status_code == 400
+    assert len(_asset_selects(statements)) == 1
+
+
+def test_train_assets_router_keeps_cache_current(client, tagged_asset):
+    assert client.post("/assetLocationEvents/byTag", json=_read("NEW")).status_code == 400
+
+    created = client.post("/trainAssets", json={"rfidTagId": "NEW", "type": "Car", "roadNumber": "12"})
+    assert created.status_code == 200
+    new_id = created.json()["id"]
+    assert tag_cache.get("NEW") == new_id  # overrides the negative entry
+
+    updated = client.put(f"/trainAssets/{new_id}", json={"rfidTagId": "NEWER", "type": "Car", "roadNumber": "12"})
+    assert updated.status_code == 200
+    assert tag_cache.get("NEW") is MISSING
+    assert tag_cache.get("NEWER") == new_id
+
+    assert client.delete(f"/trainAssets/{new_id}").status_code == 200
+    assert tag_cache.get("NEWER") is MISSING
+
+
+def test_negative_cache_is_bounded_and_expires():
+    cache = TagCache(negative_ttl_s=0, negative_max=2)
+    cache._negative.update({"a": 0.0, "b": 0.0})
+    assert cache.get("a") is MISSING  # expired
+
+    cache = TagCache(negative_ttl_s=60, negative_max=2)
+
+    class NoAssets:
+        def query(self, *args):
+            return self
+
+        def filter(self, *args):
+            return self
+
+        def all(self):
+            return []
+
+    cache.resolve_many(NoAssets(), ["a", "b", "c"])
+    assert len(cache._negative) == 2
@@ -0,0 +1,100 @@
+"""
+Tests for transit/lap telemetry derived from RFID events
+"""
+from datetime import datetime, timedelta
+from types import SimpleNamespace as Row
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from models import TrainAsset
+from rfid_ingest import read_debouncer
+from tag_cache import tag_cache
+from telemetry import TelemetryProcessor, train_telemetry
+from track_graph import track_graph
+
+T0 = datetime(2026, 6, 1, 12, 0)
+
+
+@pytest.fixture
+def loop_layout():
+    """A ring North -> East -> South -> West -> North, each section 10 long"""
+    names = ["North", "East", "South", "West"]
+    sections = [Row(Id=i + 1, Name=n, Length=10.0, PositionX=None, PositionY=None, PositionZ=None, IsActive=True)
+                for i, n in enumerate(names)]
+    connections = [Row(Id=i + 1, FromSectionId=i + 1, ToSectionId=(i + 1) % 4 + 1, SwitchId=None, RouteInfo=None,
+                       IsBidirectional=False, connection_type="direct", IsActive=True) for i in range(4)]
+    track_graph.load_rows(sections, connections, [])
+    train_telemetry.clear()
+    try:
+        yield
+    finally:
+        track_graph.load_rows([], [], [])
+        track_graph.loaded = False
+        train_telemetry.clear()
+
+
+def _read(asset_id, reader, location, seconds, event_id=0):
+    return {"EventId": event_id, "AssetId": asset_id, "ReaderId": reader, "Location": location,
+            "Timestamp": T0 + timedelta(seconds=seconds)}
+
+
+def test_transits_laps_and_speed(loop_layout):
+    telemetry = TelemetryProcessor(window=3, reader_sections={"gate": 3})
+    telemetry.observe_many([
+        _read(1, "r-north", "North", 0),
+        _read(1, "r-north", "North", 4),  # still parked: no transit, departure moves to 4s
+        _read(1, "r-east", "East", 14),
+        _read(1, "gate", "Platform 2", 24),  # placed on South by config
+        _read(1, "r-west", "West", 34),
+        _read(1, "r-north", "North", 44),
+    ])
+    t = telemetry.get(1)
+    assert t.transitCount == 4 and t.lapCount == 1
+    assert [tr.toSectionId for tr in t.transits] == [3, 4, 1]  # window of 3
+    first = t.transits[0]
+    assert (first.seconds, first.distance, first.speed) == (10.0, 10.0, 1.0)
+
+    lap = t.laps[0]
+    assert (lap.readerId, lap.started, lap.seconds, lap.transits, lap.distance) == ("r-north", T0, 44.0, 4, 40.0)
+    assert t.odometer == 40.0
+
+    telemetry.observe(1, "r-east", "East", T0)  # late: ignored
+    assert telemetry.get(1).readerId == "r-north"
+
+
+def test_unplaced_readers_still_time_transits(loop_layout):
+    telemetry = TelemetryProcessor(reader_sections={})
+    telemetry.observe_many([_read(7, "a", "Yard", 0), _read(7, "b", "Shed", 30), _read(7, "a", "Yard", 90)])
+    t = telemetry.get(7)
+    assert [tr.seconds for tr in t.transits] == [30.0, 60.0]
+    assert all(tr.distance is None and tr.speed is None for tr in t.transits)
+    assert t.laps[0].seconds == 90.0 and t.laps[0].distance is None
+
+
+def test_ingested_events_reach_the_telemetry_endpoint(loop_layout, sqlite_db, monkeypatch):
+    db = sqlite_db.Session()
+    db.add_all([TrainAsset(RfidTagId="TAG-1", Type="Engine", RoadNumber="1"),
+                TrainAsset(RfidTagId="TAG-2", Type="Engine", RoadNumber="2")])
+    db.commit()
+    db.close()
+
+    monkeypatch.setattr(read_debouncer, "window_ms", 0)
+    tag_cache.clear()
+    try:
+        client = TestClient(app)
+        events = [{"rfidTagId": "TAG-1", "location": name, "readerId": f"r-{name.lower()}",
+                   "timestamp": (T0 + timedelta(seconds=5 * i)).isoformat()}
+                  for i, name in enumerate(["North", "East", "South"])]
+        assert client.post("/assetLocationEvents/bulk", json={"events": events}).status_code == 200
+
+        body = client.get("/trains/1/telemetry").json()
+        assert (body["location"], body["transitCount"], body["odometer"], body["averageSpeed"]) == ("South", 2, 20.0, 2.0)
+        assert body["transits"][0]["fromSectionId"] == 1
+
+        assert client.get("/trains/2/telemetry").json()["transitCount"] == 0
+        assert client.get("/trains/99/telemetry").status_code == 404
+    finally:
+        tag_cache.clear()
+        read_debouncer.clear()
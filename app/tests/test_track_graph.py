@@ -0,0 +1,190 @@
+"""
+Tests for the in-memory track graph and its incremental maintenance
+"""
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+from main import app
+from models import Category, Accessory, TrackLine, Section, Switch, SectionConnection
+from track_graph import TrackGraph, track_graph
+
+
+@pytest.fixture
+def layout(sqlite_db):
+    """SQLite layout: A - B, then a switch at B to C (straight) or D (divergent)"""
+    TestingSessionLocal = sqlite_db.Session
+
+    db = TestingSessionLocal()
+    line = TrackLine(Name="Main", IsActive=True)
+    cat = Category(Name="Switches")
+    db.add_all([line, cat])
+    db.flush()
+    a, b, c, d = (Section(Name=n, TrackLineId=line.Id, Length=10.0, IsActive=True) for n in "ABCD")
+    db.add_all([a, b, c, d])
+    db.flush()
+    acc = Accessory(Name="SW1", CategoryId=cat.Id, ControlType="toggle", Address="node1/1")
+    db.add(acc)
+    db.flush()
+    sw = Switch(Name="SW1", AccessoryId=acc.Id, SectionId=b.Id, Kind="turnout", position="straight")
+    db.add(sw)
+    db.flush()
+    db.add_all([
+        SectionConnection(FromSectionId=a.Id, ToSectionId=b.Id),
+        SectionConnection(FromSectionId=b.Id, ToSectionId=c.Id, SwitchId=sw.Id, RouteInfo="straight",
+                          connection_type="switch", IsBidirectional=False),
+        SectionConnection(FromSectionId=b.Id, ToSectionId=d.Id, SwitchId=sw.Id, RouteInfo="divergent",
+                          connection_type="switch"),
+    ])
+    db.commit()
+    ids = {s.Name: s.Id for s in (a, b, c, d)}
+    ids["switch"] = sw.Id
+    db.close()
+    return sqlite_db.engine, TestingSessionLocal, ids
+
+
+def test_load_builds_csr_adjacency(layout):
+    _, Session, ids = layout
+    graph = TrackGraph()
+    db = Session()
+    graph.load(db)
+    db.close()
+
+    assert {n.section_id for n in graph.neighbors(ids["B"])} == {ids["A"], ids["C"], ids["D"]}
+    # B -> C is one-way
+    assert ids["B"] not in {n.section_id for n in graph.neighbors(ids["C"])}
+    to_d = next(n for n in graph.neighbors(ids["B"]) if n.section_id == ids["D"])
+    assert to_d.switch_id == ids["switch"]
+    assert to_d.weight == 10.0
+
+    csr = graph.csr
+    assert len(csr.offsets) == len(csr.node_ids) + 1
+    assert csr.offsets[-1] == len(csr.targets) == 5
+
+
+def test_queries_do_not_touch_the_database(layout):
+    engine, Session, ids = layout
+    graph = TrackGraph()
+    db = Session()
+    graph.load(db)
+    db.close()
+
+    statements = []
+    event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    assert graph.reachable(ids["C"]) == {ids["C"]}
+    assert graph.reachable(ids["A"]) == {ids["A"], ids["B"], ids["C"], ids["D"]}
+    graph.neighbors(ids["A"])
+    assert statements == []
+
+
+def test_inactive_sections_and_connections_are_not_edges(layout):
+    _, Session, ids = layout
+    graph = TrackGraph()
+    db = Session()
+    graph.load(db)
+    d = db.get(Section, ids["D"])
+    d.IsActive = False
+    db.commit()
+    graph.upsert_section(d)
+    assert ids["D"] not in graph.reachable(ids["A"])
+
+    conn = db.query(SectionConnection).filter_by(FromSectionId=ids["A"]).one()
+    conn.IsActive = False
+    db.commit()
+    graph.upsert_connection(conn)
+    assert graph.reachable(ids["A"]) == {ids["A"]}
+    db.close()
+
+
+def test_router_writes_update_the_graph(layout):
+    _, Session, ids = layout
+
+    db = Session()
+    track_graph.load(db)
+    db.close()
+    try:
+        client = TestClient(app)
+        assert ids["A"] not in track_graph.reachable(ids["C"])
+
+        created = client.post("/sectionConnections", json={"fromSectionId": ids["C"], "toSectionId": ids["A"]})
+        assert created.status_code == 200
+        assert ids["A"] in track_graph.reachable(ids["C"])
+
+        assert client.delete(f"/sectionConnections/{created.json()['id']}").status_code == 200
+        assert ids["A"] not in track_graph.reachable(ids["C"])
+    finally:
+        track_graph.load_rows([], [], [])
+        track_graph.loaded = False
+
+
+def _grid(n):
+    """n x n grid of unit sections, each linked to its right and lower neighbour"""
+    from types import SimpleNamespace as Row
+
+    sections, connections = [], []
+    for y in range(n):
+        for x in range(n):
+            id = y * n + x + 1
+            sections.append(Row(Id=id, Name=f"S{id}", Length=1.0 + (x * y) % 3,
+                                PositionX=float(x), PositionY=float(y), PositionZ=None, IsActive=True))
+            for dx, dy in ((1, 0), (0, 1)):
+                if x + dx < n and y + dy < n:
+                    connections.append(Row(Id=len(connections) + 1, FromSectionId=id,
+                                           ToSectionId=(y + dy) * n + x + dx + 1, SwitchId=None, RouteInfo=None,
+                                           IsBidirectional=True, connection_type="direct", IsActive=True))
+    return sections, connections
+
+
+def test_shortest_path_reports_switch_positions(layout):
+    _, Session, ids = layout
+    graph = TrackGraph()
+    db = Session()
+    graph.load(db)
+    db.close()
+
+    route = graph.shortest_path(ids["A"], ids["D"])
+    assert route.sections == (ids["A"], ids["B"], ids["D"])
+    assert route.switches == ((ids["switch"], "divergent"),)
+    assert route.length == 20.0
+
+    assert graph.shortest_path(ids["A"], ids["C"]).switches == ((ids["switch"], "straight"),)
+    assert graph.shortest_path(ids["C"], ids["A"]) is None  # B -> C is one-way
+    assert graph.shortest_path(ids["A"], ids["A"]).sections == (ids["A"],)
+
+
+def test_a_star_matches_dijkstra_on_a_grid():
+    sections, connections = _grid(12)
+    with_positions = TrackGraph()
+    with_positions.load_rows(sections, connections, [])
+    assert with_positions.csr.heuristic_scale > 0
+
+    for s in sections:
+        s.PositionX = None
+    dijkstra = TrackGraph()
+    dijkstra.load_rows(sections, connections, [])
+    assert dijkstra.csr.coords is None
+
+    for a, b in ((1, 144), (7, 100), (144, 13), (30, 31)):
+        assert with_positions.shortest_path(a, b).length == dijkstra.shortest_path(a, b).length
+
+
+def test_routes_endpoint(layout):
+    _, Session, ids = layout
+    db = Session()
+    track_graph.load(db)
+    db.close()
+    try:
+        client = TestClient(app)
+        response = client.get("/routes", params={"from": ids["A"], "to": ids["D"]})
+        assert response.status_code == 200
+        body = response.json()
+        assert body["sections"] == [ids["A"], ids["B"], ids["D"]]
+        assert body["switches"] == [{
+            "id": ids["switch"], "accessoryId": 1, "position": "divergent", "currentPosition": "straight",
+        }]
+
+        assert client.get("/routes", params={"from": ids["C"], "to": ids["A"]}).status_code == 404
+        assert client.get("/routes", params={"from": 999, "to": ids["A"]}).status_code == 404
+    finally:
+        track_graph.load_rows([], [], [])
+        track_graph.loaded = False
@@ -0,0 +1,70 @@
+"""
+Tests for the cached /track-layout snapshot and its ETag handling
+"""
+import pytest
+
+from models import Section, TrackLine
+from layout_cache import bump_layout_version
+
+
+@pytest.fixture
+def layout(sqlite_db):
+    """One active track line with a single section"""
+    db = sqlite_db.Session()
+    line = TrackLine(Name="Main", IsActive=True)
+    db.add(line)
+    db.flush()
+    db.add(Section(Name="East", TrackLineId=line.Id, IsActive=True))
+    db.commit()
+    db.close()
+
+
+def test_layout_is_served_from_cache_until_version_bump(client, statements, layout):
+    first = client.get("/track-layout")
+    assert first.status_code == 200
+    assert [s["name"] for s in first.json()["sections"]] == ["East"]
+    queries_after_first = len(statements)
+    assert queries_after_first > 0
+
+    second = client.get("/track-layout")
+    assert second.content == first.content
+    assert len(statements) == queries_after_first  # no DB round-trips
+
+    bump_layout_version()
+    client.get("/track-layout")
+    assert len(statements) > queries_after_first
+
+
+def test_etag_round_trip_returns_304(client, layout):
+    first = client.get("/track-layout")
+    etag = first.headers["ETag"]
+    assert etag.startswith('"')
+
+    not_modified = client.get("/track-layout", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    other = client.get("/track-layout", headers={"If-None-Match": '"stale"'})
+    assert other.status_code == 200
+
+
+def test_write_changes_etag(client, sqlite_db, layout):
+    etag = client.get("/track-layout").headers["ETag"]
+
+    db = sqlite_db.Session()
+    db.add(Section(Name="West", TrackLineId=1, IsActive=True))
+    db.commit()
+    db.close()
+    bump_layout_version()
+
+    response = client.get("/track-layout", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != etag
+    assert len(response.json()["sections"]) == 2
+
+
+def test_inactive_variant_cached_separately(client, layout):
+    active = client.get("/track-layout")
+    everything = client.get("/track-layout", params={"includeInactive": True})
+    assert active.status_code == everything.status_code == 200
+    assert active.json()["sections"] == everything.json()["sections"]
@@ -0,0 +1,394 @@
+"""
+In-memory track graph built from Sections, SectionConnections and Switches.
+
+The graph is loaded once (``track_graph.load(db)``) and then kept current by
+the sections, switches and section_connections routers, which hand it each
+row they commit. Queries never touch the database.
+
+Reads go through a CSR (compressed sparse row) snapshot: for node index i,
+its outgoing edges are ``targets[offsets[i]:offsets[i + 1]]`` with parallel
+``weights``, ``edge_connection`` and ``edge_switch`` arrays. Writers mutate the
+row dictionaries and drop the snapshot; the next reader rebuilds it in O(V+E).
+Snapshots are immutable, so readers never need the lock.
+
+Only active sections and active connections become edges. A bidirectional
+connection contributes an edge each way. The weight of an edge is the length
+of the section it enters (DEFAULT_LENGTH when unset).
+
+``shortest_path`` runs A* over the snapshot. Its heuristic is the straight-line
+distance between section positions scaled by the smallest weight/distance
+ratio seen on any edge, which never overestimates, so the result is the true
+shortest path. Without positions on every section it falls back to Dijkstra.
+A connection that carries a SwitchId requires that switch in the position
+named by its RouteInfo ("straight"/"divergent"); with no RouteInfo it is the
+diverging leg, matching how dev_seed lays out the bypass and siding.
+
+The graph lives in this process; a write handled by another uvicorn worker
+reaches it on that worker's next ``load``.
+"""
+
+import heapq
+import math
+import threading
+from array import array
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+DEFAULT_LENGTH = 1.0
+NO_SWITCH = -1
+SWITCH_POSITIONS = ("straight", "divergent")
+
+
+@dataclass(frozen=True)
+class SectionNode:
+    id: int
+    name: str
+    length: Optional[float]
+    x: Optional[float]
+    y: Optional[float]
+    z: Optional[float]
+    active: bool
+
+
+@dataclass(frozen=True)
+class ConnectionEdge:
+    id: int
+    from_id: int
+    to_id: int
+    switch_id: Optional[int]
+    bidirectional: bool
+    connection_type: str
+    route_info: Optional[str]
+    active: bool
+
+    @property
+    def required_position(self) -> Optional[str]:
+        if self.switch_id is None:
+            return None
+        info = (self.route_info or "").strip().lower()
+        return info if info in SWITCH_POSITIONS else "divergent"
+
+
+@dataclass(frozen=True)
+class SwitchState:
+    id: int
+    accessory_id: int
+    section_id: int
+    position: str
+    active: bool
+
+
+@dataclass(frozen=True)
+class Neighbor:
+    section_id: int
+    connection_id: int
+    switch_id: Optional[int]
+    weight: float
+
+
+@dataclass(frozen=True)
+class Route:
+    sections: Tuple[int, ...]
+    connections: Tuple[int, ...]
+    switches: Tuple[Tuple[int, str], ...]  # (switch id, required position) in path order
+    length: float
+
+
+@dataclass(frozen=True)
+class CsrGraph:
+    node_ids: array      # index -> section id
+    index: Dict[int, int]  # section id -> index
+    offsets: array       # len(nodes) + 1
+    targets: array       # node indices
+    weights: array
+    edge_connection: array
+    edge_switch: array   # NO_SWITCH when the edge crosses no switch
+    edge_position: Tuple[Optional[str], ...]
+    coords: Optional[Tuple[Tuple[float, float, float], ...]]  # None unless every node has a position
+    heuristic_scale: float
+
+    def edges(self, i: int) -> range:
+        return range(self.offsets[i], self.offsets[i + 1])
+
+
+class TrackGraph:
+    def __init__(self):
+        self.sections: Dict[int, SectionNode] = {}
+        self.connections: Dict[int, ConnectionEdge] = {}
+        self.switches: Dict[int, SwitchState] = {}
+        self.loaded = False
+        self._csr: Optional[CsrGraph] = None
+        self._lock = threading.Lock()
+
+    # ---- loading ---------------------------------------------------------------
+    def load(self, db):
+        """Replace the whole graph from the database (3 queries)."""
+        from models import Section, SectionConnection, Switch
+
+        sections = db.query(Section).all()
+        connections = db.query(SectionConnection).all()
+        switches = db.query(Switch).all()
+        self.load_rows(sections, connections, switches)
+
+    def load_rows(self, sections: Iterable, connections: Iterable, switches: Iterable):
+        with self._lock:
+            self.sections = {s.Id: _section_node(s) for s in sections}
+            self.connections = {c.Id: _connection_edge(c) for c in connections}
+            self.switches = {w.Id: _switch_state(w) for w in switches}
+            self._csr = None
+            self.loaded = True
+
+    def ensure_loaded(self, session_factory):
+        if self.loaded:
+            return
+        db = session_factory()
+        try:
+            self.load(db)
+        finally:
+            db.close()
+
+    # ---- incremental updates (pass committed ORM rows) ---------------------------
+    def upsert_section(self, row):
+        with self._lock:
+            self.sections[row.Id] = _section_node(row)
+            self._csr = None
+
+    def remove_section(self, id: int):
+        with self._lock:
+            self.sections.pop(id, None)
+            self._csr = None
+
+    def upsert_connection(self, row):
+        with self._lock:
+            self.connections[row.Id] = _connection_edge(row)
+            self._csr = None
+
+    def remove_connection(self, id: int):
+        with self._lock:
+            self.connections.pop(id, None)
+            self._csr = None
+
+    def upsert_switch(self, row):
+        with self._lock:
+            self.switches[row.Id] = _switch_state(row)
+            # switch position does not change topology; only active-ness could
+            self._csr = None
+
+    def set_switch_position(self, id: int, position: str):
+        with self._lock:
+            sw = self.switches.get(id)
+            if sw is not None:
+                self.switches[id] = SwitchState(sw.id, sw.accessory_id, sw.section_id, position, sw.active)
+
+    def remove_switch(self, id: int):
+        with self._lock:
+            self.switches.pop(id, None)
+            self._csr = None
+
+    # ---- queries -----------------------------------------------------------------
+    @property
+    def csr(self) -> CsrGraph:
+        csr = self._csr
+        if csr is None:
+            with self._lock:
+                csr = self._csr = self._csr or self._build_csr()
+        return csr
+
+    def neighbors(self, section_id: int) -> List[Neighbor]:
+        csr = self.csr
+        i = csr.index.get(section_id)
+        if i is None:
+            return []
+        out = []
+        for e in csr.edges(i):
+            sw = csr.edge_switch[e]
+            out.append(Neighbor(
+                section_id=csr.node_ids[csr.targets[e]],
+                connection_id=csr.edge_connection[e],
+                switch_id=None if sw == NO_SWITCH else sw,
+                weight=csr.weights[e],
+            ))
+        return out
+
+    def reachable(self, section_id: int) -> Set[int]:
+        """Section ids reachable from section_id (including itself)."""
+        csr = self.csr
+        start = csr.index.get(section_id)
+        if start is None:
+            return set()
+        seen = bytearray(len(csr.node_ids))
+        seen[start] = 1
+        queue = deque([start])
+        offsets, targets = csr.offsets, csr.targets
+        while queue:
+            i = queue.popleft()
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                if not seen[j]:
+                    seen[j] = 1
+                    queue.append(j)
+        return {csr.node_ids[i] for i in range(len(seen)) if seen[i]}
+
+    def shortest_path(self, from_id: int, to_id: int) -> Optional[Route]:
+        """Shortest route by section length, or None if to_id is unreachable."""
+        csr = self.csr
+        start, goal = csr.index.get(from_id), csr.index.get(to_id)
+        if start is None or goal is None:
+            return None
+
+        coords, scale = csr.coords, csr.heuristic_scale
+        if coords is not None and scale > 0:
+            gx, gy, gz = coords[goal]
+
+            def h(i):
+                x, y, z = coords[i]
+                return scale * math.sqrt((x - gx) ** 2 + (y - gy) ** 2 + (z - gz) ** 2)
+        else:
+            def h(i):
+                return 0.0
+
+        n = len(csr.node_ids)
+        dist = [math.inf] * n
+        via = [-1] * n  # edge index used to reach each node
+        closed = bytearray(n)
+        dist[start] = 0.0
+        heap = [(h(start), start)]
+        offsets, targets, weights = csr.offsets, csr.targets, csr.weights
+        while heap:
+            _, i = heapq.heappop(heap)
+            if closed[i]:
+                continue
+            if i == goal:
+                break
+            closed[i] = 1
+            d = dist[i]
+            for e in range(offsets[i], offsets[i + 1]):
+                j = targets[e]
+                nd = d + weights[e]
+                if nd < dist[j]:
+                    dist[j] = nd
+                    via[j] = e
+                    heapq.heappush(heap, (nd + h(j), j))
+        if dist[goal] == math.inf:
+            return None
+
+        edges = []
+        i = goal
+        while i != start:
+            e = via[i]
+            edges.append(e)
+            i = _edge_source(offsets, e)
+        edges.reverse()
+
+        switches = []
+        for e in edges:
+            sw = csr.edge_switch[e]
+            if sw != NO_SWITCH and (sw, csr.edge_position[e]) not in switches:
+                switches.append((sw, csr.edge_position[e]))
+        return Route(
+            sections=(from_id,) + tuple(csr.node_ids[csr.targets[e]] for e in edges),
+            connections=tuple(csr.edge_connection[e] for e in edges),
+            switches=tuple(switches),
+            length=dist[goal],
+        )
+
+    # ---- internals ---------------------------------------------------------------
+    def _build_csr(self) -> CsrGraph:
+        node_ids = array("l", sorted(id for id, s in self.sections.items() if s.active))
+        index = {id: i for i, id in enumerate(node_ids)}
+        active_switches = {id for id, sw in self.switches.items() if sw.active}
+
+        adjacency: List[List[tuple]] = [[] for _ in node_ids]
+        for c in self.connections.values():
+            if not c.active or (c.switch_id is not None and c.switch_id not in active_switches):
+                continue
+            a, b = index.get(c.from_id), index.get(c.to_id)
+            if a is None or b is None:
+                continue
+            sw = NO_SWITCH if c.switch_id is None else c.switch_id
+            adjacency[a].append((b, c.id, sw, c.required_position))
+            if c.bidirectional:
+                adjacency[b].append((a, c.id, sw, c.required_position))
+
+        offsets = array("l", [0])
+        targets, weights = array("l"), array("d")
+        edge_connection, edge_switch = array("l"), array("l")
+        edge_position: List[Optional[str]] = []
+        for edges in adjacency:
+            for j, conn_id, sw, position in sorted(edges, key=lambda t: (t[0], t[1])):
+                length = self.sections[node_ids[j]].length
+                targets.append(j)
+                weights.append(length if length and length > 0 else DEFAULT_LENGTH)
+                edge_connection.append(conn_id)
+                edge_switch.append(sw)
+                edge_position.append(position)
+            offsets.append(len(targets))
+
+        coords = None
+        scale = 0.0
+        nodes = [self.sections[id] for id in node_ids]
+        if all(s.x is not None and s.y is not None for s in nodes):
+            coords = tuple((s.x, s.y, s.z or 0.0) for s in nodes)
+            ratios = []
+            for i in range(len(nodes)):
+                for e in range(offsets[i], offsets[i + 1]):
+                    span = math.dist(coords[i], coords[targets[e]])
+                    if span > 0:
+                        ratios.append(weights[e] / span)
+            scale = min(ratios, default=0.0)
+
+        return CsrGraph(
+            node_ids, index, offsets, targets, weights, edge_connection, edge_switch,
+            tuple(edge_position), coords, scale,
+        )
+
+
+def _edge_source(offsets: array, e: int) -> int:
+    """Node index owning edge e (binary search over the CSR offsets)."""
+    lo, hi = 0, len(offsets) - 2
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if offsets[mid] <= e:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _section_node(row) -> SectionNode:
+    return SectionNode(
+        id=row.Id,
+        name=row.Name,
+        length=row.Length,
+        x=row.PositionX,
+        y=row.PositionY,
+        z=row.PositionZ,
+        active=bool(row.IsActive),
+    )
+
+
+def _connection_edge(row) -> ConnectionEdge:
+    return ConnectionEdge(
+        id=row.Id,
+        from_id=row.FromSectionId,
+        to_id=row.ToSectionId,
+        switch_id=row.SwitchId,
+        bidirectional=True if row.IsBidirectional is None else bool(row.IsBidirectional),
+        connection_type=row.connection_type or "direct",
+        route_info=row.RouteInfo,
+        active=True if row.IsActive is None else bool(row.IsActive),
+    )
+
+
+def _switch_state(row) -> SwitchState:
+    return SwitchState(
+        id=row.Id,
+        accessory_id=row.AccessoryId,
+        section_id=row.SectionId,
+        position=row.position or "unknown",
+        active=True if row.IsActive is None else bool(row.IsActive),
+    )
+
+
+track_graph = TrackGraph()
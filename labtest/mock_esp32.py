@@ -56,6 +56,27 @@ class MockESP32Node:
         if len(self.command_history) > 100:
             self.command_history.pop(0)
     
+    def apply_action(self, pin: int, action: str, duration_ms: int = None):
+        """Apply one pin action; returns an error message or None"""
+        if action == 'on':
+            self.set_pin_state(pin, 'on')
+        elif action == 'off':
+            self.set_pin_state(pin, 'off')
+        elif action == 'toggle':
+            # For toggle, simulate a brief pulse
+            duration = duration_ms or 250
+            self.set_pin_state(pin, 'toggle', duration)
+            # Schedule turning off after duration
+            asyncio.create_task(self._delayed_off(pin, duration))
+        elif action == 'timed':
+            # Turn on, then schedule off
+            duration = duration_ms or 5000
+            self.set_pin_state(pin, 'on', duration)
+            asyncio.create_task(self._delayed_off(pin, duration))
+        else:
+            return f'Unknown action: {action}'
+        return None
+    
     async def handle_pin_control(self, request: web_request.Request):
         """Handle pin control requests"""
         try:
@@ -74,26 +95,9 @@ class MockESP32Node:
             pin = int(pin)
             
             # Simulate the action
-            if action == 'on':
-                self.set_pin_state(pin, 'on')
-            elif action == 'off':
-                self.set_pin_state(pin, 'off')
-            elif action == 'toggle':
-                # For toggle, simulate a brief pulse
-                duration = duration_ms or 250
-                self.set_pin_state(pin, 'toggle', duration)
-                # Schedule turning off after duration
-                asyncio.create_task(self._delayed_off(pin, duration))
-            elif action == 'timed':
-                # Turn on, then schedule off
-                duration = duration_ms or 5000
-                self.set_pin_state(pin, 'on', duration)
-                asyncio.create_task(self._delayed_off(pin, duration))
-            else:
-                return web.json_response(
-                    {'error': f'Unknown action: {action}'}, 
-                    status=400
-                )
+            error = self.apply_action(pin, action, duration_ms)
+            if error:
+                return web.json_response({'error': error}, status=400)
             
             response = {
                 'status': 'success',
@@ -115,6 +119,60 @@ class MockESP32Node:
                 status=500
             )
     
+    async def handle_batch_control(self, request: web_request.Request):
+        """Handle a list of pin actions in one request; results keep request order"""
+        try:
+            data = await request.json()
+            commands = data.get('commands')
+            
+            if not isinstance(commands, list) or not commands:
+                return web.json_response(
+                    {'error': 'Non-empty commands list required'}, 
+                    status=400
+                )
+            
+            timestamp = datetime.now().isoformat()
+            results = []
+            for cmd in commands:
+                pin = cmd.get('pin')
+                action = cmd.get('action', 'on')
+                duration_ms = cmd.get('duration_ms')
+                
+                if pin is None:
+                    error = 'Pin number required'
+                else:
+                    # a bad pin fails only its own command, not the batch
+                    try:
+                        pin = int(pin)
+                    except (TypeError, ValueError):
+                        error = f'Invalid pin number: {pin!r}'
+                    else:
+                        error = self.apply_action(pin, action, duration_ms)
+                
+                result = {'pin': pin, 'action': action, 'status': 'error' if error else 'success'}
+                if error:
+                    result['error'] = error
+                if duration_ms:
+                    result['duration_ms'] = duration_ms
+                results.append(result)
+            
+            failed = sum(1 for r in results if r['status'] != 'success')
+            logger.info(f"Batch of {len(results)} commands applied ({failed} failed)")
+            
+            return web.json_response({
+                'status': 'success' if not failed else 'partial',
+                'node_id': self.node_id,
+                'results': results,
+                'timestamp': timestamp
+            })
+            
+        except Exception as e:
+            logger.error(f"Error handling batch control: {e}")
+            return web.json_response(
+                {'error': str(e)}, 
+                status=500
+            )
+    
     async def _delayed_off(self, pin: int, delay_ms: int):
         """Turn off a pin after a delay"""
         await asyncio.sleep(delay_ms / 1000.0)
@@ -165,6 +223,7 @@ class MockESP32Node:
         
         # Add routes
         app.router.add_post('/control', self.handle_pin_control)
+        app.router.add_post('/control/batch', self.handle_batch_control)
         app.router.add_get('/status', self.handle_status)
         app.router.add_get('/history', self.handle_history)
         app.router.add_post('/reset', self.handle_reset)
@@ -187,16 +246,17 @@ class MockESP32Node:
         await site.start()
         
         logger.info(f"Mock ESP32 node '{self.node_id}' started on port {self.port}")
-        logger.info(f"Available endpoints:")
+        logger.info("Available endpoints:")
         logger.info(f"  POST http://localhost:{self.port}/control - Control pins")
+        logger.info(f"  POST http://localhost:{self.port}/control/batch - Control several pins at once")
         logger.info(f"  GET  http://localhost:{self.port}/status - Get status")
         logger.info(f"  GET  http://localhost:{self.port}/history - Get command history")
         logger.info(f"  POST http://localhost:{self.port}/reset - Reset all pins")
         
         return runner
 
-async def main():
-    """Main function to run multiple mock ESP32 nodes"""
+async def start_nodes():
+    """Start the five mock ESP32 nodes; returns (nodes, runners)"""
     nodes = [
         MockESP32Node('esp32-01', 8081),
         MockESP32Node('esp32-02', 8082),
@@ -210,6 +270,11 @@ async def main():
     for node in nodes:
         runner = await node.start()
         runners.append(runner)
+    return nodes, runners
+
+async def main():
+    """Main function to run multiple mock ESP32 nodes"""
+    nodes, runners = await start_nodes()
     
     logger.info(f"Started {len(nodes)} mock ESP32 nodes")
     logger.info("Press Ctrl+C to stop all nodes")